@@ -1,20 +1,13 @@
 import pyaudio
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import multiprocessing
+import queue
 import numpy as np
 import webrtcvad
 import time
-
-# Set up the Whisper speech-to-text model
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
-torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+from compute_workers import lower_priority
 
 model_id = "openai/whisper-large-v3"
-model = AutoModelForSpeechSeq2Seq.from_pretrained(
-    model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True
-)
-model.to(device)
-processor = AutoProcessor.from_pretrained(model_id)
+MAX_PENDING = 3  # Speech intervals waiting for the model; older ones are dropped beyond this
 
 # Audio capture settings
 FORMAT = pyaudio.paInt16
@@ -48,8 +41,47 @@ def is_speech(audio_chunk, energy_threshold=40):
     #print(f"Speech detected: {speech_detected}, Energy: {energy}")
     return speech_detected
 
+# Whisper runs in its own process so inference never delays stream.read() in the capture loop
+def inference_worker(jobs):
+    lower_priority()
+    import torch
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True
+    )
+    model.to(device)
+    processor = AutoProcessor.from_pretrained(model_id)
+
+    while True:
+        audio_data = jobs.get()
+        if audio_data is None:
+            break
+
+        # Preprocess the audio data with the processor
+        inputs = processor(audio_data, return_tensors="pt", sampling_rate=RATE)
+        inputs = {key: value.to(device, dtype=torch_dtype) for key, value in inputs.items()}  # Cast to appropriate dtype
+
+        # Process the raw audio data with Whisper
+        print("Transcribing...")
+        with torch.no_grad():
+            generated_ids = model.generate(
+                inputs["input_features"], 
+                forced_decoder_ids=processor.get_decoder_prompt_ids(language="en")
+            )
+        transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        
+        # Print the transcription
+        print(f"Transcription: {transcription}")
+
 # Function to stream and convert voice to text
 def stream_voice_to_text():
+    jobs = multiprocessing.Queue(maxsize=MAX_PENDING)
+    worker = multiprocessing.Process(target=inference_worker, args=(jobs,), daemon=True)
+    worker.start()
+
     audio_interface = pyaudio.PyAudio()
     
     # Open the stream for the default microphone (or WASAPI loopback for system sound)
@@ -80,26 +112,14 @@ def stream_voice_to_text():
                 print("No speech detected in this interval, skipping processing.")
                 continue
 
-            # If we have speech frames, concatenate and process
+            # If we have speech frames, hand them to the inference process without waiting
             if frames:
                 # Convert frames to numpy array for processing
                 audio_data = np.concatenate(frames, axis=0).astype(np.float32)
-                
-                # Preprocess the audio data with the processor
-                inputs = processor(audio_data, return_tensors="pt", sampling_rate=RATE)
-                inputs = {key: value.to(device, dtype=torch_dtype) for key, value in inputs.items()}  # Cast to appropriate dtype
-
-                # Process the raw audio data with Whisper
-                print("Transcribing...")
-                with torch.no_grad():
-                    generated_ids = model.generate(
-                        inputs["input_features"], 
-                        forced_decoder_ids=processor.get_decoder_prompt_ids(language="en")
-                    )
-                transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-                
-                # Print the transcription
-                print(f"Transcription: {transcription}")
+                try:
+                    jobs.put_nowait(audio_data)
+                except queue.Full:
+                    print("Transcriber is behind, dropping this interval.")
             else:
                 print("No frames to process, skipping transcription.")
 
@@ -109,6 +129,11 @@ def stream_voice_to_text():
         stream.stop_stream()
         stream.close()
         audio_interface.terminate()
+        try:
+            jobs.put(None, timeout=1)
+        except queue.Full:
+            pass
+        worker.join(timeout=5)
 
 # Start streaming voice to text
 if __name__ == "__main__":
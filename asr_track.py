@@ -0,0 +1,149 @@
+import os
+import numpy as np
+from recording_writer import RecordingWriter
+
+ASR_RATE = 16000
+ASR_SUFFIX = '.asr16k.wav'
+FILTER_TAPS = 101
+
+
+def asr_track_path(audio_file):
+    """Path of the 16 kHz mono companion track for a recording"""
+    return os.path.splitext(audio_file)[0] + ASR_SUFFIX
+
+
+def find_asr_track(audio_file):
+    """Return the companion ASR track for audio_file if one was recorded, else None"""
+    if audio_file.endswith(ASR_SUFFIX):
+        return None
+    path = asr_track_path(audio_file)
+    if os.path.exists(path) and os.path.getsize(path) > 44:
+        return path
+    return None
+
+
+class StreamingResampler:
+    """Block-wise downmix + resample of interleaved int16 audio.
+
+    A windowed-sinc low-pass runs over the block with the previous block's
+    tail as history, then output samples are linearly interpolated at the
+    target rate with the fractional position carried between blocks, so the
+    result has no seams at block boundaries.
+    """
+    def __init__(self, in_rate, channels, out_rate=ASR_RATE, taps=FILTER_TAPS):
+        self.in_rate = in_rate
+        self.channels = channels
+        self.out_rate = out_rate
+        self.step = in_rate / float(out_rate)
+        if in_rate > out_rate:
+            cutoff = 0.9 * (out_rate / 2.0) / in_rate
+            n = np.arange(taps) - (taps - 1) / 2.0
+            self.taps = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)).astype(np.float32)
+            self.taps /= self.taps.sum()
+        else:
+            self.taps = np.ones(1, dtype=np.float32)
+        self._history = np.zeros(len(self.taps) - 1, dtype=np.float32)
+        self._last = np.zeros(1, dtype=np.float32)
+        # Start at the filter's group delay so output sample 0 lines up with input sample 0
+        self._pos = (len(self.taps) - 1) / 2.0
+
+    def process(self, data):
+        """Resample one block of interleaved int16 bytes, returning mono int16 bytes"""
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return self._resample(samples)
+
+    def flush(self):
+        """Push the filter tail through at the end of the recording"""
+        return self._resample(np.zeros(len(self.taps) // 2, dtype=np.float32))
+
+    def _resample(self, samples):
+        if samples.size == 0:
+            return b''
+        padded = np.concatenate([self._history, samples])
+        filtered = np.convolve(padded, self.taps, mode='valid')
+        self._history = padded[len(padded) - len(self._history):] if len(self._history) else self._history
+        # buf[0] is the previous block's last filtered sample (time -1)
+        buf = np.concatenate([self._last, filtered])
+        end = len(filtered) - 1
+        if self._pos > end:
+            self._pos -= len(filtered)
+            self._last = filtered[-1:]
+            return b''
+        count = int(np.floor((end - self._pos) / self.step)) + 1
+        times = self._pos + self.step * np.arange(count)
+        out = np.interp(times, np.arange(-1, len(filtered)), buf)
+        self._pos = times[-1] + self.step - len(filtered)
+        self._last = filtered[-1:]
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+class AsrTrackWriter:
+    """Recorder tap producing a 16 kHz mono int16 track next to the archival file"""
+    def __init__(self, audio_file, source, channels, rate, callback=None):
+        self.source = source
+        self.filename = asr_track_path(audio_file)
+        self.resampler = StreamingResampler(rate, channels)
+        self.writer = RecordingWriter(self.filename, 1, ASR_RATE, 'wav',
+                                      callback=callback, transform=self.resampler)
+
+    def tap(self, data, source):
+        if source == self.source:
+            self.writer.write(data)
+
+    def close(self):
+        return self.writer.close()
+
+
+def asr_duration(audio_file):
+    """Length of a WAV/FLAC recording in seconds, from the header only"""
+    import soundfile as sf
+    return sf.info(audio_file).duration
+
+
+def asr_blocks(audio_file, block_s=10.0):
+    """16 kHz mono float32 blocks of a WAV/FLAC recording, read and resampled lazily"""
+    import soundfile as sf
+    with sf.SoundFile(audio_file) as f:
+        resampler = None
+        if f.samplerate != ASR_RATE or f.channels != 1:
+            resampler = StreamingResampler(f.samplerate, f.channels)
+        for block in f.blocks(blocksize=int(block_s * f.samplerate), dtype='int16', always_2d=True):
+            data = block.tobytes()
+            if resampler is not None:
+                data = resampler.process(data)
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        if resampler is not None:
+            yield np.frombuffer(resampler.flush(), dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def asr_windows(audio_file, window_s, overlap_s):
+    """Yield (offset_s, samples, lead_s) windows of 16 kHz mono audio.
+
+    Each window covers [offset_s, offset_s + window_s) plus up to overlap_s
+    of context on either side (lead_s of it before offset_s), so words cut
+    at a window edge are heard whole by one of the two windows. Only about
+    one window of audio is held in memory at a time.
+    """
+    window = int(window_s * ASR_RATE)
+    overlap = int(overlap_s * ASR_RATE)
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    offset = 0
+
+    def cut(end):
+        lead = offset - max(0, offset - overlap)
+        samples = buffer[offset - lead - buffer_start:end - buffer_start]
+        return offset / float(ASR_RATE), samples, lead / float(ASR_RATE)
+
+    for block in asr_blocks(audio_file):
+        buffer = np.concatenate([buffer, block])
+        while buffer_start + len(buffer) >= offset + window + overlap:
+            yield cut(offset + window + overlap)
+            offset += window
+            keep_from = max(0, offset - overlap)
+            buffer = buffer[keep_from - buffer_start:]
+            buffer_start = keep_from
+    if buffer_start + len(buffer) > offset:
+        yield cut(buffer_start + len(buffer))
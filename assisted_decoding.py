@@ -0,0 +1,40 @@
+# Draft models that share the tokenizer and mel front end of the main model
+ASSISTANT_MODELS = {
+    "openai/whisper-large-v3": "distil-whisper/distil-large-v3",
+    "openai/whisper-large-v2": "distil-whisper/distil-large-v2",
+    "openai/whisper-medium.en": "distil-whisper/distil-medium.en",
+}
+
+
+def default_assistant(model_id):
+    return ASSISTANT_MODELS.get(model_id)
+
+
+def load_assistant(model, assistant_id, torch_dtype, device, cache_dir="cache"):
+    """Load a draft model for assisted generation and check it can draft for `model`.
+
+    Assisted generation only keeps the main model's greedy output if both
+    models use the same vocabulary and input features.
+    """
+    from transformers import AutoModelForSpeechSeq2Seq
+    assistant = AutoModelForSpeechSeq2Seq.from_pretrained(
+        assistant_id,
+        torch_dtype=torch_dtype,
+        low_cpu_mem_usage=True,
+        use_safetensors=True,
+        cache_dir=cache_dir
+    )
+    for attribute in ('vocab_size', 'num_mel_bins'):
+        main_value = getattr(model.config, attribute, None)
+        draft_value = getattr(assistant.config, attribute, None)
+        if main_value != draft_value:
+            raise ValueError(f"{assistant_id} cannot draft for this model: {attribute} {draft_value} != {main_value}")
+    assistant.to(device)
+    return assistant
+
+
+def assisted_generate_kwargs(assistant):
+    """generate() arguments for assisted decoding; greedy so the output matches the main model"""
+    if assistant is None:
+        return {}
+    return {"assistant_model": assistant, "num_beams": 1, "do_sample": False}
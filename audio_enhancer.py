@@ -0,0 +1,139 @@
+import os
+from datetime import datetime
+import numpy as np
+from recording_writer import read_audio
+
+
+class AudioEnhancer:
+    def __init__(self, output_dir='output'):
+        self.output_dir = output_dir
+        self._callback = None
+        
+    def set_callback(self, callback):
+        self._callback = callback
+    
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)        
+        
+    def enhance_recording(self, input_file, prefix=None):
+        """Apply audio enhancements to recording with dynamic parameters"""
+        # Only the enhancement worker processes pay for importing these
+        import noisereduce as nr
+        from scipy.io import wavfile
+        try:
+            self._log(f"Loading audio file: {input_file}")
+            # Load audio file
+            rate, data = read_audio(input_file)
+            
+            # Convert to float32 for processing
+            data = data.astype(np.float32, order='C') / 32768.0
+
+            # Calculate appropriate FFT size based on data length
+            data_length = len(data)
+            if data_length < 2:
+                self._log("Audio file too short to process")
+                return None
+                
+            # Choose FFT size that's power of 2 and less than data length
+            n_fft = min(2048, 2**int(np.log2(data_length)))
+            
+            # Normalize audio levels first
+            self._log("Normalizing audio levels...")
+            abs_max = np.abs(data).max()
+            if abs_max > 0:
+                normalized = data / abs_max * 0.9  # Leave some headroom
+            else:
+                normalized = data
+
+            # Only apply noise reduction if we have enough samples
+            if data_length > n_fft:
+                self._log(f"Reducing background noise (FFT size: {n_fft})...")
+                try:
+                    reduced_noise = nr.reduce_noise(
+                        y=normalized,
+                        sr=rate,
+                        stationary=True,
+                        prop_decrease=0.75,
+                        n_fft=n_fft,
+                        n_std_thresh_stationary=1.5
+                    )
+                except Exception as e:
+                    self._log(f"Noise reduction failed: {str(e)}, using normalized audio")
+                    reduced_noise = normalized
+            else:
+                self._log("Audio too short for noise reduction, using normalized audio")
+                reduced_noise = normalized
+                
+            # Save enhanced audio
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if prefix is None:
+                prefix = os.path.splitext(os.path.basename(input_file))[0]
+                
+            output_file = os.path.join(
+                self.output_dir,
+                f'{prefix}_enhanced_{timestamp}.wav'
+            )
+            
+            # Convert back to int16
+            output_data = (reduced_noise * 32768.0).astype(np.int16)
+            
+            self._log("Saving enhanced audio...")
+            wavfile.write(output_file, rate, output_data)
+            
+            return output_file
+            
+        except Exception as e:
+            self._log(f"Error during audio enhancement: {str(e)}")
+            import traceback
+            self._log(f"Stack trace !!!!: {traceback.format_exc()}")
+            
+            
+    def enhance_conversation(self, mic_file, speaker_file):
+        """Enhance both sides of a conversation"""
+        try:
+            # Create enhanced conversation directory
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            conv_dir = os.path.join(self.output_dir, f'enhanced_{timestamp}')
+            os.makedirs(conv_dir, exist_ok=True)
+            
+            results = {
+                'mic': None,
+                'speaker': None
+            }
+            
+            if mic_file and os.path.exists(mic_file) and os.path.getsize(mic_file) > 0:
+                self._log("Enhancing your side of conversation...")
+                results['mic'] = self.enhance_recording(
+                    mic_file,
+                    f'mic_{timestamp}'
+                )
+                
+            if speaker_file and os.path.exists(speaker_file) and os.path.getsize(speaker_file) > 0:
+                self._log("Enhancing other side of conversation...")
+                results['speaker'] = self.enhance_recording(
+                    speaker_file,
+                    f'speaker_{timestamp}'
+                )
+                
+            return results
+            
+        except Exception as e:
+            self._log(f"Error enhancing conversation: {str(e)}")
+            return None
+
+
+def enhance_recording_job(input_file, output_dir='output', prefix=None):
+    """Worker-process entry point: enhance one file, returning (output_file, log messages)"""
+    messages = []
+    enhancer = AudioEnhancer(output_dir)
+    enhancer.set_callback(messages.append)
+    return enhancer.enhance_recording(input_file, prefix), messages
+
+
+def enhance_conversation_job(mic_file, speaker_file, output_dir='output'):
+    """Worker-process entry point: enhance both sides, returning (results, log messages)"""
+    messages = []
+    enhancer = AudioEnhancer(output_dir)
+    enhancer.set_callback(messages.append)
+    return enhancer.enhance_conversation(mic_file, speaker_file), messages
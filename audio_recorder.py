@@ -0,0 +1,616 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from os.path import join
+from device_registry import get_registry, DeviceRegistry, portaudio_module
+from recording_writer import RecordingWriter, recording_extension, format_stats
+from asr_track import AsrTrackWriter
+from waveform_peaks import PeakWriter
+from voice_activation import VoiceGate, PRE_ROLL_S, HANGOVER_S, SPEECH_DB
+from capture_health import CaptureHealth, callback_latency
+from shared_audio import SharedAudioCapture
+
+out_dir = 'output'
+WRITER_ATTRIBUTES = {'mic': 'mic_writer', 'speaker': 'speaker_writer'}
+THREAD_JOIN_TIMEOUT = 2.0
+# PortAudio constants, so that only the capture mode in use imports a PyAudio build
+PA_INT16 = 8
+PA_CONTINUE = 0
+PA_COMPLETE = 1
+PA_INPUT_OVERFLOWED = -9981
+
+
+def pyaudio_factory():
+    import pyaudio
+    return pyaudio.PyAudio()
+
+
+def loopback_factory():
+    """PyAudio with WASAPI loopback devices where pyaudiowpatch is installed, plain PyAudio elsewhere"""
+    return portaudio_module().PyAudio()
+
+
+class AudioRecorder:
+    def __init__(self, registry=None):
+        self.FORMAT = PA_INT16
+        self.RATE = 44100
+        self.CHUNK = 1024
+        self.recording = False
+        self.audio = None
+        self._callback = None
+        self.current_channels = None
+        self.stream = None
+        self.mic_writer = None
+        self.speaker_writer = None
+        self.mic_thread = None
+        self.speaker_thread = None
+        self.current_filename = None
+        self.out_dir = out_dir
+        self.file_prefix = f'call_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        self.output_format = 'wav'
+        self.asr_track = False
+        self.asr_writers = {}
+        self.waveform_peaks = True
+        self.peak_writers = {}
+        self.voice_activation = False
+        self.pre_roll_s = PRE_ROLL_S
+        self.hangover_s = HANGOVER_S
+        self.speech_db = SPEECH_DB
+        self.gate = None
+        self.health = {}
+        # Off unless something will pick recordings up from shared memory
+        self.share_audio = False
+        self.shared_captures = {}
+        self.shared_audio = {}
+        self.last_write_stats = {}
+        self.taps = []
+        self.saved_listeners = []
+        self._rotate_pending = set()
+        self._segment_closers = []
+        self.catalog = None
+        self.devices = {}
+        self.registry = registry or get_registry()
+        self.mic_audio_factory = pyaudio_factory
+        self.speaker_audio_factory = loopback_factory
+        
+    def use_virtual_host(self, host):
+        """Capture from a VirtualAudioHost instead of PortAudio"""
+        self.mic_audio_factory = host
+        self.speaker_audio_factory = host
+        self.registry = DeviceRegistry(host)
+        
+    def add_tap(self, tap):
+        """Register tap(data, source) called with every captured block"""
+        # Copy on write: capture threads iterate self.taps without a lock
+        if tap not in self.taps:
+            self.taps = self.taps + [tap]
+    
+    def remove_tap(self, tap):
+        if tap in self.taps:
+            self.taps = [t for t in self.taps if t != tap]
+    
+    def add_saved_listener(self, listener):
+        """Register listener(filename, source, stats) called for every saved recording or segment"""
+        self.saved_listeners.append(listener)
+    
+    def _deliver(self, writer, data, source):
+        """Write a captured block and pass it to the taps, through the voice gate if enabled"""
+        if source in self._rotate_pending:
+            self._rotate_pending.discard(source)
+            writer = self._rotate_writer(writer, source)
+        blocks = self.gate.process(data, source) if self.gate is not None else (data,)
+        for block in blocks:
+            writer.write(block)
+            self._run_taps(block, source)
+    
+    def _read_block(self, stream, channels, source):
+        """Blocking read of one CHUNK, recorded in the source's capture health.
+
+        An input overflow is counted and stands in as a block of silence, so
+        the recording keeps going and stays aligned with the other source.
+        """
+        health = self.health.get(source)
+        fill = stream.get_read_available()
+        try:
+            data = stream.read(self.CHUNK)
+        except IOError as e:
+            if e.errno != PA_INPUT_OVERFLOWED:
+                raise
+            if health is not None:
+                health.overflow()
+            return b'\x00' * (self.CHUNK * channels * 2)
+        if health is not None:
+            health.block(self.CHUNK, latency_s=stream.get_input_latency(), fill_frames=fill)
+        return data
+    
+    def _callback_block(self, source, frame_count, time_info, status):
+        """Record a stream callback's block, status flags and latency in the source's capture health"""
+        health = self.health.get(source)
+        if health is not None:
+            health.block(frame_count, status, callback_latency(time_info))
+    
+    def capture_stats(self):
+        """Live CaptureHealth stats of every source being recorded"""
+        return {source: health.stats() for source, health in list(self.health.items())}
+    
+    def _run_taps(self, data, source):
+        for tap in self.taps:
+            try:
+                tap(data, source)
+            except Exception as e:
+                self._log(f"Tap error: {str(e)}")
+    
+    def get_microphones(self):
+        """Get list of available microphone devices"""
+        return self.registry.get_microphones()
+
+    def get_speakers(self):
+        """Get list of available speaker devices"""
+        speakers = self.registry.get_speakers()
+        if not speakers and self.registry.default_output_name is None:
+            self._log("WASAPI not available on the system")
+        return speakers
+    
+    def set_callback(self, callback):
+        self._callback = callback
+    
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+    
+    def _new_filename(self, kind):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        call_dir = join(self.out_dir, self.file_prefix)
+        os.makedirs(call_dir, exist_ok=True)
+        name = f'{kind}_recording_{timestamp}'
+        extension = recording_extension(self.output_format)
+        filename = join(call_dir, name + extension)
+        # Segments rotated within the same second get a counter
+        count = 1
+        while os.path.exists(filename):
+            filename = join(call_dir, f'{name}_{count}{extension}')
+            count += 1
+        return filename
+    
+    def _open_writer(self, filename, source, channels, rate):
+        """Open the archival writer and, if enabled, the 16 kHz mono ASR track for a source"""
+        if self.voice_activation:
+            # One gate for all sources, so both sides of a call start and pause together
+            if self.gate is None:
+                self.gate = VoiceGate(self.pre_roll_s, self.hangover_s, self.speech_db, callback=self._log)
+            self.gate.add_source(source, channels, rate)
+        self.health[source] = CaptureHealth(source, rate, self.CHUNK)
+        if self.asr_track:
+            asr_writer = AsrTrackWriter(filename, source, channels, rate, callback=self._log)
+            self.asr_writers[source] = asr_writer
+            self.add_tap(asr_writer.tap)
+        if self.waveform_peaks:
+            peak_writer = PeakWriter(filename, source, channels, rate)
+            self.peak_writers[source] = peak_writer
+            self.add_tap(peak_writer.tap)
+        if self.share_audio:
+            capture = SharedAudioCapture(source, channels, rate)
+            self.shared_captures[source] = capture
+            self.add_tap(capture.tap)
+        return RecordingWriter(filename, channels, rate, self.output_format, callback=self._log)
+    
+    def _detach_source(self, source):
+        """Remove a source's per-file taps and health; returns them for _finish_writer"""
+        parts = (self.asr_writers.pop(source, None), self.peak_writers.pop(source, None),
+                 self.shared_captures.pop(source, None), self.health.pop(source, None))
+        for part in parts[:3]:
+            if part is not None:
+                self.remove_tap(part.tap)
+        return parts
+    
+    def _close_writer(self, writer, source):
+        """Close a writer and return its filename, or None if nothing was captured"""
+        if writer is None:
+            return None
+        parts = self._detach_source(source)
+        stats = writer.close()
+        if self.gate is not None:
+            self._close_gate(source, writer.filename if writer.frames_written else None)
+        return self._finish_writer(writer, source, parts, stats)
+    
+    def _finish_writer(self, writer, source, parts, stats=None):
+        """Finish the side files of a closed writer, catalog it and notify the saved listeners"""
+        if stats is None:
+            stats = writer.close()
+        self.last_write_stats[stats['filename']] = stats
+        asr_writer, peak_writer, capture, health = parts
+        if asr_writer is not None:
+            asr_writer.close()
+        if peak_writer is not None and writer.frames_written:
+            try:
+                peak_writer.close()
+            except Exception as e:
+                self._log(f"Error writing waveform peaks: {str(e)}")
+        if health is not None:
+            self._log(f"Capture health {health.summary()}")
+        if not writer.frames_written:
+            os.remove(writer.filename)
+            if asr_writer is not None and os.path.exists(asr_writer.filename):
+                os.remove(asr_writer.filename)
+            return None
+        self._log(f"Saved {format_stats(stats)}")
+        if health is not None:
+            stats['health'] = health.stats()
+            try:
+                health.save(writer.filename)
+            except OSError as e:
+                self._log(f"Error saving capture health: {str(e)}")
+        if self.catalog is not None:
+            try:
+                self.catalog.add_recording(writer.filename, source, self.devices.get(source), stats)
+            except sqlite3.Error as e:
+                self._log(f"Catalog error: {str(e)}")
+        if capture is not None:
+            self._publish_shared_audio(writer.filename, capture)
+        for listener in self.saved_listeners:
+            try:
+                listener(writer.filename, source, stats)
+            except Exception as e:
+                self._log(f"Saved listener error: {str(e)}")
+        return writer.filename
+    
+    def rotate(self):
+        """Continue every source in a new file from its next captured block.
+
+        The streams keep running, so no audio is lost between segments; the
+        finished segments are closed on background threads.
+        """
+        if self.recording:
+            self._rotate_pending.update(source for source, name in WRITER_ATTRIBUTES.items()
+                                        if getattr(self, name) is not None)
+    
+    def _rotate_writer(self, writer, source):
+        """Swap in a new file for source; runs on its capture thread between two blocks"""
+        parts = self._detach_source(source)
+        if self.gate is not None:
+            written = self.gate.source_stats(source)['written_s']
+            self._close_gate(source, writer.filename if written else None)
+        new_writer = self._open_writer(self._new_filename(source), source, writer.channels, writer.rate)
+        setattr(self, WRITER_ATTRIBUTES[source], new_writer)
+        closer = threading.Thread(target=self._finish_writer, args=(writer, source, parts), daemon=True)
+        self._segment_closers = [t for t in self._segment_closers if t.is_alive()] + [closer]
+        closer.start()
+        return new_writer
+    
+    def _join_segment_closers(self):
+        for closer in self._segment_closers:
+            closer.join()
+        self._segment_closers = []
+    
+    def _close_gate(self, source, filename):
+        stats = self.gate.source_stats(source)
+        self._log(f"Voice activation ({source}): kept {stats['written_s']:.1f}s of {stats['captured_s']:.1f}s "
+                  f"in {stats['segments']} stretches, {stats['removed'] * 100:.0f}% silence removed")
+        try:
+            timeline = self.gate.close_source(source, filename)
+            if timeline:
+                self._log(f"Timeline saved to {timeline}")
+        except OSError as e:
+            self._log(f"Error saving timeline: {str(e)}")
+        if not self.gate.sources:
+            self.gate = None
+    
+    def _publish_shared_audio(self, filename, capture):
+        """Keep the just-recorded audio in shared memory for a quick transcription handoff"""
+        try:
+            shm = capture.publish()
+        except Exception as e:
+            self._log(f"Shared memory handoff unavailable: {str(e)}")
+            return
+        if shm is not None:
+            self.release_shared_audio(capture.source)
+            self.shared_audio[capture.source] = (filename, shm)
+    
+    def shared_audio_name(self, filename):
+        """Name of the shared-memory block holding filename's audio, if still published"""
+        for published, shm in self.shared_audio.values():
+            if published == filename:
+                return shm.name
+        return None
+    
+    def release_shared_audio(self, source=None):
+        """Free published shared-memory blocks (all sources by default)"""
+        for key in [source] if source else list(self.shared_audio):
+            entry = self.shared_audio.pop(key, None)
+            if entry is None:
+                continue
+            try:
+                entry[1].close()
+                entry[1].unlink()
+            except Exception as e:
+                self._log(f"Error releasing shared audio: {str(e)}")
+    
+    def start_recording_mic(self, device_index, channels):
+        """Start recording from microphone"""
+        if self.recording:
+            return False
+            
+        self.recording = True
+        self.current_channels = channels
+        device = self.registry.get_device(device_index)
+        self.devices['mic'] = device['name'] if device else None
+        self.audio = self.mic_audio_factory()
+        self.mic_writer = self._open_writer(self._new_filename('mic'), 'mic', channels, self.RATE)
+        
+        def record_thread():
+            try:
+                stream = self.audio.open(
+                    format=self.FORMAT,
+                    channels=channels,
+                    rate=self.RATE,
+                    input=True,
+                    input_device_index=device_index,
+                    frames_per_buffer=self.CHUNK
+                )
+                
+                self._log(f"Microphone recording started with {channels} channel(s)")
+                
+                while self.recording:
+                    try:
+                        data = self._read_block(stream, channels, "mic")
+                        self._deliver(self.mic_writer, data, "mic")
+                    except Exception as e:
+                        self._log(f"Error during recording: {str(e)}")
+                        break
+                
+                stream.stop_stream()
+                stream.close()
+                
+            except Exception as e:
+                self._log(f"Error setting up audio stream: {str(e)}")
+                self.recording = False
+        
+        self.mic_thread = threading.Thread(target=record_thread, daemon=True)
+        self.mic_thread.start()
+        return True
+
+    def start_recording_speaker(self, device_info):
+        """Start recording from speaker"""
+        if self.recording:
+            return False
+            
+        self.recording = True
+        self.current_filename = self._new_filename('speaker')
+        self.devices['speaker'] = device_info['name']
+        
+        def record_thread():
+            try:
+                self.audio = self.speaker_audio_factory()
+                self.speaker_writer = self._open_writer(self.current_filename, 'speaker', device_info['channels'], device_info['rate'])
+
+                def callback(in_data, frame_count, time_info, status):
+                    if self.recording:
+                        self._callback_block("speaker", frame_count, time_info, status)
+                        self._deliver(self.speaker_writer, in_data, "speaker")
+                        return (in_data, PA_CONTINUE)
+                    return (None, PA_COMPLETE)
+
+                self.stream = self.audio.open(
+                    format=PA_INT16,
+                    channels=device_info['channels'],
+                    rate=device_info['rate'],
+                    frames_per_buffer=self.CHUNK,
+                    input=True,
+                    input_device_index=device_info['index'],
+                    stream_callback=callback
+                )
+
+                # The stream runs on PortAudio's thread from here; stop_recording joins this one
+                self._log(f"Speaker recording started from: {device_info['name']}")
+
+            except Exception as e:
+                self._log(f"Recording error: {str(e)}")
+                self.stop_recording("speaker")
+
+        self.speaker_thread = threading.Thread(target=record_thread, daemon=True)
+        self.speaker_thread.start()
+        return self.current_filename
+
+    def start_both_recordings(self, mic_info, speaker_info):
+        """Start both microphone and speaker recordings"""
+        if self.recording:
+            return False
+            
+        self.recording = True
+        self.devices = {'mic': mic_info[1], 'speaker': speaker_info['name']}
+        # Start microphone recording
+        self.current_channels = mic_info[2]
+        self.audio_mic = self.mic_audio_factory()
+        self.mic_writer = self._open_writer(self._new_filename('mic'), 'mic', mic_info[2], self.RATE)
+        
+        # Start speaker recording
+        self.current_filename = self._new_filename('speaker')
+        self.speaker_writer = self._open_writer(self.current_filename, 'speaker', speaker_info['channels'], speaker_info['rate'])
+        
+        def mic_thread():
+            try:
+                stream = self.audio_mic.open(
+                    format=self.FORMAT,
+                    channels=mic_info[2],
+                    rate=self.RATE,
+                    input=True,
+                    input_device_index=mic_info[0],
+                    frames_per_buffer=self.CHUNK
+                )
+                
+                self._log(f"Microphone recording started with {mic_info[2]} channel(s)")
+                
+                while self.recording:
+                    try:
+                        data = self._read_block(stream, mic_info[2], "mic")
+                        self._deliver(self.mic_writer, data, "mic")
+                    except Exception as e:
+                        self._log(f"Error during mic recording: {str(e)}")
+                        break
+                
+                stream.stop_stream()
+                stream.close()
+                
+            except Exception as e:
+                self._log(f"Error setting up mic stream: {str(e)}")
+        
+        def speaker_thread():
+            try:
+                self.audio_speaker = self.speaker_audio_factory()
+
+                def callback(in_data, frame_count, time_info, status):
+                    if self.recording:
+                        self._callback_block("speaker", frame_count, time_info, status)
+                        self._deliver(self.speaker_writer, in_data, "speaker")
+                        return (in_data, PA_CONTINUE)
+                    return (None, PA_COMPLETE)
+
+                self.stream = self.audio_speaker.open(
+                    format=PA_INT16,
+                    channels=speaker_info['channels'],
+                    rate=speaker_info['rate'],
+                    frames_per_buffer=self.CHUNK,
+                    input=True,
+                    input_device_index=speaker_info['index'],
+                    stream_callback=callback
+                )
+
+                self._log(f"Speaker recording started from: {speaker_info['name']}")
+
+            except Exception as e:
+                self._log(f"Recording error: {str(e)}")
+        
+        # Start both threads
+        self.mic_thread = threading.Thread(target=mic_thread, daemon=True)
+        self.mic_thread.start()
+        self.speaker_thread = threading.Thread(target=speaker_thread, daemon=True)
+        self.speaker_thread.start()
+        return True
+    
+    def _join_thread(self, name):
+        """Wait, at most THREAD_JOIN_TIMEOUT, for a capture thread to finish before its writer is closed.
+
+        The mic thread ends after its last blocking read; the speaker thread
+        once its callback stream is open, so joining it means self.stream is
+        set (or failed) and can be closed.
+        """
+        thread = getattr(self, name)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=THREAD_JOIN_TIMEOUT)
+            if thread.is_alive():
+                self._log(f"{name} did not finish within {THREAD_JOIN_TIMEOUT:.0f}s")
+        setattr(self, name, None)
+        
+    def stop_recording(self, recording_type="mic"):
+        """Stop recording and save the file"""
+        if not self.recording:
+            return None
+            
+        self.recording = False
+        self._rotate_pending.clear()
+        
+        if recording_type == "mic":
+            self._join_thread('mic_thread')
+            try:
+                filename = self._close_writer(self.mic_writer, 'mic')
+                self.mic_writer = None
+                self._join_segment_closers()
+                return filename
+            except Exception as e:
+                self._log(f"Error saving recording: {str(e)}")
+                return None
+        else:  # speaker
+            self._join_thread('speaker_thread')
+            try:
+                if self.stream:
+                    self.stream.stop_stream()
+                    self.stream.close()
+                    self.stream = None
+                    
+                filename = self._close_writer(self.speaker_writer, 'speaker')
+                self.speaker_writer = None
+                    
+                if self.audio:
+                    self.audio.terminate()
+                    self.audio = None
+                    
+                self._join_segment_closers()
+                return filename
+            except Exception as e:
+                self._log(f"Error stopping recording: {str(e)}")
+                return None
+
+    def stop_both_recordings(self):
+        """Stop both recordings and save files"""
+        if not self.recording:
+            return None, None
+            
+        self.recording = False
+        self._rotate_pending.clear()
+        
+        try:
+            # Properly close streams first; stop_stream returns once the last callback has run
+            self._join_thread('speaker_thread')
+            try:
+                if self.stream:
+                    self.stream.stop_stream()
+                    self.stream.close()
+                    self.stream = None
+            except Exception as e:
+                self._log(f"Error closing speaker stream: {str(e)}")
+
+            # Flush the speaker file
+            speaker_file = None
+            try:
+                speaker_file = self._close_writer(self.speaker_writer, 'speaker')
+                self.speaker_writer = None
+            except Exception as e:
+                self._log(f"Error closing speaker file: {str(e)}")
+
+            # Save microphone recording
+            self._join_thread('mic_thread')
+            mic_filename = None
+            try:
+                mic_filename = self._close_writer(self.mic_writer, 'mic')
+                self.mic_writer = None
+            except Exception as e:
+                self._log(f"Error saving microphone recording: {str(e)}")
+
+            # Rotated segments still closing in the background
+            self._join_segment_closers()
+
+            # Clean up audio instances
+            try:
+                if hasattr(self, 'audio_speaker'):
+                    self.audio_speaker.terminate()
+                    delattr(self, 'audio_speaker')
+            except Exception as e:
+                self._log(f"Error terminating speaker audio: {str(e)}")
+
+            try:
+                if hasattr(self, 'audio_mic'):
+                    self.audio_mic.terminate()
+                    delattr(self, 'audio_mic')
+            except Exception as e:
+                self._log(f"Error terminating microphone audio: {str(e)}")
+
+            return mic_filename, speaker_file
+            
+        except Exception as e:
+            self._log(f"Error in stop_both_recordings: {str(e)}")
+            return None, None
+    
+    def shutdown(self):
+        """Stop whatever is being recorded and flush its files; returns the saved filenames"""
+        if not self.recording:
+            return []
+        if self.mic_writer is not None and self.speaker_writer is not None:
+            return [f for f in self.stop_both_recordings() if f]
+        saved = self.stop_recording('speaker' if self.speaker_writer is not None or self.speaker_thread else 'mic')
+        return [saved] if saved else []
+    
+    def __del__(self):
+        """Cleanup"""
+        if self.audio:
+            self.audio.terminate()
@@ -0,0 +1,56 @@
+import gc
+import time
+import click
+from asr_track import asr_windows
+from assisted_decoding import default_assistant
+from transcribers import HuggingFaceTranscriber
+
+
+def decode_all(transcriber, chunks):
+    """Text per chunk, total decode wall time and generated token count"""
+    texts = []
+    tokens = 0
+    start = time.perf_counter()
+    for index, (offset, samples, _) in enumerate(chunks):
+        segment = transcriber.transcribe_chunk(samples, offset, offset + len(samples) / 16000.0, index)
+        texts.append(segment.text)
+        tokens += len(transcriber.processor.tokenizer(segment.text, add_special_tokens=False).input_ids)
+    return texts, time.perf_counter() - start, tokens
+
+
+@click.command()
+@click.option('--file', 'audio_file', required=True, type=click.Path(exists=True), help="Recording with speech")
+@click.option('--model', 'model_id', default="openai/whisper-large-v3", help="Main model")
+@click.option('--assistant', 'assistant_id', default=None, help="Draft model (default: the matching distil-whisper)")
+@click.option('--max_chunks', default=20, type=int, help="30 s chunks to decode")
+def main(audio_file, model_id, assistant_id, max_chunks):
+    """Wall time and tokens/sec of plain vs assisted decoding, and whether the text matches"""
+    assistant_id = assistant_id or default_assistant(model_id)
+    if assistant_id is None:
+        raise click.UsageError(f"No known draft model for {model_id}; pass --assistant")
+    chunks = []
+    for window in asr_windows(audio_file, 30.0, 0.0):
+        chunks.append(window)
+        if len(chunks) >= max_chunks:
+            break
+
+    results = {}
+    for label, draft in (('plain', None), ('assisted', assistant_id)):
+        transcriber = HuggingFaceTranscriber()
+        transcriber.initialize_model(model_id, draft)
+        decode_all(transcriber, chunks[:1])  # Warm-up
+        results[label] = decode_all(transcriber, chunks)
+        del transcriber
+        gc.collect()
+
+    print(f"{model_id} on {len(chunks)} chunks of {audio_file}, draft {assistant_id}")
+    for label, (texts, wall, tokens) in results.items():
+        print(f"{label:>9}: {wall:.1f}s, {tokens} tokens, {tokens / wall:.1f} tokens/s")
+    plain_texts, assisted_texts = results['plain'][0], results['assisted'][0]
+    mismatches = sum(1 for a, b in zip(plain_texts, assisted_texts) if a != b)
+    print(f"speed-up {results['plain'][1] / results['assisted'][1]:.2f}x, "
+          f"{mismatches} of {len(chunks)} chunks differ from plain greedy output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import re
+import click
+import numpy as np
+from asr_track import ASR_RATE
+from cloud_transcription import CloudTranscriber, API_URL_ENV, plan_pieces, piece_audio
+from cloud_standin import StandInServer
+
+
+def conversation(minutes, seed=0):
+    """16 kHz mono float32 stand-in for one side of a call: speech bursts between pauses over faint noise"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * ASR_RATE)
+    audio = 0.002 * rng.standard_normal(total).astype(np.float32)
+    position = int(rng.uniform(0.5, 3.0) * ASR_RATE)
+    while position < total:
+        length = min(int(rng.uniform(2.0, 15.0) * ASR_RATE), total - position)
+        t = np.arange(length) / float(ASR_RATE)
+        # Syllable-rate envelope over noise keeps FLAC from compressing it unrealistically well
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, 2 * np.pi))
+        audio[position:position + length] += (0.1 * envelope * rng.standard_normal(length)).astype(np.float32)
+        position += length + int(rng.uniform(0.5, 6.0) * ASR_RATE)
+    return audio
+
+
+def run(url, samples, trim_silence, audio_format, max_in_flight):
+    transcriber = CloudTranscriber()
+    transcriber.trim_silence = trim_silence
+    transcriber.max_in_flight = max_in_flight
+    os.environ[API_URL_ENV] = url
+    transcriber.initialize_model("whisper-1")
+    transcriber.client.audio_format = audio_format
+    segments = list(transcriber._transcribe_samples(samples))
+    # The stand-in echoes each upload's duration, so out-of-order results would show up here
+    pieces = plan_pieces(samples, transcriber.client.max_piece_s, trim_silence)
+    expected = [len(piece_audio(samples, piece)) / float(ASR_RATE) for piece in pieces]
+    echoed = [sum(float(s) for s in re.findall(r'\[([\d.]+)s of audio', segment.text)) for segment in segments]
+    in_order = len(echoed) == len(expected) and all(abs(a - b) < 0.05 for a, b in zip(echoed, expected))
+    stats = transcriber.client.metrics.stats(transcriber.client.pool.created)
+    transcriber.client.close()
+    return stats, in_order
+
+
+@click.command()
+@click.option('--minutes', default=30.0, type=float, help="Length of the generated recording")
+@click.option('--latency', 'latency_s', default=0.3, type=float, help="Stand-in seconds per request")
+@click.option('--per_audio_s', 'seconds_per_audio_s', default=0.01, type=float,
+              help="Stand-in seconds per second of audio")
+@click.option('--failure_rate', default=0.1, type=float, help="Share of requests the stand-in fails with 503")
+@click.option('--max_in_flight', default=4, type=int)
+@click.option('--max_upload_mb', default=25.0, type=float, help="Stand-in request size limit")
+def main(minutes, latency_s, seconds_per_audio_s, failure_rate, max_in_flight, max_upload_mb):
+    """Sequential whole-audio WAV uploads vs trimmed FLAC uploads in a concurrent window, against the stand-in"""
+    samples = conversation(minutes)
+    configurations = (
+        ('sequential, untrimmed WAV', False, 'wav', 1),
+        (f'{max_in_flight} in flight, trimmed FLAC', True, 'flac', max_in_flight),
+    )
+    for label, trim_silence, audio_format, in_flight in configurations:
+        server = StandInServer(latency_s=latency_s, seconds_per_audio_s=seconds_per_audio_s,
+                               failure_rate=failure_rate, max_upload_bytes=int(max_upload_mb * 1024 * 1024),
+                               retry_after=0, seed=1)
+        url = server.start()
+        try:
+            stats, in_order = run(url, samples, trim_silence, audio_format, in_flight)
+        finally:
+            server.stop()
+        served = server.stats()
+        print(f"{label}:")
+        print(f"  {stats['wall_s']:.1f}s wall, {stats['realtime_factor']:.0f}x real time, "
+              f"{stats['bytes_uploaded'] / 1e6:.1f} MB uploaded for {stats['uploaded_audio_s'] / 60:.1f} "
+              f"of {stats['audio_s'] / 60:.1f} min")
+        print(f"  {stats['requests']} requests ({stats['retries']} retried, {stats['splits']} split), "
+              f"{served['connections']} connection(s), up to {served['max_in_flight']} in flight, "
+              f"results {'in order' if in_order else 'OUT OF ORDER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import json
+import re
+import subprocess
+import sys
+import click
+
+ENTRY_POINTS = (
+    'wx_record_both', 'wx_record_mic_audio', 'wx_record_speakers_audio', 'wx_transcribe',
+    'wx_async_transcribe', 'record_headless', 'speech2text', 'search_calls', 'build_peaks',
+)
+HEAVY_MODULES = (
+    'wx', 'torch', 'torchaudio', 'transformers', 'noisereduce', 'scipy', 'pydub',
+    'sounddevice', 'soundfile', 'pyaudio', 'pyaudiowpatch', 'win32gui', 'numpy',
+)
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def import_profile(module):
+    """Import module in a fresh interpreter; returns total microseconds, heavy modules loaded and any error"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    total = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        if len(match.group(3)) == 1:
+            total += int(match.group(2))  # Top-level entries carry the cumulative time of their subtree
+        if name.split('.')[0] in HEAVY_MODULES:
+            loaded.add(name.split('.')[0])
+    error = None
+    if result.returncode:
+        error = (result.stderr.strip().splitlines() or ['failed'])[-1]
+    return {'module': module, 'import_ms': round(total / 1000.0, 1),
+            'heavy': sorted(loaded, key=HEAVY_MODULES.index), 'error': error}
+
+
+@click.command()
+@click.option('--module', 'modules', multiple=True, help="Entry point to profile (default: all scripts)")
+@click.option('--repeat', default=3, type=int, help="Runs per entry point; the fastest is reported")
+@click.option('--json', 'as_json', is_flag=True, help="Print the profiles as JSON")
+def main(modules, repeat, as_json):
+    """Startup import cost of each entry point, measured with python -X importtime"""
+    profiles = []
+    for module in modules or ENTRY_POINTS:
+        # The fastest run is the one least disturbed by disk cache misses and other processes
+        runs = [import_profile(module) for _ in range(max(1, repeat))]
+        profiles.append(min(runs, key=lambda profile: profile['import_ms']))
+    if as_json:
+        click.echo(json.dumps(profiles, indent=1))
+        return
+    for profile in profiles:
+        line = f"{profile['module']:<26} {profile['import_ms']:>8.1f} ms  {', '.join(profile['heavy']) or '-'}"
+        if profile['error']:
+            line += f"  [{profile['error']}]"
+        click.echo(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import click
+import numpy as np
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 2 ** 20
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024.0
+
+
+def make_test_file(path, minutes, rate=48000, channels=2):
+    """Write a long stereo FLAC in one-minute blocks (tones over noise)"""
+    import soundfile as sf
+    rng = np.random.default_rng(0)
+    with sf.SoundFile(path, 'w', samplerate=rate, channels=channels, format='FLAC', subtype='PCM_16') as f:
+        for minute in range(int(minutes)):
+            t = np.arange(rate * 60) / float(rate) + minute * 60
+            tone = 0.2 * np.sin(2 * np.pi * (200 + 20 * (minute % 10)) * t)
+            block = tone[:, None] + 0.02 * rng.standard_normal((t.size, channels))
+            f.write((block * 32767).astype(np.int16))
+
+
+def run_one(audio_file, model_id, long_form, batch_size):
+    from transcribers import HuggingFaceTranscriber
+    transcriber = HuggingFaceTranscriber()
+    transcriber.initialize_model(model_id)
+    model_rss = peak_rss_mb()
+    progress_updates = []
+    start = time.perf_counter()
+    segments = list(transcriber.transcribe_file(audio_file, progress_callback=lambda p, m: progress_updates.append(p),
+                                                long_form=long_form, batch_size=batch_size))
+    return {
+        'mode': 'long-form' if long_form else 'whole file',
+        'wall_s': time.perf_counter() - start,
+        'model_rss_mb': model_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'segments': len(segments),
+        'progress_updates': len(progress_updates),
+    }
+
+
+@click.command()
+@click.option('--file', 'audio_file', default=None, type=click.Path(), help="Recording to transcribe (default: generate one)")
+@click.option('--minutes', default=90, type=int, help="Length of the generated recording")
+@click.option('--model', 'model_id', default="openai/whisper-base", help="Model to benchmark with")
+@click.option('--batch_size', default=4, type=int, help="Long-form batch size")
+@click.option('--mode', type=click.Choice(['both', 'whole', 'long']), default='both')
+@click.option('--child', is_flag=True, hidden=True)
+def main(audio_file, minutes, model_id, batch_size, mode, child):
+    """Peak RSS and wall time of whole-file vs long-form transcription, each in a fresh process"""
+    if child:
+        print(json.dumps(run_one(audio_file, model_id, mode == 'long', batch_size)))
+        return
+    if audio_file is None:
+        audio_file = os.path.join('output', f'bench_{minutes}min.flac')
+        if not os.path.exists(audio_file):
+            os.makedirs('output', exist_ok=True)
+            print(f"Generating {minutes} min test recording: {audio_file}")
+            make_test_file(audio_file, minutes)
+
+    for run_mode in (['whole', 'long'] if mode == 'both' else [mode]):
+        command = [sys.executable, __file__, '--file', audio_file, '--model', model_id,
+                   '--batch_size', str(batch_size), '--mode', run_mode, '--child']
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+        if completed.returncode or not lines:
+            print(f"{run_mode}: failed\n{completed.stderr[-2000:]}")
+            continue
+        result = json.loads(lines[-1])
+        print(f"{result['mode']:>10}: {result['wall_s']:.1f}s wall, peak RSS {result['peak_rss_mb']:.0f} MB "
+              f"({result['peak_rss_mb'] - result['model_rss_mb']:+.0f} MB over the loaded model), "
+              f"{result['segments']} segments, {result['progress_updates']} progress updates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import tempfile
+import threading
+import time
+import click
+import numpy as np
+from recording_catalog import audio_info
+from virtual_devices import VirtualAudioHost, VirtualInputDevice, SignalSource
+from audio_recorder import AudioRecorder, THREAD_JOIN_TIMEOUT
+from window_monitor import WindowMonitor
+
+
+def make_recorder(seconds, out_dir):
+    mic = VirtualInputDevice('Virtual Microphone', SignalSource('sine', 44100, 1, seconds + 60))
+    speaker = VirtualInputDevice('Virtual Speakers [Loopback]', SignalSource('noise', 48000, 2, seconds + 60),
+                                 is_loopback=True)
+    recorder = AudioRecorder()
+    recorder.out_dir = out_dir
+    recorder.use_virtual_host(VirtualAudioHost([mic, speaker]))
+    return recorder
+
+
+def start_recording(recorder, mode):
+    mic_info = recorder.get_microphones()[0]
+    speaker_info = recorder.get_speakers()[0]
+    if mode == 'both':
+        recorder.start_both_recordings(mic_info, speaker_info)
+    elif mode == 'mic':
+        recorder.start_recording_mic(mic_info[0], mic_info[2])
+    else:
+        recorder.start_recording_speaker(speaker_info)
+
+
+def stop_trial(seconds, mode, out_dir):
+    """Record in real time, then time stop -> files readable and shutdown -> recorder threads gone"""
+    baseline = threading.active_count()
+    recorder = make_recorder(seconds, out_dir)
+    start_recording(recorder, mode)
+    time.sleep(seconds)
+
+    started = time.perf_counter()
+    files = recorder.shutdown()
+    for filename in files:
+        if audio_info(filename)[0] is None:
+            raise click.ClickException(f"{filename} is not readable after stop")
+    ready = time.perf_counter() - started
+    recorder.release_shared_audio()
+    # Any thread still alive here would have outlived the app's close
+    while threading.active_count() > baseline and time.perf_counter() - started < 5.0:
+        time.sleep(0.001)
+    exited = time.perf_counter() - started
+    return ready, exited, threading.active_count() - baseline
+
+
+def close_trial(seconds, mode, out_dir):
+    """Close while recording, in the order the GUI's on_close does: monitor thread, recorder, shared audio"""
+    baseline = threading.active_count()
+    recorder = make_recorder(seconds, out_dir)
+    monitor = WindowMonitor(lambda: None)
+    monitor.start()
+    start_recording(recorder, mode)
+    time.sleep(seconds)
+
+    started = time.perf_counter()
+    monitor.close()
+    recorder.shutdown()
+    recorder.release_shared_audio()
+    monitor.close(timeout=THREAD_JOIN_TIMEOUT)
+    closed = time.perf_counter() - started
+    return closed, threading.active_count() - baseline
+
+
+@click.command()
+@click.option('--seconds', default=1.0, type=float, help="Seconds recorded before each stop")
+@click.option('--trials', default=10, type=int)
+@click.option('--mode', default='both', type=click.Choice(['both', 'mic', 'speaker']))
+def main(seconds, trials, mode):
+    """Stop and close latency of real-time recordings from virtual devices, written to a temporary folder"""
+    ready = []
+    exited = []
+    closed = []
+    leaked = 0
+    for _ in range(trials):
+        # Recordings and their sidecars go with the folder
+        with tempfile.TemporaryDirectory() as out_dir:
+            r, e, left = stop_trial(seconds, mode, out_dir)
+        ready.append(r * 1000.0)
+        exited.append(e * 1000.0)
+        leaked = max(leaked, left)
+        with tempfile.TemporaryDirectory() as out_dir:
+            c, left = close_trial(seconds, mode, out_dir)
+        closed.append(c * 1000.0)
+        leaked = max(leaked, left)
+    for label, values in (('stop -> files ready', ready), ('stop -> threads exited', exited),
+                          ('close -> exit', closed)):
+        print(f"{label}: median {np.median(values):.1f} ms, max {np.max(values):.1f} ms")
+    if leaked:
+        print(f"{leaked} thread(s) still running 5 s after stop")
+
+
+if __name__ == "__main__":
+    main()
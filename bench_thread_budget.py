@@ -0,0 +1,100 @@
+import json
+import subprocess
+import sys
+import time
+import click
+from thread_budget import ThreadBudget, apply_thread_budget
+
+
+def matmul_units(units, size=1024):
+    """Encoder-sized float32 matrix products, on torch if installed, otherwise NumPy/BLAS"""
+    try:
+        import torch
+        a = torch.randn(size, size)
+        b = torch.randn(size, size)
+        multiply = torch.matmul
+    except ImportError:
+        import numpy as np
+        a = np.random.rand(size, size).astype(np.float32)
+        b = np.random.rand(size, size).astype(np.float32)
+        multiply = np.matmul
+    multiply(a, b)  # Warm-up
+    start = time.time()
+    for _ in range(units):
+        multiply(a, b)
+    return start, time.time()
+
+
+def whisper_units(units, audio_file, model_id):
+    """Transcribe the first `units` 30 s chunks of audio_file"""
+    from asr_track import asr_windows
+    from transcribers import HuggingFaceTranscriber
+    chunks = []
+    for window in asr_windows(audio_file, 30.0, 0.0):
+        chunks.append(window)
+        if len(chunks) >= units:
+            break
+    transcriber = HuggingFaceTranscriber()
+    transcriber.initialize_model(model_id)
+    start = time.time()
+    for index, (offset, samples, _) in enumerate(chunks):
+        apply_thread_budget()
+        transcriber.transcribe_chunk(samples, offset, offset + len(samples) / 16000.0, index)
+    return start, time.time()
+
+
+def run_jobs(jobs, worker_args, budget):
+    """Launch `jobs` workers at once; returns units/s over the span where any of them was working"""
+    processes = []
+    for i in range(jobs):
+        env = budget.acquire(f'bench{i}') if budget else None
+        processes.append(subprocess.Popen([sys.executable, __file__, '--worker'] + worker_args,
+                                          stdout=subprocess.PIPE, env=env))
+    spans = []
+    for i, process in enumerate(processes):
+        output, _ = process.communicate()
+        if budget:
+            budget.release(f'bench{i}')
+        if process.returncode:
+            raise click.ClickException(f"Worker exited with code {process.returncode}")
+        spans.append(json.loads(output.decode().strip().splitlines()[-1]))
+    units = sum(span['units'] for span in spans)
+    wall = max(span['end'] for span in spans) - min(span['start'] for span in spans)
+    return units / wall, wall
+
+
+@click.command()
+@click.option('--workload', type=click.Choice(['matmul', 'whisper']), default='matmul', help="What each job runs")
+@click.option('--units', default=40, type=int, help="Matrix products, or 30 s chunks for whisper, per job")
+@click.option('--file', 'audio_file', default=None, type=click.Path(exists=True), help="Recording for the whisper workload")
+@click.option('--model', 'model_id', default="openai/whisper-base", help="Model for the whisper workload")
+@click.option('--jobs', default='1,2,4', help="Concurrent job counts to compare")
+@click.option('--pin', is_flag=True, help="Also pin each job to its own cores")
+@click.option('--worker', is_flag=True, hidden=True)
+def main(workload, units, audio_file, model_id, jobs, pin, worker):
+    """Total throughput of 1, 2 and 4 concurrent inference jobs, with and without the thread budget"""
+    if worker:
+        apply_thread_budget()
+        if workload == 'whisper':
+            start, end = whisper_units(units, audio_file, model_id)
+        else:
+            start, end = matmul_units(units)
+        print(json.dumps({'start': start, 'end': end, 'units': units}))
+        return
+    if workload == 'whisper' and not audio_file:
+        raise click.UsageError("--file is required for the whisper workload")
+
+    worker_args = ['--workload', workload, '--units', str(units), '--model', model_id]
+    if audio_file:
+        worker_args += ['--file', audio_file]
+    budget = ThreadBudget(reserved=0, pin=pin)
+    print(f"{workload} x {units} units per job, {len(budget.cores)} cores")
+    print(f"{'jobs':>4} {'default units/s':>16} {'budgeted units/s':>17} {'gain':>6}")
+    for count in [int(n) for n in jobs.split(',')]:
+        before, _ = run_jobs(count, worker_args, None)
+        after, _ = run_jobs(count, worker_args, budget)
+        print(f"{count:>4} {before:>16.2f} {after:>17.2f} {after / before:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import time
+import click
+from waveform_peaks import compute_peaks, load_peaks, peaks_path
+
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+
+
+def audio_files(path):
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, _, names in os.walk(path):
+        for name in sorted(names):
+            if name.lower().endswith(AUDIO_EXTENSIONS) and not name.endswith('.asr16k.wav'):
+                yield os.path.join(root, name)
+
+
+@click.command()
+@click.argument('path', default='output', type=click.Path(exists=True))
+@click.option('--force', is_flag=True, help="Rebuild sidecars that are already up to date")
+@click.option('--silences', is_flag=True, help="List silent stretches of each file")
+@click.option('--min_silence', default=5.0, type=float, help="Shortest silence to list, in seconds")
+def main(path, force, silences, min_silence):
+    """Build waveform peak sidecars for recordings made before they were written during capture"""
+    built = 0
+    start = time.perf_counter()
+    for audio_file in audio_files(path):
+        sidecar = peaks_path(audio_file)
+        if force or not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(audio_file):
+            if compute_peaks(audio_file) is None:
+                continue
+            built += 1
+        if silences:
+            peaks = load_peaks(audio_file, build=False)
+            spans = peaks.silences(min_s=min_silence)
+            click.echo(f"{audio_file}: {peaks.duration:.0f}s, {len(spans)} silences, "
+                       f"{sum(end - begin for begin, end in spans):.0f}s silent")
+            for begin, end in spans:
+                click.echo(f"  {begin:8.1f}s - {end:8.1f}s")
+    click.echo(f"Built {built} sidecars in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
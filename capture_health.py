@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+
+HEALTH_SUFFIX = '.health.json'
+# Upper edges (ms) of the inter-arrival jitter histogram; the last bucket is open-ended
+JITTER_BUCKETS_MS = (1, 2, 5, 10, 20, 50)
+PA_INPUT_UNDERFLOW = 1  # paInputUnderflow
+PA_INPUT_OVERFLOW = 2  # paInputOverflow
+
+
+def health_path(audio_file):
+    return os.path.splitext(audio_file)[0] + HEALTH_SUFFIX
+
+
+def status_flags(status):
+    """(overflow, underflow) from a PortAudio status int or a sounddevice CallbackFlags"""
+    if hasattr(status, 'input_overflow'):
+        return bool(status.input_overflow), bool(status.input_underflow)
+    status = int(status or 0)
+    return bool(status & PA_INPUT_OVERFLOW), bool(status & PA_INPUT_UNDERFLOW)
+
+
+def callback_latency(time_info):
+    """Seconds from the ADC capturing a block to its callback running, or None.
+
+    PyAudio passes a dict, sounddevice a struct with camel-case fields.
+    """
+    if isinstance(time_info, dict):
+        adc, now = time_info.get('input_buffer_adc_time'), time_info.get('current_time')
+    else:
+        adc, now = getattr(time_info, 'inputBufferAdcTime', None), getattr(time_info, 'currentTime', None)
+    if not adc or not now or now < adc:
+        return None
+    return now - adc
+
+
+class CaptureHealth:
+    """Live health statistics of one capture stream.
+
+    Counts overflows and underflows and, for every delivered block, how far
+    its arrival strayed from the nominal buffer period (a histogram of
+    |interval - period|), how full the host buffer was before the read and
+    the input latency. Overflows with little jitter point at a consumer
+    that is too slow; overflows with heavy jitter at a frames_per_buffer
+    too small for the device.
+    """
+    def __init__(self, source, rate, frames_per_buffer, clock=time.perf_counter):
+        self.source = source
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.blocks = 0
+        self.frames = 0
+        self.overflows = 0
+        self.underflows = 0
+        self.jitter_histogram = [0] * (len(JITTER_BUCKETS_MS) + 1)
+        self._last_arrival = None
+        self._jitter_sum = 0.0
+        self._jitter_max = 0.0
+        self._fill_sum = 0.0
+        self._fill_max = 0.0
+        self._fill_count = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latency_count = 0
+
+    def block(self, frames, status=0, latency_s=None, fill_frames=None):
+        """Record one delivered block; status is the stream callback's status flags"""
+        now = self._clock()
+        overflow, underflow = status_flags(status)
+        with self._lock:
+            if self._last_arrival is not None:
+                jitter_ms = abs(now - self._last_arrival - frames / float(self.rate)) * 1000.0
+                bucket = 0
+                while bucket < len(JITTER_BUCKETS_MS) and jitter_ms > JITTER_BUCKETS_MS[bucket]:
+                    bucket += 1
+                self.jitter_histogram[bucket] += 1
+                self._jitter_sum += jitter_ms
+                self._jitter_max = max(self._jitter_max, jitter_ms)
+            self._last_arrival = now
+            self.blocks += 1
+            self.frames += frames
+            self.overflows += overflow
+            self.underflows += underflow
+            if fill_frames is not None:
+                fill = fill_frames / float(self.frames_per_buffer)
+                self._fill_sum += fill
+                self._fill_max = max(self._fill_max, fill)
+                self._fill_count += 1
+            if latency_s is not None:
+                self._latency_sum += latency_s
+                self._latency_max = max(self._latency_max, latency_s)
+                self._latency_count += 1
+
+    def overflow(self):
+        """Record a read that failed with an input overflow"""
+        with self._lock:
+            self.overflows += 1
+            # The gap is the overflow, not jitter of the next block
+            self._last_arrival = None
+
+    def stats(self):
+        """Snapshot as a JSON-ready dict; safe to call while the stream runs"""
+        with self._lock:
+            intervals = sum(self.jitter_histogram)
+            labels = [f"<={edge}ms" for edge in JITTER_BUCKETS_MS] + [f">{JITTER_BUCKETS_MS[-1]}ms"]
+            return {
+                'source': self.source,
+                'rate': self.rate,
+                'frames_per_buffer': self.frames_per_buffer,
+                'elapsed_s': round(self._clock() - self.started, 3),
+                'blocks': self.blocks,
+                'audio_s': round(self.frames / float(self.rate), 3),
+                'overflows': self.overflows,
+                'underflows': self.underflows,
+                'jitter_ms': {
+                    'mean': round(self._jitter_sum / intervals, 3) if intervals else None,
+                    'max': round(self._jitter_max, 3),
+                    'histogram': dict(zip(labels, self.jitter_histogram)),
+                },
+                'buffer_fill': {
+                    'mean': round(self._fill_sum / self._fill_count, 3) if self._fill_count else None,
+                    'max': round(self._fill_max, 3) if self._fill_count else None,
+                },
+                'latency_ms': {
+                    'mean': round(self._latency_sum / self._latency_count * 1000.0, 3) if self._latency_count else None,
+                    'max': round(self._latency_max * 1000.0, 3) if self._latency_count else None,
+                },
+            }
+
+    def summary(self):
+        stats = self.stats()
+        text = (f"{self.source}: {stats['blocks']} blocks of {self.frames_per_buffer}, "
+                f"{stats['overflows']} overflow(s), {stats['underflows']} underflow(s)")
+        if stats['jitter_ms']['mean'] is not None:
+            text += f", jitter {stats['jitter_ms']['mean']:.1f}ms mean / {stats['jitter_ms']['max']:.1f}ms max"
+        if stats['latency_ms']['mean'] is not None:
+            text += f", latency {stats['latency_ms']['mean']:.1f}ms"
+        if stats['buffer_fill']['max'] is not None:
+            text += f", buffer fill up to {stats['buffer_fill']['max'] * 100:.0f}%"
+        return text
+
+    def save(self, audio_file):
+        """Write the stats next to a recording; returns the sidecar path"""
+        path = health_path(audio_file)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=1)
+        return path
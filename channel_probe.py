@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from level_meter import to_dbfs
+
+PROBE_SECONDS = 0.5
+LIVE_DB = -60.0
+CLIP_LEVEL = 32767
+FRAMES_PER_BUFFER = 1024
+PROBE_PATH = os.path.join('cache', 'channel_probe.json')
+PA_INT16 = 8  # pyaudio.paInt16
+PA_CONTINUE = 0
+
+
+def channel_stats(samples):
+    """Per-channel level statistics of int16 (frames, channels) samples.
+
+    Liveness uses the RMS with the DC offset removed, so a channel stuck at
+    a constant value does not count as carrying signal.
+    """
+    if not len(samples):
+        return []
+    wide = samples.astype(np.float64)
+    mean = wide.mean(axis=0)
+    rms = np.sqrt(np.mean(np.square(wide), axis=0))
+    ac_rms = wide.std(axis=0)
+    peak = np.abs(samples.astype(np.int32)).max(axis=0)
+    clipping = np.mean(np.abs(samples.astype(np.int32)) >= CLIP_LEVEL, axis=0)
+    stats = []
+    for channel in range(samples.shape[1]):
+        ac_db = to_dbfs(ac_rms[channel] / 32768.0)
+        stats.append({
+            'channel': channel,
+            'rms_db': round(to_dbfs(rms[channel] / 32768.0), 1),
+            'ac_rms_db': round(ac_db, 1),
+            'peak_db': round(to_dbfs(peak[channel] / 32768.0), 1),
+            'clipping': round(float(clipping[channel]), 4),
+            'dc_offset': round(float(mean[channel] / 32768.0), 4),
+            'live': ac_db > LIVE_DB,
+        })
+    return stats
+
+
+class _Capture:
+    def __init__(self, device):
+        self.device = device
+        self.blocks = []
+        self.stream = None
+        self.error = None
+        self.overflows = 0
+
+    def callback(self, in_data, frame_count, time_info, status):
+        if status:
+            self.overflows += 1
+        self.blocks.append(in_data)
+        return (None, PA_CONTINUE)
+
+
+class ChannelScanner:
+    """Probes every input device at once for a short window.
+
+    Replaces recording 20 s per device in turn: all candidate streams are
+    opened (one at a time, as PortAudio calls are not thread-safe) and
+    started together, so the whole scan takes about one probe window plus
+    the device open times. Each device's per-channel RMS, peak, clipping and
+    DC offset say which channels carry live signal. Loopback devices only
+    deliver audio while something is playing; a silent one reports no data.
+    """
+    def __init__(self, audio_factory=None, seconds=PROBE_SECONDS, callback=None):
+        self.audio_factory = audio_factory
+        self.seconds = seconds
+        self._callback = None
+        self.set_callback(callback)
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def _audio(self):
+        if self.audio_factory is not None:
+            return self.audio_factory()
+        from device_registry import portaudio_module
+        return portaudio_module().PyAudio()
+
+    def scan(self, devices):
+        """Probe registry-style device dicts; returns one JSON-ready result per device"""
+        audio = self._audio()
+        captures = [_Capture(device) for device in devices if device['max_input_channels'] > 0]
+        started = time.perf_counter()
+        try:
+            for capture in captures:
+                device = capture.device
+                try:
+                    capture.stream = audio.open(
+                        format=PA_INT16,
+                        channels=device['max_input_channels'],
+                        rate=int(device['default_rate']),
+                        input=True,
+                        input_device_index=device['index'],
+                        frames_per_buffer=FRAMES_PER_BUFFER,
+                        stream_callback=capture.callback,
+                        start=False
+                    )
+                except Exception as e:
+                    capture.error = str(e)
+            opened = [capture for capture in captures if capture.stream is not None]
+            for capture in opened:
+                try:
+                    capture.stream.start_stream()
+                except Exception as e:
+                    capture.error = str(e)
+            threading.Event().wait(self.seconds)
+            for capture in opened:
+                try:
+                    capture.stream.stop_stream()
+                    capture.stream.close()
+                except Exception as e:
+                    self._log(f"Error closing {capture.device['name']}: {str(e)}")
+        finally:
+            audio.terminate()
+        results = [self._result(capture) for capture in captures]
+        live = sum(1 for result in results if result['live_channels'])
+        self._log(f"Probed {len(results)} devices in {time.perf_counter() - started:.2f}s, {live} with live signal")
+        return results
+
+    def _result(self, capture):
+        device = capture.device
+        channels = device['max_input_channels']
+        data = b''.join(capture.blocks)
+        samples = np.frombuffer(data[:len(data) // (2 * channels) * 2 * channels], dtype=np.int16).reshape(-1, channels)
+        stats = channel_stats(samples)
+        return {
+            'index': device['index'],
+            'name': device['name'],
+            'host_api': device.get('host_api'),
+            'is_loopback': device['is_loopback'],
+            'rate': int(device['default_rate']),
+            'channels': channels,
+            'frames': len(samples),
+            'overflows': capture.overflows,
+            'error': capture.error or (None if len(samples) else 'no data'),
+            'channel_stats': stats,
+            'live_channels': [s['channel'] for s in stats if s['live']],
+        }
+
+
+def save_probe(results, path=PROBE_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'probed_at': time.time(), 'devices': results}, f, indent=1)
+    return path
+
+
+def load_probe(path=PROBE_PATH):
+    """Results of the last saved scan, or None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['devices']
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,186 @@
+import io
+import json
+import random
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import click
+from cloud_transcription import MAX_UPLOAD_BYTES
+
+
+def form_parts(body, content_type):
+    """{name: bytes} of a multipart/form-data body"""
+    boundary = content_type.split('boundary=')[-1].strip('"').encode('utf-8')
+    parts = {}
+    for chunk in body.split(b'--' + boundary)[1:]:
+        if chunk.startswith(b'--'):
+            break
+        head, _, value = chunk.partition(b'\r\n\r\n')
+        for field in head.decode('utf-8', 'replace').split(';'):
+            field = field.strip()
+            if field.startswith('name='):
+                parts[field[5:].strip('"')] = value[:-2] if value.endswith(b'\r\n') else value
+    return parts
+
+
+def audio_seconds(data):
+    """Duration of an uploaded WAV or FLAC file"""
+    if data[:4] == b'RIFF':
+        with wave.open(io.BytesIO(data), 'rb') as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    import soundfile as sf
+    return sf.info(io.BytesIO(data)).duration
+
+
+class StandInServer:
+    """Local stand-in for an OpenAI-style transcription endpoint.
+
+    Answers POSTs to any path with {"text": ...} describing the upload,
+    after latency_s plus seconds_per_audio_s for every second of audio.
+    failure_rate of the requests get a 503 and bodies over
+    max_upload_bytes a 413. Connections, in-flight requests and bytes
+    received are counted so a client's pooling and window can be checked.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency_s=0.2, seconds_per_audio_s=0.01,
+                 failure_rate=0.0, max_upload_bytes=MAX_UPLOAD_BYTES, retry_after=None, seed=None):
+        self.latency_s = latency_s
+        self.seconds_per_audio_s = seconds_per_audio_s
+        self.failure_rate = failure_rate
+        self.max_upload_bytes = max_upload_bytes
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.failed = 0
+            self.rejected = 0
+            self.bytes_received = 0
+            self.audio_s = 0.0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1/audio/transcriptions'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the hosted APIs
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                # The body is always read so the connection stays usable after an error reply
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_received += len(body)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    fail = server._random.random() < server.failure_rate
+                try:
+                    self.handle_upload(body, fail)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def handle_upload(self, body, fail):
+                if len(body) > server.max_upload_bytes:
+                    with server._lock:
+                        server.rejected += 1
+                    self.reply(413, {'error': {'message': f"Maximum content size is {server.max_upload_bytes} bytes"}})
+                    return
+                if fail:
+                    with server._lock:
+                        server.failed += 1
+                    time.sleep(server.latency_s)
+                    headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else None
+                    self.reply(503, {'error': {'message': "Service unavailable"}}, headers)
+                    return
+                parts = form_parts(body, self.headers.get('Content-Type', ''))
+                try:
+                    seconds = audio_seconds(parts['file'])
+                except Exception as e:
+                    self.reply(400, {'error': {'message': f"Could not decode audio: {str(e)}"}})
+                    return
+                with server._lock:
+                    server.audio_s += seconds
+                time.sleep(server.latency_s + seconds * server.seconds_per_audio_s)
+                model = parts.get('model', b'').decode('utf-8')
+                self.reply(200, {'text': f"[{seconds:.2f}s of audio, {len(parts['file'])} bytes, {model}]"})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'requests': self.requests,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'bytes_received': self.bytes_received,
+                'audio_s': round(self.audio_s, 3),
+                'max_in_flight': self.max_in_flight,
+            }
+
+
+@click.command()
+@click.option('--port', default=8765, type=int)
+@click.option('--latency', 'latency_s', default=0.2, type=float, help="Fixed seconds per request")
+@click.option('--per_audio_s', 'seconds_per_audio_s', default=0.01, type=float, help="Extra seconds per second of audio")
+@click.option('--failure_rate', default=0.0, type=float, help="Share of requests answered with 503")
+@click.option('--max_upload_bytes', default=MAX_UPLOAD_BYTES, type=int)
+def main(port, latency_s, seconds_per_audio_s, failure_rate, max_upload_bytes):
+    """Serve the stand-in endpoint until Ctrl+C; point WHISPER_API_URL at the printed URL"""
+    server = StandInServer(port=port, latency_s=latency_s, seconds_per_audio_s=seconds_per_audio_s,
+                           failure_rate=failure_rate, max_upload_bytes=max_upload_bytes)
+    print(f"Serving {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+import http.client
+import io
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+import wave
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+from asr_track import find_asr_track, asr_blocks, StreamingResampler, ASR_RATE
+from shared_audio import read_shared_audio
+from transcript import TranscriptSegment
+from transcribers import BaseTranscriber
+from voice_activation import NOISE_MARGIN_DB
+
+API_URL_ENV = 'WHISPER_API_URL'
+API_KEY_ENV = 'WHISPER_API_KEY'
+DEFAULT_API_URL = 'https://api.openai.com/v1/audio/transcriptions'
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# Multipart headers and form fields around the audio part
+UPLOAD_OVERHEAD_BYTES = 4096
+MAX_IN_FLIGHT = 4
+MAX_RETRIES = 4
+RETRY_BACKOFF_S = 0.5
+RETRY_AFTER_MAX_S = 30.0
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+REQUEST_TIMEOUT_S = 120.0
+# Pieces stay short enough that a long call is spread over the in-flight window
+PIECE_S = 120.0
+FRAME_S = 0.03
+SPEECH_PAD_S = 0.3
+MIN_GAP_S = 1.0
+SEPARATOR_S = 0.2
+SPLIT_SEARCH_S = 10.0
+# Only digital silence and the faintest hiss are below this; quiet speech is judged against the noise floor
+TRIM_FLOOR_DB = -70.0
+
+# start/end are sample offsets in the file; spans are the stretches actually uploaded
+Piece = namedtuple('Piece', 'start end spans')
+
+
+class CloudTranscriptionError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CloudMetrics:
+    """Request, retry and upload counters shared by all requests of a client"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.failures = 0
+            self.splits = 0
+            self.bytes_uploaded = 0
+            self.audio_s = 0.0
+            self.uploaded_audio_s = 0.0
+            self.request_s = 0.0
+            self.started = time.perf_counter()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def stats(self, connections=None):
+        with self._lock:
+            wall_s = time.perf_counter() - self.started
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'splits': self.splits,
+                'connections': connections,
+                'bytes_uploaded': self.bytes_uploaded,
+                'audio_s': round(self.audio_s, 3),
+                'uploaded_audio_s': round(self.uploaded_audio_s, 3),
+                'wall_s': round(wall_s, 3),
+                'realtime_factor': round(self.audio_s / wall_s, 2) if wall_s > 0 else None,
+                'upload_kbps': round(self.bytes_uploaded * 8 / 1000.0 / wall_s, 1) if wall_s > 0 else None,
+                'mean_request_s': round(self.request_s / self.requests, 3) if self.requests else None,
+            }
+
+    def summary(self, connections=None):
+        stats = self.stats(connections)
+        text = (f"{stats['requests']} request(s), {stats['retries']} retried, "
+                f"{stats['bytes_uploaded'] / 1e6:.2f} MB uploaded for {stats['audio_s'] / 60:.1f} min "
+                f"({stats['uploaded_audio_s'] / 60:.1f} min after trimming) in {stats['wall_s']:.1f}s")
+        if stats['realtime_factor'] is not None:
+            text += f", {stats['realtime_factor']:.1f}x real time"
+        if connections is not None:
+            text += f", {connections} connection(s)"
+        return text
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused across requests and threads"""
+    def __init__(self, url, timeout=REQUEST_TIMEOUT_S):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported API URL: {url}")
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.created = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            self.created += 1
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body, headers):
+        """Send one request; returns (status, Retry-After header, response body)"""
+        try:
+            connection, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            connection, reused = self._connect(), False
+        while True:
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+                connection.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection; that is not a failed attempt
+                connection, reused = self._connect(), False
+            except Exception:
+                connection.close()
+                raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        return response.status, response.getheader('Retry-After'), data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def multipart_body(fields, filename, data, content_type):
+    """(body, Content-Type header) of a multipart/form-data upload with one file part"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8'))
+    parts.append(data)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def encode_audio(samples, audio_format='flac'):
+    """(bytes, filename, content type) of 16 kHz mono float32 samples.
+
+    FLAC is lossless and about half the size of WAV on speech; WAV is
+    the fallback when soundfile is not installed.
+    """
+    pcm = np.clip(samples * 32768.0, -32768, 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    if audio_format == 'flac':
+        try:
+            import soundfile as sf
+        except ImportError:
+            audio_format = 'wav'
+        else:
+            sf.write(buffer, pcm, ASR_RATE, format='FLAC', subtype='PCM_16')
+            return buffer.getvalue(), 'audio.flac', 'audio/flac'
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(ASR_RATE)
+        wf.writeframes(pcm.tobytes())
+    return buffer.getvalue(), 'audio.wav', 'audio/wav'
+
+
+def load_speech_audio(audio_file, shared_name=None):
+    """16 kHz mono float32 samples, from shared memory, the ASR track or the recording"""
+    if shared_name:
+        try:
+            rate, audio = read_shared_audio(shared_name)
+            mono = np.clip(audio.mean(axis=0) * 32768.0, -32768, 32767).astype(np.int16)
+            if rate == ASR_RATE:
+                return mono.astype(np.float32) / 32768.0
+            resampler = StreamingResampler(rate, 1)
+            data = resampler.process(mono.tobytes()) + resampler.flush()
+            return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        except FileNotFoundError:
+            pass
+    blocks = list(asr_blocks(find_asr_track(audio_file) or audio_file))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def frame_levels(samples, frame):
+    """Level in dBFS of each whole frame of samples"""
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame)
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_regions(samples, threshold_db=TRIM_FLOOR_DB, pad_s=SPEECH_PAD_S, min_gap_s=MIN_GAP_S):
+    """(start, end) sample ranges holding speech, padded, with pauses under min_gap_s bridged.
+
+    Speech is what rises NOISE_MARGIN_DB over the recording's noise floor,
+    as in VoiceGate, so steady background noise is trimmed too;
+    threshold_db is only a low absolute floor.
+    """
+    frame = int(FRAME_S * ASR_RATE)
+    if len(samples) < frame:
+        return [(0, len(samples))] if len(samples) else []
+    levels = frame_levels(samples, frame)
+    threshold = max(threshold_db, float(np.percentile(levels, 10)) + NOISE_MARGIN_DB)
+    loud = np.flatnonzero(levels > threshold)
+    if not len(loud):
+        return []
+    pad = int(round(pad_s / FRAME_S))
+    gap = int(round(min_gap_s / FRAME_S)) + 2 * pad
+    breaks = np.flatnonzero(np.diff(loud) > gap)
+    starts = np.concatenate([loud[:1], loud[breaks + 1]])
+    ends = np.concatenate([loud[breaks], loud[-1:]])
+    return [(max(0, (start - pad) * frame), min(len(samples), (end + 1 + pad) * frame))
+            for start, end in zip(starts, ends)]
+
+
+def quietest_cut(samples, start, end):
+    """Sample offset of the quietest frame in [start, end)"""
+    frame = int(FRAME_S * ASR_RATE)
+    levels = frame_levels(samples[start:end], frame)
+    if not len(levels):
+        return (start + end) // 2
+    return start + int(np.argmin(levels)) * frame + frame // 2
+
+
+def split_long(samples, start, end, limit):
+    """Cut [start, end) into ranges of at most limit samples, at the quietest point near each limit"""
+    search = int(SPLIT_SEARCH_S * ASR_RATE)
+    ranges = []
+    while end - start > limit:
+        cut = quietest_cut(samples, start + max(limit - search, limit // 2), start + limit)
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, end))
+    return ranges
+
+
+def plan_pieces(samples, max_piece_s, trim_silence=True):
+    """Group the audio into upload pieces of at most max_piece_s.
+
+    With trim_silence only speech is uploaded: pieces break at pauses, and
+    the speech stretches of a piece are joined with a short separator
+    instead of the silence between them. Audio with no speech found is
+    uploaded whole rather than dropped.
+    """
+    limit = int(max_piece_s * ASR_RATE)
+    separator = int(SEPARATOR_S * ASR_RATE)
+    regions = speech_regions(samples) if trim_silence else []
+    if not regions and len(samples):
+        regions = [(0, len(samples))]
+    spans = []
+    for start, end in regions:
+        spans.extend(split_long(samples, start, end, limit))
+    pieces = []
+    current = []
+    length = 0
+    for start, end in spans:
+        added = end - start + (separator if current else 0)
+        if current and length + added > limit:
+            pieces.append(Piece(current[0][0], current[-1][1], current))
+            current, length, added = [], 0, end - start
+        current.append((start, end))
+        length += added
+    if current:
+        pieces.append(Piece(current[0][0], current[-1][1], current))
+    return pieces
+
+
+def piece_audio(samples, piece):
+    """The samples of a piece as uploaded: its spans joined by short silences"""
+    separator = np.zeros(int(SEPARATOR_S * ASR_RATE), dtype=np.float32)
+    parts = []
+    for start, end in piece.spans:
+        if parts:
+            parts.append(separator)
+        parts.append(samples[start:end])
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+class CloudClient:
+    """Concurrent client for an OpenAI-style /audio/transcriptions endpoint.
+
+    Connections are pooled and kept alive. At most max_in_flight pieces
+    are encoded and uploaded at a time, and results come back in order.
+    Throttling, server errors and dropped connections are retried with
+    jittered exponential backoff, honouring Retry-After. A piece the
+    server still rejects as too large is split at its quietest point.
+    """
+    def __init__(self, url=None, api_key=None, model='whisper-1', max_in_flight=MAX_IN_FLIGHT,
+                 max_retries=MAX_RETRIES, max_upload_bytes=MAX_UPLOAD_BYTES, audio_format='flac',
+                 timeout=REQUEST_TIMEOUT_S, callback=None):
+        self.url = url or os.environ.get(API_URL_ENV, DEFAULT_API_URL)
+        self.api_key = api_key if api_key is not None else os.environ.get(API_KEY_ENV, os.environ.get('OPENAI_API_KEY'))
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.max_upload_bytes = max_upload_bytes
+        self.audio_format = audio_format
+        self.pool = ConnectionPool(self.url, timeout)
+        self.metrics = CloudMetrics()
+        self._callback = callback
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    @property
+    def max_piece_s(self):
+        """Longest piece whose upload fits max_upload_bytes even as uncompressed WAV"""
+        return min(PIECE_S, (self.max_upload_bytes - UPLOAD_OVERHEAD_BYTES) / (2.0 * ASR_RATE))
+
+    def endpoint(self, task='transcribe'):
+        path = urlsplit(self.url).path or '/'
+        if task == 'translate':
+            path = path.replace('/transcriptions', '/translations')
+        return path
+
+    def post(self, path, fields, data, filename, content_type):
+        """Upload one audio file and return the transcript text, retrying transient failures"""
+        body, form_type = multipart_body(dict(fields, model=self.model, response_format='json'),
+                                         filename, data, content_type)
+        headers = {'Content-Type': form_type, 'Content-Length': str(len(body))}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                status, retry_after, response = self.pool.request('POST', path, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                status, response = None, str(e).encode('utf-8')
+            self.metrics.add(requests=1, bytes_uploaded=len(body), request_s=time.perf_counter() - started)
+            if status == 200:
+                return json.loads(response.decode('utf-8')).get('text', '')
+            message = response.decode('utf-8', 'replace')[:200]
+            if status is not None and status not in RETRY_STATUSES:
+                self.metrics.add(failures=1)
+                raise CloudTranscriptionError(f"HTTP {status}: {message}", status)
+            if attempt == self.max_retries:
+                break
+            self.metrics.add(retries=1)
+            delay = RETRY_BACKOFF_S * 2 ** attempt * (0.5 + random.random())
+            try:
+                delay = min(float(retry_after), RETRY_AFTER_MAX_S)
+            except (TypeError, ValueError):
+                pass
+            self._log(f"Upload failed ({status or message}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        self.metrics.add(failures=1)
+        raise CloudTranscriptionError(f"Giving up after {self.max_retries + 1} attempts: {status or message}", status)
+
+    def transcribe_samples(self, samples, fields=None, path=None):
+        """Transcript text of 16 kHz mono samples, halved at a pause while an upload is too large"""
+        data, filename, content_type = encode_audio(samples, self.audio_format)
+        if len(data) + UPLOAD_OVERHEAD_BYTES <= self.max_upload_bytes or len(samples) < 2 * ASR_RATE:
+            try:
+                return self.post(path or self.endpoint(), fields or {}, data, filename, content_type)
+            except CloudTranscriptionError as e:
+                if e.status != 413 or len(samples) < 2 * ASR_RATE:
+                    raise
+        self.metrics.add(splits=1)
+        cut = quietest_cut(samples, len(samples) // 4, 3 * len(samples) // 4)
+        texts = [self.transcribe_samples(samples[:cut], fields, path),
+                 self.transcribe_samples(samples[cut:], fields, path)]
+        return ' '.join(text.strip() for text in texts if text.strip())
+
+    def map_ordered(self, func, items):
+        """Yield func(item) for every item in order, with at most max_in_flight running"""
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = deque()
+            try:
+                for item in items:
+                    pending.append(executor.submit(func, item))
+                    if len(pending) >= self.max_in_flight:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def transcribe_pieces(self, samples, pieces, fields=None, task='transcribe'):
+        """Yield (piece, text) for each planned piece, in order"""
+        path = self.endpoint(task)
+
+        def upload(piece):
+            audio = piece_audio(samples, piece)
+            self.metrics.add(uploaded_audio_s=len(audio) / float(ASR_RATE))
+            return piece, self.transcribe_samples(audio, fields, path)
+        return self.map_ordered(upload, pieces)
+
+    def summary(self):
+        return self.metrics.summary(self.pool.created)
+
+    def close(self):
+        self.pool.close()
+
+
+class CloudTranscriber(BaseTranscriber):
+    """Whisper behind an OpenAI-compatible HTTP API.
+
+    The endpoint and key come from WHISPER_API_URL and WHISPER_API_KEY
+    (or OPENAI_API_KEY). With trim_silence (the default) only speech is
+    uploaded, as FLAC pieces of up to PIECE_S, several at a time.
+    """
+    name = "Cloud Whisper API"
+
+    def __init__(self):
+        self.client = None
+        self.model_id = None
+        self.trim_silence = True
+        self.max_in_flight = MAX_IN_FLIGHT
+        self.generate_kwargs = {"language": "en", "task": "transcribe"}
+        # Nothing runs locally, so there is no encoder output to cache
+        self.encoder_cache = None
+        self._callback = None
+
+    def set_callback(self, callback):
+        self._callback = callback
+        if self.client is not None:
+            self.client.set_callback(callback)
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def get_available_models(self):
+        return ["whisper-1", "gpt-4o-transcribe", "gpt-4o-mini-transcribe"]
+
+    def initialize_model(self, model_id, assistant_model_id=None):
+        """Set up the client; no request is made until there is audio to send"""
+        if self.client is not None:
+            self.client.close()
+        self.model_id = model_id
+        self.client = CloudClient(model=model_id, max_in_flight=self.max_in_flight, callback=self._callback)
+
+    def enable_encoder_cache(self, cache=None):
+        pass
+
+    @property
+    def metrics(self):
+        return self.client.metrics if self.client is not None else None
+
+    def _request_options(self):
+        task = self.generate_kwargs.get("task", "transcribe")
+        fields = {}
+        if task != 'translate' and self.generate_kwargs.get("language"):
+            fields['language'] = self.generate_kwargs["language"]
+        return fields, task
+
+    def transcribe_chunk(self, samples, start, end, chunk_index):
+        """Transcribe one 16 kHz mono float32 chunk into a TranscriptSegment"""
+        if self.client is None:
+            raise RuntimeError("Model not initialized. Call initialize_model first.")
+        fields, task = self._request_options()
+        self.client.metrics.add(audio_s=len(samples) / float(ASR_RATE),
+                                uploaded_audio_s=len(samples) / float(ASR_RATE))
+        text = self.client.transcribe_samples(samples, fields, self.client.endpoint(task))
+        return TranscriptSegment(text, start, end, chunk_index)
+
+    def _transcribe_samples(self, samples, progress_callback=None, checkpoint=None):
+        if self.client is None:
+            raise RuntimeError("Model not initialized. Call initialize_model first.")
+        if progress_callback:
+            progress_callback(0, "Starting transcription...")
+        if self.trim_silence and len(samples) and not speech_regions(samples):
+            message = "No speech found to trim to, uploading the audio untrimmed"
+            self._log(message)
+            if progress_callback:
+                progress_callback(0, message)
+        pieces = plan_pieces(samples, self.client.max_piece_s, self.trim_silence)
+        done = 0
+        # Pieces finished by an earlier, interrupted run are replayed, not uploaded again
+        if checkpoint is not None:
+            for segment in checkpoint.segments:
+                yield segment
+            done = checkpoint.next_chunk
+        self.client.metrics.reset()
+        self.client.metrics.add(audio_s=len(samples) / float(ASR_RATE))
+        fields, task = self._request_options()
+        for piece, text in self.client.transcribe_pieces(samples, pieces[done:], fields, task):
+            segment = TranscriptSegment(text, piece.start / float(ASR_RATE), piece.end / float(ASR_RATE), done)
+            if checkpoint is not None:
+                checkpoint.record(segment, piece.start)
+            done += 1
+            if progress_callback:
+                progress_callback(int(done / float(len(pieces)) * 100), f"Transcribed {done} of {len(pieces)} pieces...")
+            yield segment
+        if progress_callback:
+            progress_callback(100, f"Transcription complete! {self.client.summary()}")
+
+    def transcribe(self, audio_streamer, progress_callback=None, checkpoint=None):
+        samples = load_speech_audio(audio_streamer.audio_file, audio_streamer.shared_name)
+        return self._transcribe_samples(samples, progress_callback, checkpoint)
+
+    def transcribe_file(self, audio_file, progress_callback=None, **options):
+        """Yield TranscriptSegments of a whole file; the local pipeline's long-form options do not apply"""
+        return self._transcribe_samples(load_speech_audio(audio_file), progress_callback)
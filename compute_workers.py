@@ -0,0 +1,204 @@
+import importlib
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from thread_budget import apply_thread_budget, limit_threads
+
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+
+def default_workers():
+    """Leave one core for the capture process"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def lower_priority():
+    """Run the calling process below the capture process so it is preempted first"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(5)
+    except Exception:
+        pass
+
+
+def _init_worker(threads):
+    lower_priority()
+    limit_threads(threads)
+
+
+def _load(path):
+    """Resolve 'module:attribute' in the worker process"""
+    module_name, attribute = path.split(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class ComputeWorkers:
+    """Process pool for heavy NumPy / model work, kept out of the capture process.
+
+    Capture threads hold the GIL while they move bytes; running noise
+    reduction or inference in the same interpreter delays their reads long
+    enough to overflow the device buffer. Jobs here run in low-priority
+    worker processes, and at most max_pending jobs are queued or running so
+    a burst of requests cannot pile up unbounded memory. Each worker is
+    capped at threads_per_worker BLAS/torch threads so the pool as a whole
+    uses about max_workers cores. Jobs must be module-level functions with
+    picklable arguments.
+    """
+    def __init__(self, max_workers=None, max_pending=None, callback=None, threads_per_worker=1):
+        self.max_workers = max_workers or default_workers()
+        self.threads_per_worker = threads_per_worker
+        self.max_pending = max_pending or 2 * self.max_workers
+        self._callback = callback
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent has live audio threads
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker,
+                                                     initargs=(self.threads_per_worker,))
+            return self._executor
+
+    def submit(self, fn, *args, done=None, block=False):
+        """Queue fn(*args) on a worker; returns the Future, or None if the queue is full.
+
+        done(future) is called from a pool thread when the job finishes.
+        """
+        if not self._slots.acquire(blocking=block):
+            self._log("Compute workers busy, job not queued")
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        if done is not None:
+            future.add_done_callback(done)
+        return future
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _transcriber_main(transcriber_path, model_id, requests, responses, budget_file):
+    lower_priority()
+    if budget_file:
+        apply_thread_budget(budget_file)
+    try:
+        if model_id is None:
+            from transcribers import live_model_id
+            model_id = live_model_id()
+        transcriber = _load(transcriber_path)()
+        transcriber.initialize_model(model_id)
+    except Exception as e:
+        responses.put(('error', str(e)))
+        return
+    responses.put(('ready', model_id))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        if budget_file:
+            apply_thread_budget(budget_file)
+        try:
+            responses.put(('segment', transcriber.transcribe_chunk(*request)))
+        except Exception as e:
+            responses.put(('error', str(e)))
+
+
+class TranscriberProcess:
+    """transcribe_chunk() of a transcriber class, run in a dedicated child process.
+
+    Drop-in for HuggingFaceTranscriber in IncrementalTranscriber: the model
+    is loaded and run in the child, and the caller only waits on a queue
+    (without holding the GIL) while a chunk is transcribed. At most
+    max_pending chunks are in flight. With a budget_file from ThreadBudget
+    the child follows its share of the cores between chunks. A model_id of
+    None lets the child pick one that keeps up on its device.
+    """
+    def __init__(self, transcriber_path='transcribers:HuggingFaceTranscriber', max_pending=2, budget_file=None):
+        self.transcriber_path = transcriber_path
+        self.max_pending = max_pending
+        self.budget_file = budget_file
+        self.model_id = None
+        self.requested_model_id = None
+        self.pipe = None
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._lock = threading.Lock()
+
+    def initialize_model(self, model_id):
+        if self._process is not None and self.requested_model_id == model_id:
+            return
+        self.close()
+        context = multiprocessing.get_context('spawn')
+        self._requests = context.Queue(maxsize=self.max_pending)
+        self._responses = context.Queue()
+        self._process = context.Process(
+            target=_transcriber_main,
+            args=(self.transcriber_path, model_id, self._requests, self._responses, self.budget_file),
+            daemon=True
+        )
+        self._process.start()
+        kind, payload = self._receive()
+        if kind == 'error':
+            self._process.join()
+            self._process = None
+            raise RuntimeError(payload)
+        self.model_id = payload
+        self.requested_model_id = model_id
+        self.pipe = self._process
+
+    def _receive(self):
+        while True:
+            try:
+                return self._responses.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    return ('error', f"Transcriber process exited with code {self._process.exitcode}")
+
+    def transcribe_chunk(self, samples, start, end, chunk_index):
+        """Transcribe one 16 kHz mono float32 chunk into a TranscriptSegment"""
+        if self._process is None:
+            raise RuntimeError("Model not initialized. Call initialize_model first.")
+        with self._lock:
+            self._requests.put((samples, start, end, chunk_index))
+            kind, payload = self._receive()
+        if kind == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self, timeout=5.0):
+        if self._process is None:
+            return
+        try:
+            self._requests.put(None, timeout=timeout)
+        except Exception:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self.pipe = None
+        self.model_id = None
+        self.requested_model_id = None
@@ -0,0 +1,260 @@
+import sys
+import threading
+import time
+
+COMMON_RATES = (8000, 16000, 22050, 32000, 44100, 48000, 96000)
+
+
+def portaudio_module():
+    """pyaudiowpatch where installed (Windows, loopback aware), otherwise plain pyaudio"""
+    try:
+        import pyaudiowpatch
+        return pyaudiowpatch
+    except ImportError:
+        import pyaudio
+        return pyaudio
+
+
+class PyAudioBackend:
+    """Enumerates PortAudio devices through pyaudiowpatch (WASAPI loopback aware)"""
+    def quick_signature(self):
+        """Cheap device-count check that does not initialise PortAudio (Windows only)"""
+        if sys.platform != 'win32':
+            return None
+        try:
+            import ctypes
+            winmm = ctypes.windll.winmm
+            return (winmm.waveInGetNumDevs(), winmm.waveOutGetNumDevs())
+        except Exception:
+            return None
+
+    def enumerate(self):
+        """Return (devices, default_output_name) using a single PortAudio session"""
+        portaudio = portaudio_module()
+        devices = []
+        default_output_name = None
+        p = portaudio.PyAudio()
+        try:
+            for i in range(p.get_device_count()):
+                info = p.get_device_info_by_index(i)
+                devices.append({
+                    'index': i,
+                    'name': info['name'],
+                    'host_api': info['hostApi'],
+                    'max_input_channels': int(info['maxInputChannels']),
+                    'max_output_channels': int(info['maxOutputChannels']),
+                    'default_rate': int(info['defaultSampleRate']),
+                    'is_loopback': bool(info.get('isLoopbackDevice', False)),
+                    'rates': self._probe_rates(p, info),
+                })
+            try:
+                wasapi_info = p.get_host_api_info_by_type(portaudio.paWASAPI)
+                default_output = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
+                default_output_name = default_output['name']
+            except OSError:
+                pass
+        finally:
+            p.terminate()
+        return devices, default_output_name
+
+    def _probe_rates(self, p, info):
+        portaudio = portaudio_module()
+        channels = int(info['maxInputChannels'])
+        if channels <= 0:
+            return [int(info['defaultSampleRate'])]
+        rates = []
+        for rate in COMMON_RATES:
+            try:
+                if p.is_format_supported(rate,
+                                         input_device=info['index'],
+                                         input_channels=channels,
+                                         input_format=portaudio.paInt16):
+                    rates.append(rate)
+            except ValueError:
+                pass
+        return rates or [int(info['defaultSampleRate'])]
+
+
+class FakeBackend:
+    """In-memory backend for tests and machines without audio hardware"""
+    def __init__(self, devices=None, default_output_name=None):
+        self.devices = list(devices or [])
+        self.default_output_name = default_output_name
+        self.enumerations = 0
+
+    def add_device(self, name, inputs=0, outputs=0, rate=44100, is_loopback=False, rates=None):
+        device = {
+            'index': len(self.devices),
+            'name': name,
+            'host_api': 0,
+            'max_input_channels': inputs,
+            'max_output_channels': outputs,
+            'default_rate': rate,
+            'is_loopback': is_loopback,
+            'rates': list(rates or [rate]),
+        }
+        self.devices.append(device)
+        return device
+
+    def quick_signature(self):
+        return len(self.devices), self.default_output_name
+
+    def enumerate(self):
+        self.enumerations += 1
+        return [dict(d) for d in self.devices], self.default_output_name
+
+
+class DeviceRegistry:
+    """Enumerates audio devices once and serves cached lists until a refresh.
+
+    refresh() re-enumerates and bumps `generation` only when the device
+    signature changed, so callers can skip rebuilding their device lists.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or PyAudioBackend()
+        self.devices = []
+        self.default_output_name = None
+        self.generation = 0
+        self.last_refresh = None
+        self._signature = None
+        self._quick_signature = None
+        self._lock = threading.Lock()
+        self._callback = None
+        self.probe = {}
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def _ensure_loaded(self):
+        if self.last_refresh is None:
+            self.refresh()
+
+    def refresh(self, force=False):
+        """Re-enumerate devices; return True if the device set changed"""
+        with self._lock:
+            if self.last_refresh is not None and not force:
+                return False
+            try:
+                devices, default_output_name = self.backend.enumerate()
+            except Exception as e:
+                self._log(f"Device enumeration failed: {str(e)}")
+                devices, default_output_name = [], None
+            self.last_refresh = time.time()
+            self._quick_signature = self.backend.quick_signature()
+            signature = (
+                tuple((d['index'], d['name'], d['max_input_channels'],
+                       d['max_output_channels'], d['is_loopback']) for d in devices),
+                default_output_name,
+            )
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            self.devices = devices
+            self.default_output_name = default_output_name
+            self.generation += 1
+            return True
+
+    def refresh_if_changed(self):
+        """Re-enumerate only if the backend's cheap check reports a change.
+
+        Backends without a cheap check are always re-enumerated. Meant for
+        automatic polling: the check only sees the device count, so a
+        user-requested refresh should call refresh(force=True).
+        """
+        if self.last_refresh is None:
+            return self.refresh()
+        quick = self.backend.quick_signature()
+        if quick is not None and quick == self._quick_signature:
+            return False
+        return self.refresh(force=True)
+
+    def get_devices(self):
+        self._ensure_loaded()
+        return list(self.devices)
+
+    def get_device(self, index):
+        self._ensure_loaded()
+        for device in self.devices:
+            if device['index'] == index:
+                return device
+        return None
+
+    def get_input_devices(self):
+        self._ensure_loaded()
+        return [d for d in self.devices if d['max_input_channels'] > 0 and not d['is_loopback']]
+
+    def apply_probe(self, results):
+        """Attach ChannelScanner results, matched by device name and host API since indices change between sessions.
+
+        The same name is listed once per host API (MME, DirectSound,
+        WASAPI, WDM-KS) and each of them is probed on its own.
+        """
+        self.probe = {(result['name'], result.get('host_api')): result for result in results or []}
+
+    def _probe_result(self, device):
+        # Probes saved before host APIs were recorded match by name alone
+        return self.probe.get((device['name'], device.get('host_api'))) or self.probe.get((device['name'], None))
+
+    def live_channels(self, index):
+        """Channels of a device that carried signal in the last probe, or None if it was not probed"""
+        device = self.get_device(index)
+        result = self._probe_result(device) if device else None
+        return result['live_channels'] if result else None
+
+    def get_microphones(self):
+        """(index, name, channels) tuples, preferring devices that look like microphones.
+
+        After a channel probe, devices that carried live signal come first.
+        """
+        inputs = self.get_input_devices()
+        by_index = {d['index']: d for d in inputs}
+        microphones = []
+        for d in inputs:
+            name = d['name'].lower()
+            if ('mic' in name or
+                    'microphone' in name or
+                    name.startswith('input') or
+                    'audio input' in name):
+                microphones.append((d['index'], d['name'], d['max_input_channels']))
+        if not microphones:
+            microphones = [(d['index'], d['name'], d['max_input_channels']) for d in inputs]
+        if self.probe:
+            microphones.sort(key=lambda m: not (self._probe_result(by_index[m[0]]) or {}).get('live_channels'))
+        return microphones
+
+    def get_speakers(self):
+        """Loopback capture devices in the format used by AudioRecorder"""
+        self._ensure_loaded()
+        return [{
+            'index': d['index'],
+            'name': d['name'],
+            'channels': d['max_input_channels'],
+            'rate': d['default_rate'],
+        } for d in self.devices if d['is_loopback']]
+
+    def get_default_speaker_index(self):
+        """Position in get_speakers() of the loopback paired with the default output, or None"""
+        speakers = self.get_speakers()
+        if self.default_output_name:
+            for position, speaker in enumerate(speakers):
+                if self.default_output_name in speaker['name']:
+                    return position
+        return None
+
+
+_registry = None
+
+
+def get_registry():
+    """Process-wide registry shared by recorder, GUI and scripts"""
+    global _registry
+    if _registry is None:
+        _registry = DeviceRegistry()
+        # numpy and the probe code load only here, not on every import of this module
+        from channel_probe import load_probe
+        _registry.apply_probe(load_probe())
+    return _registry
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import numpy as np
+
+ENCODER_CACHE_DIR = os.path.join('cache', 'encoder')
+ENCODER_CACHE_MAX_GB = 20.0
+PRUNE_EVERY = 32
+
+
+def audio_hash(samples):
+    """Content hash of a 16 kHz float32 chunk"""
+    return hashlib.sha1(np.ascontiguousarray(samples, dtype=np.float32).tobytes()).hexdigest()
+
+
+class EncoderCache:
+    """Whisper encoder hidden states on disk, keyed by chunk audio hash and model id.
+
+    States are stored as float16 .npy files (about 3.8 MB per chunk for
+    large-v3) and memory-mapped on reuse, so re-decoding a file with other
+    generation options only runs the decoder. The oldest entries are pruned
+    once the cache grows past max_gb.
+    """
+    def __init__(self, cache_dir=ENCODER_CACHE_DIR, max_gb=ENCODER_CACHE_MAX_GB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_gb * 2 ** 30)
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def path(self, model_id, key):
+        model_dir = model_id.replace('/', '--')
+        return os.path.join(self.cache_dir, model_dir, key[:2], key + '.npy')
+
+    def get(self, model_id, key):
+        """Memory-mapped float16 states, or None if not cached"""
+        path = self.path(model_id, key)
+        try:
+            states = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return states
+
+    def put(self, model_id, key, states):
+        path = self.path(model_id, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a reader never maps a half-written file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(states, dtype=np.float16))
+        os.replace(tmp_path, path)
+        self._puts += 1
+        if self._puts % PRUNE_EVERY == 1:
+            self.prune()
+
+    def size(self):
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.npy'):
+                    yield os.path.join(root, name)
+
+    def prune(self):
+        """Delete least recently written entries until the cache fits in max_bytes"""
+        entries = [(os.path.getmtime(path), os.path.getsize(path), path) for path in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
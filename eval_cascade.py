@@ -0,0 +1,81 @@
+import glob
+import os
+import time
+import click
+from transcript import join_segments
+from transcribers import HuggingFaceTranscriber, CascadeTranscriber, AudioStreamer
+
+
+def normalize(text):
+    return ''.join(c for c in text.lower() if c.isalnum() or c.isspace()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two transcripts"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def evaluation_set(eval_dir):
+    """(audio, reference text) pairs: every WAV/FLAC with a same-named .txt next to it"""
+    pairs = []
+    for audio_file in sorted(glob.glob(os.path.join(eval_dir, '*.wav')) + glob.glob(os.path.join(eval_dir, '*.flac'))):
+        reference_file = os.path.splitext(audio_file)[0] + '.txt'
+        if os.path.exists(reference_file) and not audio_file.endswith('.asr16k.wav'):
+            with open(reference_file, encoding='utf-8') as f:
+                pairs.append((audio_file, f.read()))
+    return pairs
+
+
+def run(transcriber, pairs):
+    errors = words = 0
+    chunks = escalated = 0
+    start = time.perf_counter()
+    for audio_file, reference in pairs:
+        text = join_segments(transcriber.transcribe(AudioStreamer(audio_file)))
+        file_errors, file_words = word_errors(reference, text)
+        errors += file_errors
+        words += file_words
+        chunks += getattr(transcriber, 'chunks', 0)
+        escalated += getattr(transcriber, 'escalated', 0)
+    return {
+        'wall_s': time.perf_counter() - start,
+        'wer': errors / float(words) if words else 0.0,
+        'escalated': escalated / float(chunks) if chunks else None,
+    }
+
+
+@click.command()
+@click.option('--eval_dir', required=True, type=click.Path(exists=True), help="Folder of recordings with reference .txt files")
+@click.option('--fast', 'fast_id', default="openai/whisper-base", help="First-pass model")
+@click.option('--accurate', 'accurate_id', default="openai/whisper-large-v3", help="Model for escalated chunks")
+def main(eval_dir, fast_id, accurate_id):
+    """Compare the small-first cascade with the large model alone on a local evaluation set"""
+    pairs = evaluation_set(eval_dir)
+    if not pairs:
+        raise click.UsageError(f"No recordings with reference transcripts in {eval_dir}")
+
+    large = HuggingFaceTranscriber()
+    large.initialize_model(accurate_id)
+    baseline = run(large, pairs)
+    del large
+
+    cascade = CascadeTranscriber()
+    cascade.initialize_model(f"{fast_id} -> {accurate_id}")
+    result = run(cascade, pairs)
+
+    print(f"{len(pairs)} recordings")
+    print(f"large only: WER {baseline['wer'] * 100:.1f}%, {baseline['wall_s']:.1f}s")
+    print(f"cascade:    WER {result['wer'] * 100:.1f}%, {result['wall_s']:.1f}s "
+          f"({baseline['wall_s'] / result['wall_s']:.2f}x faster), "
+          f"{result['escalated'] * 100:.0f}% of chunks escalated")
+
+
+if __name__ == "__main__":
+    main()
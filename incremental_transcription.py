@@ -0,0 +1,212 @@
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from asr_track import StreamingResampler, ASR_RATE, asr_blocks, find_asr_track
+from transcript import join_segments, save_transcript
+from recording_catalog import catalog_transcript
+
+SILENCE_FRAME_S = 0.1
+SILENCE_SEARCH_S = 2.0
+# Whisper decodes 30 s per call whatever the chunk length, so a backlog is cleared in chunks this long
+MAX_COALESCED_S = 30.0
+MAX_LAG_S = 90.0
+
+
+class _SourceBuffer:
+    """16 kHz mono audio of one source that has not been transcribed yet"""
+    def __init__(self, channels, rate):
+        self.resampler = StreamingResampler(rate, channels)
+        self.blocks = []
+        self.samples = 0
+        self.offset = 0
+        self.segments = []
+        self.coalescing = False
+        self.behind = False
+
+    def append(self, data):
+        if data:
+            block = np.frombuffer(data, dtype=np.int16)
+            self.blocks.append(block)
+            self.samples += block.size
+
+    def take(self, count):
+        """Remove and return the first `count` samples as float32"""
+        audio = np.concatenate(self.blocks) if self.blocks else np.zeros(0, dtype=np.int16)
+        head, tail = audio[:count], audio[count:]
+        self.blocks = [tail] if tail.size else []
+        self.samples = tail.size
+        start = self.offset / float(ASR_RATE)
+        self.offset += head.size
+        return head.astype(np.float32) / 32768.0, start, self.offset / float(ASR_RATE)
+
+
+class IncrementalTranscriber:
+    """Transcribes a recording window by window while the call is in progress.
+
+    Register tap() on the AudioRecorder; capture threads only queue raw
+    blocks. A single worker thread resamples them to 16 kHz mono and runs
+    the transcriber on every completed window, so at stop only the tail is
+    left. Windows default to the offline AudioStreamer chunk length, which
+    keeps chunking (and so the transcript) the same as an offline run.
+
+    When the model cannot keep up, the waiting audio is decoded in chunks
+    of up to MAX_COALESCED_S. A source that still falls more than max_lag_s
+    behind stops being transcribed live: its queued blocks are dropped and
+    the rest is transcribed from the recording at stop, so memory stays
+    bounded on slow machines.
+    """
+    def __init__(self, transcriber, model_id, chunk_length_s=10.0, split_on_silence=False, callback=None,
+                 max_lag_s=MAX_LAG_S):
+        self.transcriber = transcriber
+        self.model_id = model_id
+        self.chunk_length_s = chunk_length_s
+        self.split_on_silence = split_on_silence
+        self.max_lag_s = max_lag_s
+        self._callback = callback
+        self.sources = {}
+        self._formats = {}
+        self._received = {}
+        self._queue = queue.Queue()
+        self.stop_to_complete = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def add_source(self, source, channels, rate):
+        self._formats[source] = (channels, rate)
+        self._received[source] = 0
+        self._queue.put(('add', source, (channels, rate)))
+
+    def tap(self, data, source):
+        # Each source is tapped from its own capture thread, so this count has a single writer
+        self._received[source] = self._received.get(source, 0) + len(data)
+        self._queue.put(('data', source, data))
+
+    def _lag_s(self, source, buffer):
+        """Seconds of this source's captured audio not transcribed yet"""
+        channels, rate = self._formats[source]
+        return self._received.get(source, 0) / float(2 * channels * rate) - buffer.offset / float(ASR_RATE)
+
+    def _run(self):
+        try:
+            if getattr(self.transcriber, 'pipe', None) is None:
+                self.transcriber.initialize_model(self.model_id)
+            # A transcriber may have picked the model itself (model_id None)
+            self.model_id = getattr(self.transcriber, 'model_id', None) or self.model_id
+        except Exception as e:
+            self._log(f"Incremental transcription disabled: {str(e)}")
+            self.transcriber = None
+        window = int(self.chunk_length_s * ASR_RATE)
+        while True:
+            kind, source, payload = self._queue.get()
+            if kind == 'add':
+                self.sources[source] = _SourceBuffer(*payload)
+            elif kind == 'data':
+                buffer = self.sources.get(source)
+                if buffer is None or buffer.behind:
+                    continue
+                buffer.append(buffer.resampler.process(payload))
+                while buffer.samples >= window:
+                    count = self._next_count(source, buffer, window)
+                    # The backlog is still in the queue; take it in before decoding a longer chunk
+                    if buffer.behind or (count > buffer.samples and not self._queue.empty()):
+                        break
+                    self._transcribe(buffer, count)
+            elif kind == 'finish':
+                for source, buffer in self.sources.items():
+                    if buffer.behind:
+                        self._transcribe_recording(buffer, (payload or {}).get(source), window)
+                        continue
+                    buffer.append(buffer.resampler.flush())
+                    while buffer.samples > 0:
+                        self._transcribe(buffer, min(buffer.samples, window))
+                break
+
+    def _next_count(self, source, buffer, window):
+        """Samples to transcribe next: one window, or up to MAX_COALESCED_S when behind"""
+        lag = self._lag_s(source, buffer)
+        if lag > self.max_lag_s:
+            buffer.behind = True
+            buffer.blocks = []
+            buffer.samples = 0
+            self._log(f"Incremental transcription of {source} is {lag:.0f}s behind; "
+                      f"the rest is transcribed from the recording at stop")
+            return window
+        count = window
+        if lag > 2 * self.chunk_length_s:
+            if not buffer.coalescing:
+                self._log(f"Incremental transcription of {source} is {lag:.0f}s behind; "
+                          f"decoding {MAX_COALESCED_S:.0f}s at a time")
+            count = max(window, int(min(lag, MAX_COALESCED_S) * ASR_RATE))
+        buffer.coalescing = count > window
+        if count > buffer.samples:
+            return count
+        return self._cut_point(buffer, count)
+
+    def _transcribe_recording(self, buffer, audio_file, window):
+        """Stop-time pass for a source that fell behind: transcribe the saved recording from where live decoding stopped"""
+        if not audio_file:
+            return
+        skip = buffer.offset
+        for block in asr_blocks(find_asr_track(audio_file) or audio_file):
+            if skip >= len(block):
+                skip -= len(block)
+                continue
+            block, skip = block[skip:], 0
+            buffer.append(np.clip(block * 32768.0, -32768, 32767).astype(np.int16).tobytes())
+            while buffer.samples >= window:
+                self._transcribe(buffer, window)
+        while buffer.samples > 0:
+            self._transcribe(buffer, min(buffer.samples, window))
+
+    def _cut_point(self, buffer, window):
+        """End of the next window, moved back to the quietest frame if splitting on silence"""
+        if not self.split_on_silence:
+            return window
+        frame = int(SILENCE_FRAME_S * ASR_RATE)
+        search = int(SILENCE_SEARCH_S * ASR_RATE)
+        audio = np.concatenate(buffer.blocks)[window - search:window].astype(np.float32)
+        frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+        energy = np.einsum('ij,ij->i', frames, frames)
+        return window - search + int(np.argmin(energy)) * frame + frame // 2
+
+    def _transcribe(self, buffer, count):
+        samples, start, end = buffer.take(count)
+        if self.transcriber is None or samples.size == 0:
+            return
+        try:
+            segment = self.transcriber.transcribe_chunk(samples, start, end, len(buffer.segments))
+            buffer.segments.append(segment)
+        except Exception as e:
+            self._log(f"Incremental transcription error at {start:.1f}s: {str(e)}")
+
+    def finish(self, audio_files):
+        """Transcribe the remaining tail and save one transcript per source.
+
+        Sources that fell behind are finished from their saved recording.
+
+        audio_files maps source -> saved recording (None entries are
+        skipped). Returns source -> transcript path; the time from this
+        call to the last saved transcript is kept in stop_to_complete.
+        """
+        stopped = time.perf_counter()
+        self._queue.put(('finish', None, audio_files))
+        self._thread.join()
+        saved = {}
+        if self.transcriber is not None:
+            for source, audio_file in audio_files.items():
+                buffer = self.sources.get(source)
+                if audio_file and buffer is not None:
+                    saved[source] = save_transcript(audio_file, self.model_id, join_segments(buffer.segments))
+                    try:
+                        catalog_transcript(audio_file, saved[source], self.model_id, buffer.segments)
+                    except sqlite3.Error as e:
+                        self._log(f"Catalog error: {str(e)}")
+        self.stop_to_complete = time.perf_counter() - stopped
+        self._log(f"Transcripts complete {self.stop_to_complete:.2f}s after stop")
+        return saved
@@ -0,0 +1,54 @@
+import threading
+import numpy as np
+
+SILENCE_DB = -100.0
+
+
+def to_dbfs(value):
+    """Convert a linear full-scale amplitude (0..1) to dBFS"""
+    if value <= 0:
+        return SILENCE_DB
+    return max(SILENCE_DB, 20.0 * float(np.log10(value)))
+
+
+class LevelMeter:
+    """Accumulates RMS/peak levels from captured audio blocks.
+
+    Blocks are fed from the capture thread (recorder tap or monitor stream
+    callback) and the UI reads the accumulated level at its own frame rate,
+    so the number of UI updates does not depend on the block rate.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sum_squares = 0.0
+        self._count = 0
+        self._peak = 0.0
+
+    def process(self, data):
+        """Add one block: int16 bytes (PyAudio) or a float32 array (sounddevice)"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+            samples *= 1.0 / 32768.0
+        else:
+            samples = np.asarray(data, dtype=np.float32).reshape(-1)
+        if samples.size == 0:
+            return
+        sum_squares = float(np.dot(samples, samples))
+        peak = float(np.abs(samples).max())
+        with self._lock:
+            self._sum_squares += sum_squares
+            self._count += samples.size
+            if peak > self._peak:
+                self._peak = peak
+
+    def read(self):
+        """Return (rms_db, peak_db) since the last read, or None if no new blocks"""
+        with self._lock:
+            if not self._count:
+                return None
+            rms = np.sqrt(self._sum_squares / self._count)
+            peak = self._peak
+            self._sum_squares = 0.0
+            self._count = 0
+            self._peak = 0.0
+        return to_dbfs(rms), to_dbfs(peak)
@@ -1,15 +1,16 @@
-import pyaudiowpatch as pyaudio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from device_registry import get_registry
 
 def list_audio_devices():
-    p = pyaudio.PyAudio()
-    for i in range(p.get_device_count()):
-        device_info = p.get_device_info_by_index(i)
-        print(f"Device Index: {i}")
+    for device_info in get_registry().get_devices():
+        print(f"Device Index: {device_info['index']}")
         print(f"Name: {device_info['name']}")
-        print(f"Sample Rate: {device_info['defaultSampleRate']}")
-        print(f"Max Input Channels: {device_info['maxInputChannels']}")
+        print(f"Sample Rate: {device_info['default_rate']}")
+        print(f"Max Input Channels: {device_info['max_input_channels']}")
+        print(f"Supported Rates: {device_info['rates']}")
         print("--------")
-    p.terminate()
 
 if __name__ == "__main__":
     list_audio_devices()
@@ -5,12 +5,34 @@ import threading
 import speech_recognition as sr
 import numpy as np
 import queue
+import multiprocessing
 import sys
 
+MAX_PENDING = 2  # 5 s chunks waiting for the recognizer; newer ones are dropped beyond this
+
+# Recognition runs in its own process so the capture callback never waits on it
+def recognizer_worker(jobs):
+    recognizer = sr.Recognizer()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        data, rate, sample_width = job
+        audio_data = sr.AudioData(data, rate, sample_width=sample_width)
+        try:
+            text = recognizer.recognize_google(audio_data)
+            print("Transcription:", text)
+        except sr.UnknownValueError:
+            print("Google Speech Recognition could not understand audio")
+        except sr.RequestError as e:
+            print(f"Could not request results from Google Speech Recognition service; {e}")
+        except Exception as e:
+            print(f"An error occurred in transcription: {e}")
+
 def capture_audio(track_name, duration, chunk_size=1024):
     filename = f"{track_name}.wav"
-    recognizer = sr.Recognizer()
     audio_queue = queue.Queue()
+    jobs = multiprocessing.Queue(maxsize=MAX_PENDING)
     stop_flag = threading.Event()
     
     with pyaudio.PyAudio() as p:
@@ -43,33 +65,27 @@ def capture_audio(track_name, duration, chunk_size=1024):
             audio_queue.put(in_data)
             return (in_data, pyaudio.paContinue)
 
-        def transcription_thread(recognizer):
-            buffer = np.array([], dtype=np.int16)
+        def transcription_thread():
+            blocks = []
+            samples = 0
+            rate = int(default_speakers["defaultSampleRate"])
+            sample_width = p.get_sample_size(pyaudio.paInt16)
             while not stop_flag.is_set():
                 try:
                     data = audio_queue.get(timeout=1)
-                    buffer = np.append(buffer, np.frombuffer(data, dtype=np.int16))
-                    
-                    # Process every 5 seconds of audio
-                    if len(buffer) > int(default_speakers["defaultSampleRate"]) * 5:
-                        audio_data = sr.AudioData(buffer.tobytes(), 
-                                                  default_speakers["defaultSampleRate"],
-                                                  sample_width=p.get_sample_size(pyaudio.paInt16))
-                        try:
-                            text = recognizer.recognize_google(audio_data)
-                            print("Transcription:", text)
-                        except sr.UnknownValueError:
-                            print("Google Speech Recognition could not understand audio")
-                        except sr.RequestError as e:
-                            print(f"Could not request results from Google Speech Recognition service; {e}")
-                            raise
-                        
-                        buffer = np.array([], dtype=np.int16)
                 except queue.Empty:
                     continue
-                except Exception as e:
-                    print(f"An error occurred in transcription: {e}")
-                    raise
+                blocks.append(data)
+                samples += len(data) // 2
+                
+                # Hand over every 5 seconds of audio
+                if samples > rate * 5:
+                    try:
+                        jobs.put_nowait((b"".join(blocks), rate, sample_width))
+                    except queue.Full:
+                        print("Recognizer is behind, dropping 5 seconds of audio")
+                    blocks = []
+                    samples = 0
 
         with p.open(format=pyaudio.paInt16,
                     channels=default_speakers["maxInputChannels"],
@@ -83,7 +99,9 @@ def capture_audio(track_name, duration, chunk_size=1024):
             print("Press Ctrl+C to stop recording early.")
             
             # Start the transcription thread
-            thread = threading.Thread(target=transcription_thread, args=(recognizer,))
+            worker = multiprocessing.Process(target=recognizer_worker, args=(jobs,), daemon=True)
+            worker.start()
+            thread = threading.Thread(target=transcription_thread)
             thread.start()
             
             try:
@@ -95,6 +113,8 @@ def capture_audio(track_name, duration, chunk_size=1024):
             stream.stop_stream()
             stop_flag.set()
             thread.join()
+            jobs.put(None)
+            worker.join(timeout=10)
         
         wave_file.close()
 
@@ -1,18 +1,22 @@
-import pyaudiowpatch as pyaudio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from device_registry import get_registry
 
 def print_device_info():
-    p = pyaudio.PyAudio()
-    try:
-        wasapi_info = p.get_host_api_info_by_type(pyaudio.paWASAPI)
-        default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-        print("Default Output Device Information:")
-        print(f"Name: {default_speakers['name']}")
-        print(f"Sample Rate: {default_speakers['defaultSampleRate']}")
-        print(f"Max Input Channels: {default_speakers['maxInputChannels']}")
-    except OSError:
+    registry = get_registry()
+    speakers = registry.get_speakers()
+    position = registry.get_default_speaker_index()
+    if registry.default_output_name is None:
         print("WASAPI not available.")
-    finally:
-        p.terminate()
+        return
+    print("Default Output Device Information:")
+    print(f"Name: {registry.default_output_name}")
+    if position is not None:
+        loopback = speakers[position]
+        print(f"Loopback: ({loopback['index']}) {loopback['name']}")
+        print(f"Sample Rate: {loopback['rate']}")
+        print(f"Max Input Channels: {loopback['channels']}")
 
 if __name__ == "__main__":
     print_device_info()
@@ -0,0 +1,158 @@
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+import click
+from audio_recorder import AudioRecorder, out_dir
+from voice_activation import SPEECH_DB
+
+
+def pick_microphone(recorder, spec):
+    """(index, name, channels) of the mic given by index or name fragment, or the preferred one"""
+    microphones = recorder.get_microphones()
+    for mic in microphones:
+        if spec is None or spec == str(mic[0]) or spec.lower() in mic[1].lower():
+            return mic
+    return None
+
+
+def pick_speaker(recorder, spec):
+    """Loopback device dict given by index or name fragment, or the one paired with the default output"""
+    speakers = recorder.get_speakers()
+    if spec is None:
+        default = recorder.registry.get_default_speaker_index()
+        return speakers[default if default is not None else 0] if speakers else None
+    for speaker in speakers:
+        if spec == str(speaker['index']) or spec.lower() in speaker['name'].lower():
+            return speaker
+    return None
+
+
+def hook_command(template, filename, source):
+    quote = subprocess.list2cmdline if sys.platform == 'win32' else lambda args: shlex.quote(args[0])
+    return template.format(file=quote([filename]), source=source)
+
+
+def run_hooks(templates, filename, source, log):
+    """Run each --on_saved command for a saved file; RECORDING_FILE/RECORDING_SOURCE are set too"""
+    env = dict(os.environ, RECORDING_FILE=filename, RECORDING_SOURCE=source)
+    for template in templates:
+        command = hook_command(template, filename, source)
+        result = subprocess.run(command, shell=True, env=env)
+        if result.returncode:
+            log(f"Hook exited with {result.returncode}: {command}")
+
+
+@click.command()
+@click.option('--mode', default='both', type=click.Choice(['mic', 'speaker', 'both']), help="Sources to record")
+@click.option('--mic', 'mic_spec', default=None, help="Microphone index or name fragment")
+@click.option('--speaker', 'speaker_spec', default=None, help="Loopback device index or name fragment")
+@click.option('--list', 'list_devices', is_flag=True, help="List capture devices and exit")
+@click.option('--duration', default=0.0, type=float, help="Stop after this many seconds (0: until signalled)")
+@click.option('--segment', default=0.0, type=float, help="Start a new file every this many seconds (0: one file)")
+@click.option('--out_dir', 'output_dir', default=out_dir, help="Directory for the recording folders")
+@click.option('--prefix', default=None, help="Recording folder name (default call_<timestamp>)")
+@click.option('--format', 'output_format', default='wav', type=click.Choice(['wav', 'flac']))
+@click.option('--rate', default=44100, type=int, help="Microphone sample rate")
+@click.option('--asr_track', is_flag=True, help="Also write the 16 kHz mono ASR track")
+@click.option('--voice_activation', is_flag=True, help="Only keep stretches around speech")
+@click.option('--speech_db', default=SPEECH_DB, type=float,
+              help="Lowest voice activation threshold (dBFS); speech must also clear the noise floor")
+@click.option('--peaks/--no-peaks', default=True, help="Write waveform peak sidecars")
+@click.option('--catalog/--no-catalog', default=True, help="Index recordings in the catalog")
+@click.option('--on_saved', multiple=True,
+              help="Shell command run after each file is saved; {file} and {source} are substituted")
+@click.option('--quiet', is_flag=True, help="Only print saved filenames")
+def main(mode, mic_spec, speaker_spec, list_devices, duration, segment, output_dir, prefix, output_format,
+         rate, asr_track, voice_activation, speech_db, peaks, catalog, on_saved, quiet):
+    """Record without a GUI.
+
+    Stops on SIGINT/SIGTERM (Ctrl+C/Ctrl+Break on Windows) or after
+    --duration; SIGHUP starts a new segment where the platform has it.
+    """
+    started = time.perf_counter()
+    log = (lambda message: None) if quiet else (lambda message: click.echo(message, err=True))
+    recorder = AudioRecorder()
+    recorder.set_callback(log)
+
+    if list_devices:
+        for index, name, channels in recorder.get_microphones():
+            click.echo(f"mic {index}: {name} ({channels} ch)")
+        for speaker in recorder.get_speakers():
+            click.echo(f"speaker {speaker['index']}: {speaker['name']} ({speaker['channels']} ch, {speaker['rate']} Hz)")
+        return
+
+    mic = pick_microphone(recorder, mic_spec) if mode in ('mic', 'both') else None
+    speaker = pick_speaker(recorder, speaker_spec) if mode in ('speaker', 'both') else None
+    if mode in ('mic', 'both') and mic is None:
+        raise click.ClickException(f"No microphone matching {mic_spec!r}" if mic_spec else "No microphone found")
+    if mode in ('speaker', 'both') and speaker is None:
+        raise click.ClickException(f"No loopback device matching {speaker_spec!r}" if speaker_spec else "No loopback device found")
+
+    recorder.out_dir = output_dir
+    if prefix:
+        recorder.file_prefix = prefix
+    recorder.RATE = rate
+    recorder.output_format = output_format
+    recorder.asr_track = asr_track
+    recorder.voice_activation = voice_activation
+    recorder.speech_db = speech_db
+    recorder.waveform_peaks = peaks
+    if catalog:
+        from recording_catalog import RecordingCatalog
+        recorder.catalog = RecordingCatalog()
+
+    saved = []
+
+    def on_saved_file(filename, source, stats):
+        saved.append(filename)
+        click.echo(filename)
+        if on_saved:
+            run_hooks(on_saved, filename, source, log)
+    recorder.add_saved_listener(on_saved_file)
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, request_stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: recorder.rotate())
+
+    if mode == 'both':
+        recorder.start_both_recordings(mic, speaker)
+    elif mode == 'mic':
+        recorder.start_recording_mic(mic[0], mic[2])
+    else:
+        recorder.start_recording_speaker(speaker)
+    log(f"Recording {mode} started in {time.perf_counter() - started:.2f}s")
+
+    now = time.monotonic()
+    deadline = now + duration if duration > 0 else None
+    next_segment = now + segment if segment > 0 else None
+    while not stop.is_set() and recorder.recording:
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            break
+        if next_segment is not None and now >= next_segment:
+            recorder.rotate()
+            next_segment += segment
+        # Bounded waits keep Ctrl+C responsive where waits are not interrupted by signals
+        stop.wait(min([1.0] + [t - now for t in (deadline, next_segment) if t is not None]))
+
+    failed = not recorder.recording
+    recorder.shutdown()
+    if recorder.catalog is not None:
+        recorder.catalog.close()
+    if failed or not saved:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 import pyaudio
 import wave
 import click
+import os
 from datetime import datetime
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 @click.command()
 @click.option('--out', 'output_filename', default=f'test_{timestamp}.wav', type=str, help="Path to the output WAV file")
 @click.option('--device_index', default=0, type=int, help="Device index for recording audio")
 @click.option('--record_seconds', default=10, type=int, help="Duration to record in seconds (used as max limit)")
-def main(output_filename, device_index, record_seconds):
+@click.option('--virtual', 'virtual_source', default=None, type=str, help="Record from a virtual device: WAV file or sine/noise/silence")
+@click.option('--fast', is_flag=True, help="Run the virtual device faster than real time")
+def main(output_filename, device_index, record_seconds, virtual_source, fast):
     # Set parameters
     FORMAT = pyaudio.paInt16  # 16-bit resolution
     CHANNELS = 2              # 2 channels for stereo
@@ -15,7 +18,20 @@ def main(output_filename, device_index, record_seconds):
     CHUNK = 1024              # 2^10 samples for buffer size
 
     # Initialize PyAudio
-    audio = pyaudio.PyAudio()
+    if virtual_source:
+        from virtual_devices import VirtualAudioHost, VirtualInputDevice, SignalSource, WavSource
+        if os.path.exists(virtual_source):
+            source = WavSource(virtual_source)
+        else:
+            source = SignalSource(virtual_source, rate=RATE, channels=CHANNELS, duration=record_seconds)
+        device = VirtualInputDevice('Virtual Microphone', source, realtime=not fast)
+        audio = VirtualAudioHost([device])
+        device_index = 0
+        CHANNELS = source.channels
+        RATE = source.rate
+    else:
+        device = None
+        audio = pyaudio.PyAudio()
 
     # Open stream
     stream = audio.open(format=FORMAT,
@@ -32,7 +48,7 @@ def main(output_filename, device_index, record_seconds):
 
     try:
         # Store data in chunks until interrupted
-        while True:
+        while device is None or not device.exhausted.is_set():
             data = stream.read(CHUNK)
             frames.append(data)
     except KeyboardInterrupt:
@@ -0,0 +1,311 @@
+import os
+import re
+import sqlite3
+import threading
+import wave
+from collections import namedtuple
+from datetime import datetime, timedelta
+from transcript import TranscriptSegment
+
+CATALOG_PATH = os.path.join('output', 'catalog.sqlite')
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+FILENAME_TIMESTAMP = re.compile(r'_(\d{8}_\d{6})')
+
+SearchHit = namedtuple('SearchHit', ['audio_file', 'call', 'source', 'recorded_at', 'start', 'end', 'snippet'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    call TEXT,
+    source TEXT,
+    device TEXT,
+    recorded_at TEXT,
+    duration_s REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    size_bytes INTEGER,
+    enhancement_status TEXT,
+    enhanced_path TEXT,
+    transcription_status TEXT,
+    transcript_path TEXT,
+    model_id TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_recorded_at ON recordings (recorded_at);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    recording_id INTEGER NOT NULL REFERENCES recordings (id),
+    start_s REAL,
+    end_s REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_recording ON segments (recording_id);
+"""
+
+# External-content index: segment text is stored once, in `segments`
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, content='segments', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def catalog_key(audio_file):
+    """Recordings are keyed by absolute path, whichever directory the app ran from"""
+    return os.path.normcase(os.path.abspath(audio_file))
+
+
+def audio_info(audio_file):
+    """(duration_s, sample_rate, channels) of a WAV/FLAC file, or Nones if unreadable"""
+    try:
+        import soundfile as sf
+        info = sf.info(audio_file)
+        return info.frames / float(info.samplerate), info.samplerate, info.channels
+    except ImportError:
+        pass
+    except RuntimeError:
+        return None, None, None
+    try:
+        with wave.open(audio_file, 'rb') as wf:
+            return wf.getnframes() / float(wf.getframerate()), wf.getframerate(), wf.getnchannels()
+    except (wave.Error, EOFError, OSError):
+        return None, None, None
+
+
+def recorded_at(audio_file, duration_s=None):
+    """Start time of a recording: the timestamp in its name, else mtime minus duration"""
+    match = FILENAME_TIMESTAMP.search(os.path.basename(audio_file))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+    return datetime.fromtimestamp(os.path.getmtime(audio_file)) - timedelta(seconds=duration_s or 0)
+
+
+def source_of(audio_file):
+    name = os.path.basename(audio_file)
+    for source in ('mic', 'speaker'):
+        if name.startswith(source + '_'):
+            return source
+    return None
+
+
+def fts_query(text):
+    """Quote each word so punctuation in user input is never read as FTS syntax"""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def _as_iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat(timespec='seconds')
+
+
+def latest_transcript(audio_file):
+    """Newest <basename>_<timestamp>.txt saved next to the audio, if any"""
+    audio_dir = os.path.dirname(audio_file) or '.'
+    prefix = os.path.splitext(os.path.basename(audio_file))[0] + '_'
+    names = sorted(name for name in os.listdir(audio_dir)
+                   if name.startswith(prefix) and name.endswith('.txt') and not name.endswith('.partial.txt'))
+    return os.path.join(audio_dir, names[-1]) if names else None
+
+
+def read_transcript(transcript_path):
+    """(model_id, text) of a transcript written by save_transcript"""
+    model_id = None
+    with open(transcript_path, encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    body_start = 0
+    for i, line in enumerate(lines[:3]):
+        if line.startswith('Model: '):
+            model_id = line[len('Model: '):]
+        if line.startswith(('Source: ', 'Model: ')):
+            body_start = i + 1
+    return model_id, '\n'.join(lines[body_start:]).strip()
+
+
+class RecordingCatalog:
+    """SQLite index of recordings and their transcripts.
+
+    One row per recording (duration, device, size, enhancement and
+    transcription status) and one per transcript segment with its offset in
+    the audio, with an FTS5 index over segment text, so "which calls
+    mentioned X last month" is a single indexed query instead of a walk
+    over thousands of .txt files. The recorder and the transcription
+    processes write to the same file; WAL mode lets them do so while the
+    UI reads.
+    """
+    def __init__(self, path=CATALOG_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: search falls back to LIKE
+                self.fts = False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _upsert(self, audio_file, **fields):
+        """Insert or update the recording row for audio_file; returns its id"""
+        key = catalog_key(audio_file)
+        fields['updated_at'] = _as_iso(datetime.now())
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT id FROM recordings WHERE path = ?', (key,)).fetchone()
+            if row is None:
+                fields.setdefault('call', os.path.basename(os.path.dirname(key)))
+                fields.setdefault('source', source_of(key))
+                columns = ['path'] + list(fields)
+                cursor = self._conn.execute(
+                    f"INSERT INTO recordings ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [key] + list(fields.values()))
+                return cursor.lastrowid
+            self._conn.execute(
+                f"UPDATE recordings SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                list(fields.values()) + [row['id']])
+            return row['id']
+
+    def add_recording(self, audio_file, source=None, device=None, stats=None):
+        """Catalog a finished recording; stats are RecordingWriter.close() stats if available"""
+        duration_s, sample_rate, channels = audio_info(audio_file)
+        if stats is not None:
+            duration_s = stats['audio_seconds']
+        fields = {
+            'recorded_at': _as_iso(recorded_at(audio_file, duration_s)),
+            'duration_s': duration_s,
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'size_bytes': os.path.getsize(audio_file),
+        }
+        if source:
+            fields['source'] = source
+        if device:
+            fields['device'] = device
+        return self._upsert(audio_file, **fields)
+
+    def set_enhancement(self, audio_file, status, enhanced_path=None):
+        fields = {'enhancement_status': status}
+        if enhanced_path:
+            fields['enhanced_path'] = catalog_key(enhanced_path)
+        self._upsert(audio_file, **fields)
+
+    def set_transcription(self, audio_file, status):
+        self._upsert(audio_file, transcription_status=status)
+
+    def add_transcript(self, audio_file, transcript_path, model_id, segments):
+        """Replace the indexed segments of audio_file with a newly saved transcript"""
+        recording_id = self._upsert(audio_file, transcription_status='done', model_id=model_id,
+                                    transcript_path=catalog_key(transcript_path))
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM segments WHERE recording_id = ?', (recording_id,))
+            self._conn.executemany(
+                'INSERT INTO segments (recording_id, start_s, end_s, text) VALUES (?, ?, ?, ?)',
+                [(recording_id, segment.start, segment.end, segment.text.strip())
+                 for segment in segments if segment.text.strip()])
+
+    def recording(self, audio_file):
+        """Catalog row of audio_file as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM recordings WHERE path = ?', (catalog_key(audio_file),)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, query, since=None, until=None, limit=50):
+        """Transcript segments matching every word of query, newest recordings first.
+
+        since/until are datetimes or ISO date strings bounding the recording
+        start time. Each hit carries the segment's offset in the audio.
+        """
+        conditions = []
+        params = []
+        if self.fts:
+            sql = ("SELECT r.path, r.call, r.source, r.recorded_at, s.start_s, s.end_s, "
+                   "snippet(segments_fts, 0, '[', ']', '...', 12) "
+                   "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+                   "JOIN recordings r ON r.id = s.recording_id")
+            conditions.append('segments_fts MATCH ?')
+            params.append(fts_query(query))
+        else:
+            sql = ("SELECT r.path, r.call, r.source, r.recorded_at, s.start_s, s.end_s, s.text "
+                   "FROM segments s JOIN recordings r ON r.id = s.recording_id")
+            for word in query.split():
+                conditions.append('s.text LIKE ?')
+                params.append(f'%{word}%')
+        if since is not None:
+            conditions.append('r.recorded_at >= ?')
+            params.append(_as_iso(since))
+        if until is not None:
+            conditions.append('r.recorded_at < ?')
+            params.append(_as_iso(until))
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY r.recorded_at DESC, s.start_s LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def index_existing(self, root='output', callback=None):
+        """Catalog recordings and saved transcripts already on disk.
+
+        Only files not yet in the catalog (or changed since) are read. The
+        saved .txt transcripts carry no timings, so each becomes one
+        segment spanning the whole recording.
+        """
+        added = 0
+        for audio_dir, _, names in os.walk(root):
+            for name in sorted(names):
+                if not name.lower().endswith(AUDIO_EXTENSIONS) or name.endswith('.asr16k.wav'):
+                    continue
+                audio_file = os.path.join(audio_dir, name)
+                existing = self.recording(audio_file)
+                if existing and existing['size_bytes'] == os.path.getsize(audio_file):
+                    continue
+                self.add_recording(audio_file)
+                transcript_path = latest_transcript(audio_file)
+                if transcript_path:
+                    model_id, text = read_transcript(transcript_path)
+                    duration_s = self.recording(audio_file)['duration_s'] or 0.0
+                    segment = TranscriptSegment(text, 0.0, duration_s, 0)
+                    self.add_transcript(audio_file, transcript_path, model_id, [segment])
+                added += 1
+                if callback:
+                    callback(f"Cataloged {audio_file}")
+        return added
+
+
+def catalog_transcript(audio_file, transcript_path, model_id, segments, catalog_path=CATALOG_PATH):
+    """Index a just-saved transcript in the default catalog"""
+    catalog = RecordingCatalog(catalog_path)
+    try:
+        catalog.add_transcript(audio_file, transcript_path, model_id, segments)
+    finally:
+        catalog.close()
+
+
+def format_offset(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60:d}:{minutes % 60:02d}:{seconds:02d}"
+
+
+def play_from(audio_file, offset_s, wait=True):
+    """Play a recording starting at offset_s"""
+    import sounddevice as sd
+    import soundfile as sf
+    info = sf.info(audio_file)
+    data, rate = sf.read(audio_file, start=int(offset_s * info.samplerate), dtype='float32')
+    sd.play(data, rate)
+    if wait:
+        sd.wait()
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+import wave
+import numpy as np
+
+FORMATS = ('wav', 'flac')
+
+
+def recording_extension(output_format):
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown recording format: {output_format}")
+    return f'.{output_format}'
+
+
+def read_audio(filename):
+    """Read a WAV or FLAC recording as (rate, int16 array shaped like scipy's wavfile.read)"""
+    if filename.lower().endswith('.flac'):
+        import soundfile as sf
+        data, rate = sf.read(filename, dtype='int16')
+        return rate, data
+    from scipy.io import wavfile
+    return wavfile.read(filename)
+
+
+class RecordingWriter:
+    """Writes captured int16 blocks to WAV or FLAC on a background thread.
+
+    write() only queues the block, so capture callbacks never wait on disk
+    or on the FLAC encoder. close() drains the queue and returns stats with
+    the compression ratio and the CPU time spent in the encoder thread.
+    An optional transform (process(bytes) -> bytes, flush() -> bytes) runs
+    on the same thread before writing, e.g. a StreamingResampler.
+    """
+    def __init__(self, filename, channels, rate, output_format='wav', callback=None, transform=None):
+        self.filename = filename
+        self.transform = transform
+        self.channels = channels
+        self.rate = rate
+        self.output_format = output_format
+        self._callback = callback
+        self._queue = queue.Queue()
+        self.frames_written = 0
+        self.bytes_in = 0
+        self.encoder_cpu = 0.0
+        self.error = None
+        self._file = self._open()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def _open(self):
+        if self.output_format == 'flac':
+            import soundfile as sf
+            return sf.SoundFile(self.filename, 'w', samplerate=self.rate,
+                                channels=self.channels, format='FLAC', subtype='PCM_16')
+        wf = wave.open(self.filename, 'wb')
+        wf.setnchannels(self.channels)
+        wf.setsampwidth(2)
+        wf.setframerate(self.rate)
+        return wf
+
+    def write(self, data):
+        """Queue one block of interleaved int16 bytes"""
+        self._queue.put(data)
+
+    def _run(self):
+        start_cpu = time.thread_time()
+        while True:
+            data = self._queue.get()
+            if data is None:
+                if self.transform is not None and self.error is None:
+                    self._write(self._apply_transform(self.transform.flush))
+                break
+            if self.error is not None:
+                continue
+            if self.transform is not None:
+                data = self._apply_transform(self.transform.process, data)
+            self._write(data)
+        self.encoder_cpu = time.thread_time() - start_cpu
+
+    def _apply_transform(self, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            self.error = e
+            self._log(f"Error processing {self.filename}: {str(e)}")
+            return b''
+
+    def _write(self, data):
+        if not data:
+            return
+        try:
+            if self.output_format == 'flac':
+                block = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+                self._file.write(block)
+            else:
+                self._file.writeframes(data)
+            self.frames_written += len(data) // (2 * self.channels)
+            self.bytes_in += len(data)
+        except Exception as e:
+            self.error = e
+            self._log(f"Error writing {self.filename}: {str(e)}")
+
+    @property
+    def backlog(self):
+        """Blocks queued but not yet encoded"""
+        return self._queue.qsize()
+
+    def close(self):
+        """Flush queued blocks, close the file and return write stats"""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        return self.stats()
+
+    def stats(self):
+        bytes_out = os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+        audio_seconds = self.frames_written / float(self.rate)
+        return {
+            'filename': self.filename,
+            'format': self.output_format,
+            'audio_seconds': audio_seconds,
+            'bytes_in': self.bytes_in,
+            'bytes_out': bytes_out,
+            'compression_ratio': self.bytes_in / bytes_out if bytes_out else 0.0,
+            'encoder_cpu': self.encoder_cpu,
+            'encoder_load': self.encoder_cpu / audio_seconds if audio_seconds else 0.0,
+        }
+
+
+def format_stats(stats):
+    """One-line summary of RecordingWriter stats for the log"""
+    return (f"{os.path.basename(stats['filename'])}: {stats['audio_seconds']:.1f}s, "
+            f"{stats['bytes_in'] / 1e6:.1f} MB -> {stats['bytes_out'] / 1e6:.1f} MB "
+            f"(ratio {stats['compression_ratio']:.2f}), encoder CPU {stats['encoder_cpu']:.2f}s "
+            f"({stats['encoder_load'] * 100:.1f}% of real time)")
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timedelta
+import click
+from recording_catalog import CATALOG_PATH, RecordingCatalog, format_offset, play_from
+
+
+@click.group()
+@click.option('--catalog', 'catalog_path', default=CATALOG_PATH, help="Catalog database")
+@click.pass_context
+def cli(ctx, catalog_path):
+    """Search and maintain the recording catalog"""
+    ctx.obj = RecordingCatalog(catalog_path)
+
+
+@cli.command()
+@click.option('--root', default='output', type=click.Path(exists=True), help="Folder of recordings")
+@click.pass_obj
+def index(catalog, root):
+    """Catalog recordings and transcripts already on disk"""
+    start = time.perf_counter()
+    added = catalog.index_existing(root, callback=click.echo)
+    click.echo(f"{added} recordings cataloged in {time.perf_counter() - start:.1f}s")
+
+
+@cli.command()
+@click.argument('query')
+@click.option('--days', default=None, type=int, help="Only recordings from the last N days")
+@click.option('--limit', default=50, type=int)
+@click.option('--play', default=None, type=int, help="Play hit number N from its offset")
+@click.pass_obj
+def search(catalog, query, days, limit, play):
+    """Find transcript segments mentioning QUERY"""
+    since = datetime.now() - timedelta(days=days) if days else None
+    start = time.perf_counter()
+    hits = catalog.search(query, since=since, limit=limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for number, hit in enumerate(hits, 1):
+        click.echo(f"{number:>3}. {hit.recorded_at} {hit.call}/{hit.source} @ {format_offset(hit.start)}: {hit.snippet}")
+    click.echo(f"{len(hits)} hits in {elapsed_ms:.1f} ms")
+    if play:
+        if not 1 <= play <= len(hits):
+            raise click.BadParameter(f"there are {len(hits)} hits", param_hint='--play')
+        hit = hits[play - 1]
+        click.echo(f"Playing {hit.audio_file} from {format_offset(hit.start)}")
+        play_from(hit.audio_file, hit.start)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,93 @@
+import struct
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+
+# magic, version, sample rate, channels, frames (int16 interleaved data follows)
+HEADER = struct.Struct('<4sHIHQ')
+MAGIC = b'VTAU'
+VERSION = 1
+SHARED_AUDIO_MAX_S = 900
+
+
+def publish_blocks(blocks, rate, channels):
+    """Copy captured int16 blocks into a new named shared-memory block.
+
+    The caller owns the returned SharedMemory and must keep it open until
+    the consumer has mapped it (Windows frees it with the last handle),
+    then close() and unlink() it.
+    """
+    size = sum(len(block) for block in blocks)
+    shm = shared_memory.SharedMemory(create=True, size=HEADER.size + max(size, 1))
+    HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, rate, channels, size // (2 * channels))
+    offset = HEADER.size
+    for block in blocks:
+        shm.buf[offset:offset + len(block)] = block
+        offset += len(block)
+    return shm
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.platform != 'win32':
+        # Attaching registers the block with this process's resource tracker,
+        # which would unlink it at exit; the publisher owns its lifetime
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+def read_shared_audio(name):
+    """Map a published block and return (rate, float32 array shaped (channels, frames)).
+
+    Raises FileNotFoundError if the block is gone, so callers can fall
+    back to the file on disk.
+    """
+    shm = _attach(name)
+    try:
+        magic, version, rate, channels, frames = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise FileNotFoundError(f"Shared memory block {name} does not hold audio")
+        samples = np.frombuffer(shm.buf, dtype=np.int16, count=frames * channels, offset=HEADER.size)
+        audio = samples.reshape(frames, channels).T.astype(np.float32) / 32768.0
+        del samples
+    finally:
+        shm.close()
+    return rate, audio
+
+
+class SharedAudioCapture:
+    """Recorder tap keeping one source's blocks in memory for a shared-memory handoff.
+
+    Gives up (and the file path is used instead) once the recording is
+    longer than max_seconds.
+    """
+    def __init__(self, source, channels, rate, max_seconds=SHARED_AUDIO_MAX_S):
+        self.source = source
+        self.channels = channels
+        self.rate = rate
+        self.max_bytes = int(max_seconds * rate) * 2 * channels
+        self.blocks = []
+        self.size = 0
+        self.overflowed = False
+
+    def tap(self, data, source):
+        if source != self.source or self.overflowed:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.overflowed = True
+            self.blocks = []
+            return
+        self.blocks.append(bytes(data))
+
+    def publish(self):
+        """SharedMemory holding the captured audio, or None if it was too long or empty"""
+        if self.overflowed or not self.blocks:
+            return None
+        shm = publish_blocks(self.blocks, self.rate, self.channels)
+        self.blocks = []
+        return shm
@@ -0,0 +1,60 @@
+import os
+import time
+import click
+from virtual_devices import VirtualAudioHost, VirtualInputDevice, SignalSource, WavSource
+from audio_recorder import AudioRecorder
+
+
+def make_source(spec, rate, channels, duration):
+    """A WAV path or one of the SignalSource kinds"""
+    if os.path.exists(spec):
+        return WavSource(spec, loop=True)
+    return SignalSource(spec, rate=rate, channels=channels, duration=duration)
+
+
+@click.command()
+@click.option('--mic', 'mic_spec', default='sine', help="WAV file or signal kind (sine, noise, silence) for the mic")
+@click.option('--speaker', 'speaker_spec', default='noise', help="WAV file or signal kind for the loopback device")
+@click.option('--seconds', default=600, type=float, help="Seconds of audio to capture")
+@click.option('--realtime', is_flag=True, help="Pace devices to wall clock instead of running flat out")
+@click.option('--jitter_ms', default=0.0, type=float, help="Random per-block delivery jitter")
+@click.option('--overflow_rate', default=0.0, type=float, help="Probability of an injected overflow per block")
+@click.option('--format', 'output_format', default='wav', type=click.Choice(['wav', 'flac']), help="Recording format")
+@click.option('--asr_track', is_flag=True, help="Also write the 16 kHz mono ASR track")
+def main(mic_spec, speaker_spec, seconds, realtime, jitter_ms, overflow_rate, output_format, asr_track):
+    mic = VirtualInputDevice('Virtual Microphone', make_source(mic_spec, 44100, 1, seconds),
+                             realtime=realtime, jitter_ms=jitter_ms, overflow_rate=overflow_rate)
+    speaker = VirtualInputDevice('Virtual Speakers [Loopback]', make_source(speaker_spec, 48000, 2, seconds),
+                                 realtime=realtime, jitter_ms=jitter_ms, overflow_rate=overflow_rate,
+                                 is_loopback=True)
+    host = VirtualAudioHost([mic, speaker])
+
+    recorder = AudioRecorder()
+    recorder.set_callback(print)
+    recorder.use_virtual_host(host)
+    recorder.output_format = output_format
+    recorder.asr_track = asr_track
+    mic_info = recorder.get_microphones()[0]
+    speaker_info = recorder.get_speakers()[0]
+
+    start = time.perf_counter()
+    recorder.start_both_recordings(mic_info, speaker_info)
+    target = {mic: int(seconds * mic.rate), speaker: int(seconds * speaker.rate)}
+    while any(d.frames_delivered < n and not d.exhausted.is_set() for d, n in target.items()):
+        time.sleep(0.05)
+    mic_file, speaker_file = recorder.stop_both_recordings()
+    elapsed = time.perf_counter() - start
+
+    print(f"Captured {seconds:.0f}s of audio in {elapsed:.2f}s ({seconds / elapsed:.1f}x real time)")
+    for label, device, filename in (('mic', mic, mic_file), ('speaker', speaker, speaker_file)):
+        size = os.path.getsize(filename) if filename and os.path.exists(filename) else 0
+        print(f"{label}: {device.frames_delivered / device.rate:.1f}s delivered, "
+              f"{device.overflows} overflow(s), {size / 1e6:.1f} MB -> {filename}")
+        health = recorder.last_write_stats.get(filename, {}).get('health')
+        if health:
+            print(f"  {label} health: {health['overflows']} overflow(s) seen, "
+                  f"jitter {health['jitter_ms']['histogram']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,64 @@
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import sqlite3
 import click
+import numpy as np
+from asr_track import find_asr_track, StreamingResampler, ASR_RATE
+from recording_writer import read_audio
+from transcript import TranscriptCheckpoint, join_segments
+from recording_catalog import catalog_transcript
+
+CHUNK_LENGTH_S = 30.0
+
+
+def load_asr_audio(input_file):
+    """16 kHz mono int16 samples, from the ASR track if one was recorded"""
+    rate, data = read_audio(find_asr_track(input_file) or input_file)
+    channels = data.shape[1] if data.ndim > 1 else 1
+    if rate == ASR_RATE and channels == 1:
+        return data
+    resampler = StreamingResampler(rate, channels)
+    block = rate * 10
+    audio = [resampler.process(data[i:i + block].astype(np.int16).tobytes()) for i in range(0, len(data), block)]
+    audio.append(resampler.flush())
+    return np.frombuffer(b''.join(audio), dtype=np.int16)
 
 @click.command()
 @click.option('--in', 'input_file', required=True, type=click.Path(exists=True), help="Path to the input audio file")
 @click.option('--out', 'output_file', required=True, type=str, help="Path to the output text file")
 def main(input_file, output_file):
-    device = "cuda:0" if torch.cuda.is_available() else "cpu"
-    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    # Imported here so --help and argument errors do not wait for torch
+    from transcribers import HuggingFaceTranscriber
 
     model_id = "openai/whisper-large-v3"
 
-    model = AutoModelForSpeechSeq2Seq.from_pretrained(
-        model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True, cache_dir="cache"
-    )
-    model.to(device)
-
-    processor = AutoProcessor.from_pretrained(model_id)
-
-    pipe = pipeline(
-        "automatic-speech-recognition",
-        model=model,
-        tokenizer=processor.tokenizer,
-        feature_extractor=processor.feature_extractor,
-        torch_dtype=torch_dtype,
-        device=device
-    )
-
-    # Process the input audio file
-    result = pipe(input_file)
-    transcription = result["text"]
+    transcriber = HuggingFaceTranscriber()
+    transcriber.generate_kwargs = {}  # Let Whisper detect the language
+    transcriber.initialize_model(model_id)
+
+    # Transcribe in fixed chunks, checkpointing each so an interrupted run resumes
+    audio = load_asr_audio(input_file)
+    chunk_size = int(CHUNK_LENGTH_S * ASR_RATE)
+    checkpoint = TranscriptCheckpoint(input_file, model_id, {'chunk_length_s': CHUNK_LENGTH_S})
+    if checkpoint.next_chunk:
+        print(f"Resuming at chunk {checkpoint.next_chunk + 1}")
+    try:
+        for offset in range(checkpoint.next_chunk * chunk_size, len(audio), chunk_size):
+            samples = audio[offset:offset + chunk_size].astype(np.float32) / 32768.0
+            segment = transcriber.transcribe_chunk(samples, offset / float(ASR_RATE),
+                                                   (offset + len(samples)) / float(ASR_RATE),
+                                                   checkpoint.next_chunk)
+            checkpoint.record(segment, offset)
+    finally:
+        checkpoint.close()
+    transcription = join_segments(checkpoint.segments)
     
     # Write the transcription to the output file
     with open(output_file, "w") as f:
         f.write(transcription)
+    try:
+        catalog_transcript(input_file, output_file, model_id, checkpoint.segments)
+    except sqlite3.Error as e:
+        print(f"Catalog error: {str(e)}")
+    checkpoint.complete()
     print(f"Transcription saved to {output_file}")
 
 if __name__ == "__main__":
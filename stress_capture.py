@@ -0,0 +1,163 @@
+import os
+import tempfile
+import threading
+import time
+import click
+import numpy as np
+from scipy.io import wavfile
+from virtual_devices import VirtualAudioHost, VirtualInputDevice, SignalSource
+from audio_recorder import AudioRecorder
+from audio_enhancer import AudioEnhancer, enhance_recording_job
+from compute_workers import ComputeWorkers, TranscriberProcess, default_workers
+from incremental_transcription import IncrementalTranscriber
+from transcript import TranscriptSegment
+
+BUSY_S = 0.5
+
+
+class BusyTranscriber:
+    """Stand-in model: burns BUSY_S of pure-Python CPU (holding the GIL) per chunk"""
+    def __init__(self):
+        self.pipe = None
+
+    def initialize_model(self, model_id):
+        self.pipe = model_id
+
+    def transcribe_chunk(self, samples, start, end, chunk_index):
+        deadline = time.process_time() + BUSY_S
+        total = 0
+        while time.process_time() < deadline:
+            total += sum(range(1000))
+        return TranscriptSegment(f"chunk {chunk_index}", start, end, chunk_index)
+
+
+class ArrivalMonitor:
+    """Recorder tap measuring how far each source's blocks arrive behind the device clock"""
+    def __init__(self, rates):
+        self.rates = rates
+        self.channels = {}
+        self.first = {}
+        self.frames = {}
+        self.max_lag = {}
+
+    def set_channels(self, source, channels):
+        self.channels[source] = channels
+
+    def tap(self, data, source):
+        now = time.perf_counter()
+        frames = len(data) // (2 * self.channels[source])
+        if source not in self.first:
+            self.first[source] = now
+            self.frames[source] = frames
+            self.max_lag[source] = 0.0
+            return
+        # The block was due once its last frame was captured
+        due = self.first[source] + self.frames[source] / float(self.rates[source])
+        self.frames[source] += frames
+        self.max_lag[source] = max(self.max_lag[source], now - due)
+
+
+def write_load_file(path, seconds, rate=44100):
+    """Noisy speech-band signal for the enhancement jobs"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / float(rate)
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * rng.standard_normal(t.size)
+    wavfile.write(path, rate, (signal * 32767).astype(np.int16))
+
+
+def start_enhancement_load(load_file, out_dir, workers, in_process, stop):
+    """Keep `workers` enhancement jobs running until stop is set; returns a completed-job counter"""
+    completed = [0]
+    if in_process:
+        def loop():
+            enhancer = AudioEnhancer(out_dir)
+            while not stop.is_set():
+                enhancer.enhance_recording(load_file)
+                completed[0] += 1
+        for _ in range(workers):
+            threading.Thread(target=loop, daemon=True).start()
+        return completed, None
+
+    pool = ComputeWorkers(max_workers=workers, max_pending=workers, callback=print)
+
+    def resubmit(future=None):
+        if future is not None:
+            completed[0] += 1
+        if not stop.is_set():
+            pool.submit(enhance_recording_job, load_file, out_dir, done=resubmit, block=True)
+
+    for _ in range(workers):
+        threading.Thread(target=resubmit, daemon=True).start()
+    return completed, pool
+
+
+@click.command()
+@click.option('--seconds', default=60, type=float, help="Seconds of real-time capture under load")
+@click.option('--workers', default=0, type=int, help="Enhancement processes (default: all cores but one)")
+@click.option('--buffer_ms', default=100.0, type=float, help="Device buffer; a block later than this is a capture gap")
+@click.option('--in_process', is_flag=True, help="Run the same load on threads of the capture process, for comparison")
+def main(seconds, workers, buffer_ms, in_process):
+    """Record both sides from real-time virtual devices while enhancement and transcription saturate all cores"""
+    workers = workers or default_workers()
+    mic = VirtualInputDevice('Virtual Microphone', SignalSource('sine', rate=44100, channels=1),
+                             realtime=True)
+    speaker = VirtualInputDevice('Virtual Speakers [Loopback]', SignalSource('noise', rate=48000, channels=2),
+                                 realtime=True, is_loopback=True)
+    host = VirtualAudioHost([mic, speaker])
+
+    recorder = AudioRecorder()
+    recorder.set_callback(print)
+    recorder.use_virtual_host(host)
+    mic_info = recorder.get_microphones()[0]
+    speaker_info = recorder.get_speakers()[0]
+
+    monitor = ArrivalMonitor({'mic': recorder.RATE, 'speaker': speaker_info['rate']})
+    monitor.set_channels('mic', mic_info[2])
+    monitor.set_channels('speaker', speaker_info['channels'])
+    recorder.add_tap(monitor.tap)
+
+    transcriber = BusyTranscriber() if in_process else TranscriberProcess('stress_capture:BusyTranscriber')
+    incremental = IncrementalTranscriber(transcriber, 'busy', chunk_length_s=2.0, callback=print)
+    incremental.add_source('mic', mic_info[2], recorder.RATE)
+    incremental.add_source('speaker', speaker_info['channels'], speaker_info['rate'])
+    recorder.add_tap(incremental.tap)
+
+    work_dir = tempfile.mkdtemp(prefix='stress_capture_')
+    load_file = os.path.join(work_dir, 'load.wav')
+    write_load_file(load_file, 20)
+    stop = threading.Event()
+    completed, pool = start_enhancement_load(load_file, work_dir, workers, in_process, stop)
+
+    mode = 'capture-process threads' if in_process else 'worker processes'
+    print(f"Capturing {seconds:.0f}s with {workers} enhancement job(s) and transcription in {mode}")
+    recorder.start_both_recordings(mic_info, speaker_info)
+    time.sleep(seconds)
+    mic_file, speaker_file = recorder.stop_both_recordings()
+    stop.set()
+    recorder.remove_tap(incremental.tap)
+    incremental.finish({})
+    if pool is not None:
+        pool.shutdown()
+    if not in_process:
+        transcriber.close()
+
+    failed = False
+    for source, device, filename in (('mic', mic, mic_file), ('speaker', speaker, speaker_file)):
+        stats = recorder.last_write_stats.get(filename, {})
+        written = int(round(stats.get('audio_seconds', 0.0) * device.rate))
+        lag_ms = monitor.max_lag.get(source, float('inf')) * 1000
+        # The block in flight when the stream stops is never written; anything more was lost
+        gap = lag_ms > buffer_ms or device.frames_delivered - written > recorder.CHUNK
+        failed = failed or gap
+        print(f"{source}: {device.frames_delivered / device.rate:.1f}s delivered, {written} of "
+              f"{device.frames_delivered} frames written, max block lag {lag_ms:.1f} ms"
+              f"{'  <-- capture gap' if gap else ''}")
+    print(f"Enhancement jobs completed: {completed[0]}, transcribed windows: "
+          f"{sum(len(b.segments) for b in incremental.sources.values())}")
+    print("FAIL" if failed else "PASS")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,38 @@
-import pyaudio
-import wave
-from pprint import pprint as pp
-
-CHUNK = 1024
-FORMAT = pyaudio.paInt16
-RATE = 44100
-RECORD_SECONDS = 20
-
-p = pyaudio.PyAudio()
-
-# List device information to verify device index
-for i in range(p.get_device_count()):
-    dev = p.get_device_info_by_index(i)
-    print(f"Device Index: {i}, Name: {dev['name']}, Max Input Channels: {dev['maxInputChannels']}")
-
-# Try opening the stream and print a debug statement
-for did in range(p.get_device_count()):
-    print(f"\nDevice Index: {did}")
-    dev = p.get_device_info_by_index(did)
-    pp(dev)
-    chan = dev['maxInputChannels']  # Use maxInputChannels for recording
-
-    if chan > 0:  # Proceed only if the device has input channels
-        fn = f"output_{did}.wav"
-        try:
-            print(f"Trying to record from device index {did} with {chan} input channels'")
-            stream = p.open(format=FORMAT,
-                            channels=chan,  # Use input channels count
-                            rate=RATE,
-                            input=True,
-                            input_device_index=did,
-                            frames_per_buffer=CHUNK)
-            print("* recording")
-
-            frames = []
-
-            for i in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-                data = stream.read(CHUNK)
-                frames.append(data)
-
-            print("* done recording")
-
-            stream.stop_stream()
-            stream.close()
-
-            wf = wave.open(fn, 'wb')
-            wf.setnchannels(chan)
-            wf.setsampwidth(p.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b''.join(frames))
-            wf.close()
-
-            print(f"Recording saved to {fn}")
-
-        except Exception as e:
-            print(f"Failed to record from device index {did}: {e}")
-
-p.terminate()
+import json
+import click
+from channel_probe import ChannelScanner, PROBE_SECONDS, save_probe
+from device_registry import get_registry
+
+
+@click.command()
+@click.option('--seconds', default=PROBE_SECONDS, type=float, help="Probe window, all devices at once")
+@click.option('--json', 'json_out', is_flag=True, help="Print the results as JSON")
+@click.option('--save/--no-save', default=True, help="Store the results for the device registry")
+def main(seconds, json_out, save):
+    """Find which input devices and channels carry live signal"""
+    registry = get_registry()
+    scanner = ChannelScanner(seconds=seconds, callback=click.echo if not json_out else None)
+    results = scanner.scan(registry.get_devices())
+    if save:
+        save_probe(results)
+        registry.apply_probe(results)
+    if json_out:
+        click.echo(json.dumps(results, indent=1))
+        return
+    for result in results:
+        kind = 'loopback' if result['is_loopback'] else 'input'
+        if result['error']:
+            status = result['error']
+        elif result['live_channels']:
+            status = f"live channels {result['live_channels']}"
+        else:
+            status = 'silent'
+        click.echo(f"[{result['index']:>2}] {result['name']} ({kind}, {result['channels']} ch @ {result['rate']} Hz): {status}")
+        for stats in result['channel_stats']:
+            click.echo(f"      ch{stats['channel']}: rms {stats['rms_db']:6.1f} dBFS, peak {stats['peak_db']:6.1f} dBFS, "
+                       f"clipping {stats['clipping'] * 100:.2f}%, dc {stats['dc_offset']:+.4f}"
+                       f"{'  LIVE' if stats['live'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
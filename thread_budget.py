@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+
+# Thread pools that default to one thread per core in every process
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                   'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+BUDGET_FILE_ENV = 'VOICE_THREAD_BUDGET'
+THREAD_BUDGET_DIR = os.path.join('cache', 'thread_budget')
+
+ThreadAllocation = namedtuple('ThreadAllocation', ['threads', 'interop', 'cores'])
+
+
+def available_cores():
+    """Core ids this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores, parts):
+    """Split cores into `parts` contiguous sets; with more parts than cores, sets share a core"""
+    if parts <= len(cores):
+        size, extra = divmod(len(cores), parts)
+        shares = []
+        start = 0
+        for i in range(parts):
+            end = start + size + (1 if i < extra else 0)
+            shares.append(cores[start:end])
+            start = end
+        return shares
+    return [[cores[i % len(cores)]] for i in range(parts)]
+
+
+def interop_threads(threads):
+    """Whisper's graph is mostly sequential ops; inter-op threads only help with a few cores to spare"""
+    return 2 if threads >= 4 else 1
+
+
+def set_affinity(cores):
+    """Pin the calling process to cores; returns False where the OS has no affinity API (macOS)"""
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        elif sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            mask = sum(1 << core for core in cores)
+            if not kernel32.SetProcessAffinityMask(kernel32.GetCurrentProcess(), mask):
+                return False
+        else:
+            return False
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def limit_threads(threads, interop=None):
+    """Cap the OpenMP/BLAS and torch thread pools of the calling process.
+
+    The environment variables only take effect for libraries loaded after
+    this call; already-loaded BLAS pools are resized through threadpoolctl
+    when it is installed. torch.fft and torch.stft run on the intra-op pool.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(threads)
+        if interop:
+            try:
+                torch.set_num_interop_threads(interop)
+            except RuntimeError:
+                pass  # Only settable once, before the first parallel op
+
+
+_applied = {}
+
+
+def apply_thread_budget(budget_file=None):
+    """Apply the allocation the launcher wrote for this process.
+
+    Call at start-up (before importing torch if possible) and again between
+    chunks: the launcher rewrites the file when jobs start or finish, and
+    the new thread count and cores are picked up here. Returns the
+    allocation when it changed, otherwise None.
+    """
+    budget_file = budget_file or os.environ.get(BUDGET_FILE_ENV)
+    if not budget_file:
+        return None
+    try:
+        with open(budget_file, encoding='utf-8') as f:
+            allocation = ThreadAllocation(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    if _applied.get(budget_file) == allocation:
+        return None
+    limit_threads(allocation.threads, allocation.interop)
+    if allocation.cores:
+        set_affinity(allocation.cores)
+    if 'torch' in sys.modules:
+        # Until torch is loaded only the environment was set; apply again once it is
+        _applied[budget_file] = allocation
+    return allocation
+
+
+class ThreadBudget:
+    """Shares the machine's cores between concurrently running inference jobs.
+
+    Left alone, every torch/BLAS process starts one thread per core, so two
+    transcriptions at once oversubscribe the CPU and both run slower than
+    back to back. Each job registered here gets an equal share of the cores
+    (minus `reserved` ones kept for capture and the UI), published through
+    thread environment variables at launch and a small JSON file the job
+    re-reads between chunks, so shares grow and shrink as jobs come and go.
+    With pin=True each job is also bound to its own set of cores.
+    """
+    def __init__(self, cores=None, reserved=1, pin=False, budget_dir=THREAD_BUDGET_DIR, callback=None):
+        cores = list(cores or available_cores())
+        if len(cores) > reserved:
+            cores = cores[:len(cores) - reserved]
+        self.cores = cores
+        self.pin = pin
+        self.budget_dir = budget_dir
+        self._callback = None
+        self._active = []
+        self._allocations = {}
+        self._lock = threading.Lock()
+        self.set_callback(callback)
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def path(self, job_id):
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(job_id))
+        return os.path.join(self.budget_dir, f'{os.getpid()}_{safe_id}.json')
+
+    def acquire(self, job_id):
+        """Register a starting job; returns the environment to launch its process with"""
+        with self._lock:
+            if job_id not in self._active:
+                self._active.append(job_id)
+            self._rebalance()
+            allocation = self._allocations[job_id]
+            active = len(self._active)
+        self._log(f"Thread budget: {allocation.threads} threads for job {job_id} ({active} active)")
+        env = dict(os.environ)
+        for name in THREAD_ENV_VARS:
+            env[name] = str(allocation.threads)
+        env[BUDGET_FILE_ENV] = os.path.abspath(self.path(job_id))
+        return env
+
+    def release(self, job_id):
+        with self._lock:
+            if job_id not in self._active:
+                return
+            self._active.remove(job_id)
+            self._allocations.pop(job_id, None)
+            try:
+                os.remove(self.path(job_id))
+            except OSError:
+                pass
+            self._rebalance()
+
+    def allocation(self, job_id):
+        with self._lock:
+            return self._allocations.get(job_id)
+
+    @property
+    def active(self):
+        return len(self._active)
+
+    def _rebalance(self):
+        if not self._active:
+            return
+        os.makedirs(self.budget_dir, exist_ok=True)
+        for job_id, share in zip(self._active, split_cores(self.cores, len(self._active))):
+            allocation = ThreadAllocation(len(share), interop_threads(len(share)), share if self.pin else None)
+            if self._allocations.get(job_id) == allocation:
+                continue
+            self._allocations[job_id] = allocation
+            # Write then rename so a job never reads a half-written budget
+            path = self.path(job_id)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(allocation._asdict(), f)
+            os.replace(path + '.tmp', path)
@@ -0,0 +1,420 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from asr_track import find_asr_track, asr_duration, asr_windows, ASR_RATE
+from shared_audio import read_shared_audio
+from thread_budget import apply_thread_budget
+from encoder_cache import EncoderCache, audio_hash
+from assisted_decoding import load_assistant, assisted_generate_kwargs
+from transcript_confidence import ChunkConfidence, compression_ratio, needs_escalation
+from transcript import TranscriptSegment
+LONG_FORM_CHUNK_S = 30.0
+LONG_FORM_STRIDE_S = 5.0
+LONG_FORM_BATCH_SIZE = 4
+# Transcribing during a call has to keep up with real time
+LIVE_MODEL_GPU = "openai/whisper-large-v3"
+LIVE_MODEL_CPU = "openai/whisper-small"
+
+
+def live_model_id():
+    """Largest model that keeps up with a live call on this machine's device"""
+    import torch
+    return LIVE_MODEL_GPU if torch.cuda.is_available() else LIVE_MODEL_CPU
+
+
+class BaseTranscriber(ABC):
+    """Abstract base class for transcribers"""
+    @abstractmethod
+    def initialize_model(self, model_id):
+        pass
+
+    @abstractmethod
+    def transcribe(self, audio_streamer, progress_callback=None):
+        """Yield a TranscriptSegment for each newly transcribed piece of audio"""
+        pass
+
+    @abstractmethod
+    def get_available_models(self):
+        pass
+
+    @property
+    @abstractmethod
+    def name(self):
+        pass
+
+
+
+class HuggingFaceTranscriber(BaseTranscriber):
+    def __init__(self):
+        import torch
+        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        self.model = None
+        self.processor = None
+        self.pipe = None
+        self.model_id = None
+        self.assistant_model = None
+        self.encoder_cache = None
+        self.generate_kwargs = {"language": "en", "task": "transcribe"}
+
+    name = "HuggingFace Transformers"
+
+    def get_available_models(self):
+        return [
+            "openai/whisper-large-v3",
+            "openai/whisper-medium",
+            "openai/whisper-small",
+            "openai/whisper-base"
+        ]
+
+    def initialize_model(self, model_id, assistant_model_id=None):
+        """Load model_id; with assistant_model_id, decode speculatively with that draft model"""
+        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
+            model_id,
+            torch_dtype=self.torch_dtype,
+            low_cpu_mem_usage=True,
+            cache_dir="cache"
+        )
+        self.model.to(self.device)
+        self.model_id = model_id
+        self.assistant_model = None
+        if assistant_model_id:
+            self.assistant_model = load_assistant(self.model, assistant_model_id, self.torch_dtype, self.device)
+
+        self.processor = AutoProcessor.from_pretrained(model_id)
+
+        self.pipe = pipeline(
+            "automatic-speech-recognition",
+            model=self.model,
+            tokenizer=self.processor.tokenizer,
+            feature_extractor=self.processor.feature_extractor,
+            torch_dtype=self.torch_dtype,
+            device=self.device,
+            generate_kwargs=self.pipeline_generate_kwargs()
+        )
+
+    def pipeline_generate_kwargs(self):
+        """Decoding options for the pipeline, with the draft model when one is loaded"""
+        return dict(self.generate_kwargs, **assisted_generate_kwargs(self.assistant_model))
+
+    def enable_encoder_cache(self, cache=None):
+        """Keep encoder states on disk so re-decoding the same audio only runs the decoder"""
+        self.encoder_cache = cache or EncoderCache()
+
+    def transcribe_chunk(self, samples, start, end, chunk_index):
+        """Transcribe one 16 kHz mono float32 chunk into a TranscriptSegment"""
+        if self.encoder_cache is not None:
+            return TranscriptSegment(self._decode_cached(samples), start, end, chunk_index)
+        # Transcribe the chunk without sampling_rate argument
+        result = self.pipe(samples, generate_kwargs=self.pipeline_generate_kwargs())
+        return TranscriptSegment(result["text"], start, end, chunk_index)
+
+    def _encoder_states(self, samples):
+        """Encoder output for a chunk, from the encoder cache when it is enabled"""
+        import torch
+        key = audio_hash(samples) if self.encoder_cache is not None else None
+        states = self.encoder_cache.get(self.model_id, key) if key else None
+        if states is not None:
+            hidden = torch.from_numpy(np.array(states, dtype=np.float32))[None]
+        else:
+            features = self.processor.feature_extractor(
+                samples, sampling_rate=16000, return_tensors="pt"
+            ).input_features.to(self.device, dtype=self.torch_dtype)
+            hidden = self.model.get_encoder()(features).last_hidden_state
+            if key is None:
+                return hidden
+            self.encoder_cache.put(self.model_id, key, hidden[0].float().cpu().numpy())
+        # Decode from the float16-rounded states on a miss too, so cached and fresh runs agree
+        return hidden.to(torch.float16).to(self.device, dtype=self.torch_dtype)
+
+    def _decode_cached(self, samples):
+        """Decode a chunk from cached encoder states, running the encoder only on a miss"""
+        # No draft model here: it would need its own encoder pass over the features
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
+        with torch.no_grad():
+            hidden = self._encoder_states(samples)
+            generated_ids = self.model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                **self.generate_kwargs
+            )
+        return self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+
+    def score_chunk(self, samples):
+        """Greedy-decode a chunk and return (text, ChunkConfidence)"""
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
+        with torch.no_grad():
+            encoder_outputs = BaseModelOutput(last_hidden_state=self._encoder_states(samples))
+            output = self.model.generate(
+                encoder_outputs=encoder_outputs,
+                return_dict_in_generate=True,
+                output_scores=True,
+                **self.generate_kwargs
+            )
+            token_logprobs = self.model.compute_transition_scores(
+                output.sequences, output.scores, normalize_logits=True
+            )[0]
+            avg_logprob = float(token_logprobs.mean()) if token_logprobs.numel() else 0.0
+
+            # No-speech probability: the <|nospeech|> token right after <|startoftranscript|>
+            start_ids = torch.tensor([[self.model.generation_config.decoder_start_token_id]], device=self.device)
+            logits = self.model(encoder_outputs=encoder_outputs, decoder_input_ids=start_ids).logits[0, -1]
+            no_speech_prob = float(torch.softmax(logits.float(), dim=-1)[self._no_speech_token_id()])
+
+        text = self.processor.batch_decode(output.sequences, skip_special_tokens=True)[0]
+        return text, ChunkConfidence(avg_logprob, compression_ratio(text), no_speech_prob)
+
+    def _no_speech_token_id(self):
+        tokenizer = self.processor.tokenizer
+        for token in ("<|nospeech|>", "<|nocaptions|>"):
+            token_id = tokenizer.convert_tokens_to_ids(token)
+            if token_id is not None and token_id != tokenizer.unk_token_id:
+                return token_id
+        raise RuntimeError("Model has no no-speech token")
+
+    def transcribe(self, audio_streamer, progress_callback=None, checkpoint=None):
+        if self.pipe is None:
+            raise RuntimeError("Model not initialized. Call initialize_model first.")
+
+        processed_chunks = 0
+
+        if progress_callback:
+            progress_callback(0, "Starting transcription...")
+
+        # Load audio to get total chunks
+        audio_streamer.load_audio()
+        total_chunks = audio_streamer.get_total_chunks()
+
+        # Chunks finished by an earlier, interrupted run are replayed, not re-transcribed
+        if checkpoint is not None:
+            for segment in checkpoint.segments:
+                yield segment
+            processed_chunks = checkpoint.next_chunk
+            if processed_chunks and progress_callback:
+                progress_callback(int(processed_chunks / max(total_chunks, 1) * 100),
+                                  f"Resuming at chunk {processed_chunks + 1} of {total_chunks}...")
+
+        for chunk in audio_streamer.stream(processed_chunks):
+            start = processed_chunks * audio_streamer.chunk_length_s
+            end = start + chunk.shape[1] / float(audio_streamer.sample_rate)
+
+            # Ensure chunk is single-channel and resampled to 16 kHz
+            chunk = audio_streamer.to_mono_and_resample(chunk, target_sample_rate=16000)
+
+            # Follow the launcher's thread budget as other jobs start and finish
+            apply_thread_budget()
+            segment = self.transcribe_chunk(chunk.squeeze().numpy(), start, end, processed_chunks)
+            if checkpoint is not None:
+                checkpoint.record(segment, processed_chunks * audio_streamer.chunk_size())
+            processed_chunks += 1
+
+            # Update progress
+            progress = int((processed_chunks / total_chunks) * 100)
+            if progress_callback:
+                progress_callback(progress, "Transcribing...")
+
+            # Yield only the new segment; callers accumulate
+            yield segment
+
+        if progress_callback:
+            progress_callback(100, "Transcription complete!")
+
+    def transcribe_file(self, audio_file, progress_callback=None, long_form=True,
+                        chunk_length_s=LONG_FORM_CHUNK_S, stride_length_s=LONG_FORM_STRIDE_S,
+                        batch_size=LONG_FORM_BATCH_SIZE):
+        """Yield timestamped TranscriptSegments of a whole file.
+
+        long_form reads the file one window of batch_size chunks at a time,
+        so memory stays bounded; otherwise the pipeline loads it in one go.
+        """
+        if self.pipe is None:
+            raise RuntimeError("Model not initialized. Call initialize_model first.")
+            
+        if progress_callback:
+            progress_callback(0, "Starting transcription...")
+        
+        source = find_asr_track(audio_file) or audio_file
+        try:
+            total = asr_duration(source) if long_form else None
+        except Exception:
+            total = None  # Not a format soundfile reads; fall back to the pipeline's own loader
+        
+        if total is None:
+            segments = self._pipe_segments(self.pipe(source, return_timestamps=True), 0.0, 0.0, None)
+        else:
+            segments = self._transcribe_long_form(source, total, progress_callback, chunk_length_s,
+                                                  stride_length_s, batch_size)
+        for index, (text, start, end) in enumerate(segments):
+            yield TranscriptSegment(text, start, end, index)
+        
+        if progress_callback:
+            progress_callback(100, "Transcription complete!")
+    
+    def _transcribe_long_form(self, source, total, progress_callback, chunk_length_s, stride_length_s, batch_size):
+        """Decode one batch of chunks per window, reading only that window of audio"""
+        if self.assistant_model is not None:
+            batch_size = 1  # Assisted generation drafts for one sequence at a time
+        window_s = chunk_length_s * batch_size
+        for offset, samples, lead in asr_windows(source, window_s, stride_length_s):
+            result = self.pipe(
+                {"raw": samples, "sampling_rate": ASR_RATE},
+                chunk_length_s=chunk_length_s,
+                stride_length_s=stride_length_s,
+                batch_size=batch_size,
+                return_timestamps=True
+            )
+            for segment in self._pipe_segments(result, offset - lead, offset, offset + window_s):
+                yield segment
+            if progress_callback:
+                done = min(offset + window_s, total)
+                progress_callback(min(99, int(done / total * 100)) if total else 99,
+                                  f"Transcribed {done / 60:.1f} of {total / 60:.1f} min")
+    
+    def _pipe_segments(self, result, base, keep_from, keep_until):
+        """(text, start, end) of the pipeline's timestamped chunks, in file time.
+        
+        Windows overlap by the stride; a chunk is kept by the window its
+        midpoint falls in, so overlapping speech is emitted exactly once.
+        """
+        # return_timestamps=True gives per-segment chunks; fall back to one segment
+        chunks = result.get("chunks") or [{"text": result["text"], "timestamp": (0.0, None)}]
+        for chunk in chunks:
+            start, end = chunk["timestamp"]
+            start = base + (start or 0.0)
+            end = base + end if end is not None else None
+            middle = start if end is None else (start + end) / 2
+            if middle < keep_from or (keep_until is not None and middle >= keep_until):
+                continue
+            yield chunk["text"], start, end
+
+class CascadeTranscriber(HuggingFaceTranscriber):
+    """Small Whisper over every chunk; only chunks it is unsure of are re-run on the large model.
+
+    Confidence is Whisper's own fallback test (average log-probability,
+    compression ratio, no-speech probability), so a file costs roughly the
+    small model plus the large model on the escalated fraction.
+    """
+    def __init__(self):
+        super().__init__()
+        self.fast = HuggingFaceTranscriber()
+        self.accurate = HuggingFaceTranscriber()
+        self.chunks = 0
+        self.escalated = 0
+
+    name = "Whisper cascade (small first)"
+
+    def get_available_models(self):
+        return [
+            "openai/whisper-base -> openai/whisper-large-v3",
+            "openai/whisper-small -> openai/whisper-large-v3",
+            "openai/whisper-base -> openai/whisper-medium"
+        ]
+
+    def initialize_model(self, model_id, assistant_model_id=None):
+        fast_id, accurate_id = [part.strip() for part in model_id.split('->')]
+        self.fast.initialize_model(fast_id)
+        self.accurate.initialize_model(accurate_id, assistant_model_id)
+        self.model_id = model_id
+        self.pipe = self.accurate.pipe
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / float(self.chunks) if self.chunks else 0.0
+
+    def transcribe_chunk(self, samples, start, end, chunk_index):
+        for transcriber in (self.fast, self.accurate):
+            transcriber.generate_kwargs = self.generate_kwargs
+            transcriber.encoder_cache = self.encoder_cache
+        text, confidence = self.fast.score_chunk(samples)
+        self.chunks += 1
+        if needs_escalation(confidence):
+            self.escalated += 1
+            return self.accurate.transcribe_chunk(samples, start, end, chunk_index)
+        return TranscriptSegment(text, start, end, chunk_index)
+
+    def transcribe(self, audio_streamer, progress_callback=None, checkpoint=None):
+        self.chunks = 0
+        self.escalated = 0
+        for segment in super().transcribe(audio_streamer, progress_callback, checkpoint):
+            yield segment
+        if progress_callback:
+            progress_callback(100, f"Transcription complete! {self.escalated} of {self.chunks} chunks "
+                                   f"({self.escalation_rate * 100:.0f}%) used the large model")
+
+
+class AudioStreamer:
+    """Class to stream audio in chunks"""
+    def __init__(self, audio_file, chunk_length_s=10.0, shared_name=None):
+        self.audio_file = audio_file
+        self.chunk_length_s = chunk_length_s  # in seconds
+        self.shared_name = shared_name
+        self.sample_rate = None
+        self.audio_data = None
+
+    def load_audio(self):
+        import torch
+        import torchaudio
+        # Map the recorder's shared-memory copy if it is still there: no file read or decode
+        if self.shared_name:
+            try:
+                self.sample_rate, audio = read_shared_audio(self.shared_name)
+                self.audio_data = torch.from_numpy(audio)
+                return
+            except FileNotFoundError:
+                self.shared_name = None
+        # Prefer the 16 kHz mono track written at capture time: no downmix/resample needed
+        source_file = find_asr_track(self.audio_file) or self.audio_file
+        self.audio_data, self.sample_rate = torchaudio.load(source_file)
+
+    def to_mono_and_resample(self, chunk, target_sample_rate=16000):
+        """Convert audio chunk to mono and resample if necessary."""
+        import torch
+        import torchaudio
+        # Convert to mono by averaging channels if multi-channel
+        if chunk.shape[0] > 1:
+            chunk = torch.mean(chunk, dim=0, keepdim=True)
+        # Resample if the sample rate does not match the target
+        if self.sample_rate != target_sample_rate:
+            resampler = torchaudio.transforms.Resample(
+                orig_freq=self.sample_rate, new_freq=target_sample_rate
+            )
+            chunk = resampler(chunk)
+        return chunk
+
+    def get_total_chunks(self):
+        num_samples = self.audio_data.shape[1]
+        chunk_size = int(self.sample_rate * self.chunk_length_s)
+        total_chunks = (num_samples + chunk_size - 1) // chunk_size
+        return total_chunks
+
+    def chunk_size(self):
+        return int(self.sample_rate * self.chunk_length_s)
+
+    def stream(self, first_chunk=0):
+        if self.audio_data is None:
+            self.load_audio()
+        num_samples = self.audio_data.shape[1]
+        chunk_size = self.chunk_size()
+        for start in range(first_chunk * chunk_size, num_samples, chunk_size):
+            end = min(start + chunk_size, num_samples)
+            chunk = self.audio_data[:, start:end]
+            yield chunk
+
+
+class TranscriberRegistry:
+    """Registry for available transcriber types"""
+    def __init__(self):
+        self.transcribers = {}
+
+    def register(self, transcriber_class):
+        # name is a class attribute, so registering does not load a backend
+        self.transcribers[transcriber_class.name] = transcriber_class
+
+    def get_transcriber(self, name):
+        if name not in self.transcribers:
+            raise ValueError(f"Unknown transcriber type: {name}")
+        return self.transcribers[name]()
+
+    def get_available_transcribers(self):
+        return list(self.transcribers.keys())
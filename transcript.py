@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+
+# One transcribed piece of audio; start/end are seconds from the start of the file
+TranscriptSegment = namedtuple('TranscriptSegment', ['text', 'start', 'end', 'chunk_index'])
+
+
+def segment_text(segments):
+    """Text for a run of segments, spaced the same way the full transcript is.
+
+    Whisper texts already start with a space and other backends' do not,
+    so each segment is stripped and preceded by exactly one space.
+    """
+    return "".join(" " + segment.text.strip() for segment in segments if segment.text.strip())
+
+
+def join_segments(segments):
+    """Final transcript text from a list of segments"""
+    return segment_text(segments).strip()
+
+
+def save_transcript(audio_file, model_id, transcription):
+    """Save a transcript next to the source audio as <basename>_<timestamp>.txt"""
+    audio_dir = os.path.dirname(audio_file)
+    audio_basename = os.path.splitext(os.path.basename(audio_file))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_path = os.path.join(audio_dir, f"{audio_basename}_{timestamp}.txt")
+
+    with open(save_path, 'w', encoding='utf-8') as f:
+        f.write(f"Source: {audio_file}\n")
+        f.write(f"Model: {model_id}\n\n")
+        f.write(transcription)
+
+    return save_path
+
+
+CHECKPOINT_SUFFIX = '.transcript.jsonl'
+PARTIAL_SUFFIX = '.partial.txt'
+
+
+def options_hash(options):
+    """Short stable hash of the options that change what the model outputs"""
+    encoded = json.dumps(options, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+class TranscriptCheckpoint:
+    """Per-chunk progress of one transcription, persisted next to the audio.
+
+    Every finished chunk is appended (and fsynced) to <audio>.transcript.jsonl
+    with its index, sample offset, text, model id and options hash, and its
+    text to <audio>.partial.txt, which is readable at any point. A re-run
+    with the same model and options resumes after the last contiguous
+    chunk; anything else starts over.
+    """
+    def __init__(self, audio_file, model_id, options):
+        base = os.path.splitext(audio_file)[0]
+        self.audio_file = audio_file
+        self.path = base + CHECKPOINT_SUFFIX
+        self.partial_path = base + PARTIAL_SUFFIX
+        self.model_id = model_id
+        self.options_hash = options_hash(options)
+        self._lines = []
+        self.segments = self._load()
+        self._file = None
+
+    def _load(self):
+        segments = []
+        if not os.path.exists(self.path):
+            return segments
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Last line cut short by a crash
+                if (record.get('model_id') != self.model_id
+                        or record.get('options_hash') != self.options_hash
+                        or record.get('chunk_index') != len(segments)):
+                    break
+                segments.append(TranscriptSegment(record['text'], record['start'], record['end'],
+                                                  record['chunk_index']))
+                self._lines.append(line if line.endswith('\n') else line + '\n')
+        return segments
+
+    @property
+    def next_chunk(self):
+        """Index of the first chunk still to transcribe"""
+        return len(self.segments)
+
+    def _open(self):
+        # Rewrite the valid prefix so a mismatched or torn tail never survives
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.writelines(self._lines)
+        with open(self.partial_path, 'w', encoding='utf-8') as f:
+            f.write(segment_text(self.segments))
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._partial = open(self.partial_path, 'a', encoding='utf-8')
+
+    def _line(self, segment, sample_offset):
+        return json.dumps({
+            'chunk_index': segment.chunk_index,
+            'sample_offset': sample_offset,
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text,
+            'model_id': self.model_id,
+            'options_hash': self.options_hash,
+        }) + '\n'
+
+    def record(self, segment, sample_offset=None):
+        """Persist one finished chunk before moving on to the next"""
+        if self._file is None:
+            self._open()
+        self._file.write(self._line(segment, sample_offset))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._partial.write(segment_text([segment]))
+        self._partial.flush()
+        self.segments.append(segment)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._partial.close()
+            self._file = None
+
+    def complete(self):
+        """Remove the checkpoint files once the final transcript is saved"""
+        self.close()
+        for path in (self.path, self.partial_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,32 @@
+import zlib
+from collections import namedtuple
+
+# Whisper's own fallback thresholds
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+
+ChunkConfidence = namedtuple('ChunkConfidence', ['avg_logprob', 'compression_ratio', 'no_speech_prob'])
+
+
+def compression_ratio(text):
+    """gzip-style ratio Whisper uses to spot repetition loops; high means repetitive"""
+    data = text.encode('utf-8')
+    if not data:
+        return 0.0
+    return len(data) / float(len(zlib.compress(data)))
+
+
+def needs_escalation(confidence, logprob_threshold=LOGPROB_THRESHOLD,
+                     compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+                     no_speech_threshold=NO_SPEECH_THRESHOLD):
+    """True if a chunk should be re-run on the larger model.
+
+    Mirrors Whisper's temperature-fallback test: repetitive output, or a
+    low average log-probability unless the chunk is confidently silence.
+    """
+    if confidence.compression_ratio > compression_ratio_threshold:
+        return True
+    if confidence.avg_logprob < logprob_threshold:
+        return confidence.no_speech_prob <= no_speech_threshold
+    return False
@@ -0,0 +1,287 @@
+import hashlib
+import heapq
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+SAMPLE_BYTES = 1 << 20
+
+
+def default_concurrency():
+    """Concurrent transcriptions the machine can take; one whisper run keeps ~8 cores busy"""
+    return max(1, (os.cpu_count() or 1) // 8)
+
+
+def content_key(audio_file):
+    """De-duplication key: file size plus a hash of the first and last MiB.
+
+    Reading the whole recording would make submitting from the UI slow;
+    the sampled hash still tells a copy of the same call from a new one.
+    """
+    size = os.path.getsize(audio_file)
+    digest = hashlib.sha1(str(size).encode())
+    with open(audio_file, 'rb') as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if size > 2 * SAMPLE_BYTES:
+            f.seek(-SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def start_process(command, env=None):
+    """Popen command (an argument list) as the leader of its own process group"""
+    if sys.platform == 'win32':
+        return subprocess.Popen(command, env=env, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    return subprocess.Popen(command, env=env, start_new_session=True)
+
+
+def terminate_tree(process):
+    """Stop process and everything it started, e.g. a terminal and the transcriber inside it"""
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        process.terminate()
+
+
+def run_command(job, command, env=None):
+    """Run command as job's subprocess; cancel() terminates its whole process tree mid-file"""
+    job.process = start_process(command, env)
+    if job.cancel_event.is_set():
+        terminate_tree(job.process)
+    code = job.process.wait()
+    if code and not job.cancel_event.is_set():
+        raise subprocess.CalledProcessError(code, command)
+
+
+class TranscriptionJob:
+    """One queued transcription; target(job) does the work and should honour cancel_event"""
+    def __init__(self, key, audio_file, target, priority):
+        self.key = key
+        self.audio_file = audio_file
+        self.target = target
+        self.priority = priority
+        self.state = 'queued'
+        self.error = None
+        self.process = None
+        self.preempted = False
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def wait_time(self):
+        """Seconds spent queued (so far, if still waiting)"""
+        return (self.started_at or time.perf_counter()) - self.submitted_at
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.process is not None:
+            terminate_tree(self.process)
+
+
+class TranscriptionScheduler:
+    """Priority queue of transcription jobs with de-duplication and cancellation.
+
+    A second request for the same audio (same content, whatever the file
+    name) returns the job already queued or running, raising its priority
+    if needed. At most max_concurrent jobs run at once; lower priority
+    numbers run first, and an interactive job waiting for a slot pre-empts
+    a running batch job, which goes back to the queue.
+    """
+    def __init__(self, max_concurrent=None, callback=None, preempt=True):
+        self.max_concurrent = max_concurrent or default_concurrency()
+        self.preempt = preempt
+        self._callback = None
+        self._listeners = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._running = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.set_callback(callback)
+        self._workers = [threading.Thread(target=self._run, daemon=True) for _ in range(self.max_concurrent)]
+        for worker in self._workers:
+            worker.start()
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def add_listener(self, listener):
+        """Register listener(job) called whenever a job changes state"""
+        self._listeners.append(listener)
+
+    def _notify(self, job):
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                self._log(f"Job listener error: {str(e)}")
+
+    def submit(self, audio_file, target, priority=PRIORITY_INTERACTIVE, key=None):
+        """Queue target(job) for audio_file, or return the matching active job"""
+        key = key or content_key(audio_file)
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is not None:
+                if priority < job.priority and job.state == 'queued':
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                    self._condition.notify()
+                self._log(f"Already {job.state}: {os.path.basename(job.audio_file)}")
+                return job
+            job = TranscriptionJob(key, audio_file, target, priority)
+            self._jobs[key] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._maybe_preempt(job)
+            self._condition.notify()
+        self._log(f"Queued {os.path.basename(audio_file)} ({self.queue_depth} waiting)")
+        self._notify(job)
+        return job
+
+    def _maybe_preempt(self, job):
+        if not self.preempt or len(self._running) < self.max_concurrent:
+            return
+        victims = [running for running in self._running if running.priority > job.priority]
+        if victims:
+            victim = max(victims, key=lambda running: running.priority)
+            victim.preempted = True
+            victim.cancel()
+            self._log(f"Pre-empting {os.path.basename(victim.audio_file)} for {os.path.basename(job.audio_file)}")
+
+    def _next_job(self):
+        while self._heap:
+            priority, _, job = heapq.heappop(self._heap)
+            # Skip stale entries left behind by re-prioritised or cancelled jobs
+            if job.state == 'queued' and priority == job.priority:
+                return job
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._condition.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                job.state = 'running'
+                job.started_at = time.perf_counter()
+                self._running.append(job)
+                self.started += 1
+                self.total_wait += job.wait_time
+                self.max_wait = max(self.max_wait, job.wait_time)
+            self._log(f"Transcribing {os.path.basename(job.audio_file)} (waited {job.wait_time:.1f}s)")
+            self._notify(job)
+            try:
+                job.target(job)
+            except Exception as e:
+                job.error = e
+            self._finish(job)
+
+    def _finish(self, job):
+        with self._condition:
+            self._running.remove(job)
+            if job.preempted and not self._stopped:
+                # Back in the queue with a fresh cancel event; it restarts when a slot frees up
+                job.state = 'queued'
+                job.preempted = False
+                job.process = None
+                job.error = None
+                job.cancel_event = threading.Event()
+                job.submitted_at = time.perf_counter()
+                job.started_at = None
+                heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+                self._condition.notify()
+                return
+            job.finished_at = time.perf_counter()
+            if job.cancel_event.is_set():
+                job.state = 'cancelled'
+                self.cancelled += 1
+            elif job.error is not None:
+                job.state = 'failed'
+                self.failed += 1
+            else:
+                job.state = 'done'
+                self.completed += 1
+            self._jobs.pop(job.key, None)
+        if job.state == 'failed':
+            self._log(f"Transcription failed for {job.audio_file}: {str(job.error)}")
+        else:
+            self._log(f"Transcription {job.state} for: {job.audio_file}")
+        self._notify(job)
+
+    def cancel(self, audio_file=None, key=None):
+        """Cancel a queued or running job by file or key; returns True if one was found"""
+        with self._condition:
+            if key is None:
+                key = next((k for k, job in self._jobs.items() if job.audio_file == audio_file), None)
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            job.preempted = False
+            job.cancel()
+            if job.state == 'queued':
+                job.state = 'cancelled'
+                job.finished_at = time.perf_counter()
+                self.cancelled += 1
+                self._jobs.pop(key, None)
+        if job.state == 'cancelled':
+            self._log(f"Transcription cancelled for: {job.audio_file}")
+            self._notify(job)
+        return True
+
+    def cancel_all(self):
+        with self._condition:
+            files = [job.audio_file for job in self._jobs.values()]
+        for audio_file in files:
+            self.cancel(audio_file)
+
+    @property
+    def queue_depth(self):
+        return sum(1 for job in self._jobs.values() if job.state == 'queued')
+
+    def stats(self):
+        with self._condition:
+            waiting = [job.wait_time for job in self._jobs.values() if job.state == 'queued']
+            return {
+                'queued': len(waiting),
+                'running': len(self._running),
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'oldest_wait': max(waiting) if waiting else 0.0,
+                'mean_wait': self.total_wait / self.started if self.started else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            self.cancel_all()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
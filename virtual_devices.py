@@ -0,0 +1,286 @@
+import random
+import threading
+import time
+import wave
+import numpy as np
+
+paInt16 = 8
+paContinue = 0
+paComplete = 1
+paInputOverflow = 2
+paInputOverflowed = -9981
+
+
+class SignalSource:
+    """Generated int16 signal: 'sine', 'noise' or 'silence'"""
+    def __init__(self, kind='sine', rate=44100, channels=1, duration=None,
+                 frequency=440.0, amplitude=0.3, seed=None):
+        self.kind = kind
+        self.rate = rate
+        self.channels = channels
+        self.total_frames = int(duration * rate) if duration is not None else None
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self._rng = np.random.default_rng(seed)
+        self._position = 0
+
+    def read(self, frames):
+        """Return up to `frames` interleaved int16 frames as bytes, b'' when exhausted"""
+        if self.total_frames is not None:
+            frames = min(frames, self.total_frames - self._position)
+        if frames <= 0:
+            return b''
+        if self.kind == 'sine':
+            t = (np.arange(frames) + self._position) / self.rate
+            block = self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+        elif self.kind == 'noise':
+            block = self.amplitude * self._rng.standard_normal(frames)
+        else:
+            block = np.zeros(frames)
+        self._position += frames
+        block = np.clip(block * 32767, -32768, 32767).astype(np.int16)
+        return np.repeat(block[:, None], self.channels, axis=1).tobytes()
+
+
+class WavSource:
+    """Replays a 16-bit PCM WAV file, optionally looping"""
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self._wave = wave.open(path, 'rb')
+        if self._wave.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit PCM WAV files are supported: {path}")
+        self.rate = self._wave.getframerate()
+        self.channels = self._wave.getnchannels()
+
+    def read(self, frames):
+        data = self._wave.readframes(frames)
+        if not data and self.loop and self._wave.getnframes():
+            self._wave.rewind()
+            data = self._wave.readframes(frames)
+        return data
+
+    def close(self):
+        self._wave.close()
+
+
+class VirtualInputDevice:
+    """An input device backed by a source.
+
+    realtime=False delivers blocks as fast as the consumer reads them.
+    jitter_ms adds a random delay (0..jitter_ms) to every block and
+    overflow_rate is the probability that a block is dropped and reported
+    as an input overflow.
+    """
+    def __init__(self, name, source, realtime=True, jitter_ms=0.0,
+                 overflow_rate=0.0, is_loopback=False, seed=None):
+        self.name = name
+        self.source = source
+        self.realtime = realtime
+        self.jitter_ms = jitter_ms
+        self.overflow_rate = overflow_rate
+        self.is_loopback = is_loopback
+        self.exhausted = threading.Event()
+        self.frames_delivered = 0
+        self.overflows = 0
+        self._random = random.Random(seed)
+
+    @property
+    def rate(self):
+        return self.source.rate
+
+    @property
+    def channels(self):
+        return self.source.channels
+
+    def next_block(self, frames):
+        """Return (data, overflowed); data is padded with silence once the source ends"""
+        overflowed = False
+        if self.overflow_rate and self._random.random() < self.overflow_rate:
+            # The dropped block is what the consumer missed
+            self.source.read(frames)
+            self.overflows += 1
+            overflowed = True
+        data = self.source.read(frames)
+        frame_bytes = 2 * self.channels
+        if len(data) < frames * frame_bytes:
+            self.exhausted.set()
+            data = data + b'\x00' * (frames * frame_bytes - len(data))
+        self.frames_delivered += frames
+        return data, overflowed
+
+    def period(self, frames):
+        """Nominal seconds between blocks of `frames` (0 when not real time)"""
+        return frames / self.rate if self.realtime else 0.0
+
+    def jitter(self):
+        """Random extra delay for one block, not carried over to the next"""
+        if not self.jitter_ms:
+            return 0.0
+        return self._random.uniform(0, self.jitter_ms) / 1000.0
+
+    def info(self, index):
+        """Device info dict in PyAudio's format"""
+        return {
+            'index': index,
+            'name': self.name,
+            'hostApi': 0,
+            'maxInputChannels': self.channels,
+            'maxOutputChannels': 0,
+            'defaultSampleRate': float(self.rate),
+            'isLoopbackDevice': self.is_loopback,
+        }
+
+
+class VirtualStream:
+    """Subset of the PyAudio Stream API backed by a VirtualInputDevice"""
+    def __init__(self, device, frames_per_buffer, stream_callback=None, start=True):
+        self.device = device
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+        self._active = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_time = None
+        if start:
+            self.start_stream()
+
+    def start_stream(self):
+        if self._active:
+            return
+        self._active = True
+        self._stop.clear()
+        self._next_time = time.perf_counter()
+        if self.stream_callback is not None:
+            self._thread = threading.Thread(target=self._run_callback, daemon=True)
+            self._thread.start()
+
+    def _wait(self, frames):
+        self._next_time += self.device.period(frames)
+        if not self.device.realtime:
+            self._next_time = max(self._next_time, time.perf_counter())
+        remaining = self._next_time + self.device.jitter() - time.perf_counter()
+        if remaining > 0:
+            self._stop.wait(remaining)
+
+    def _run_callback(self):
+        frames = self.frames_per_buffer
+        while not self._stop.is_set():
+            self._wait(frames)
+            if self._stop.is_set():
+                break
+            data, overflowed = self.device.next_block(frames)
+            status = paInputOverflow if overflowed else 0
+            now = time.perf_counter()
+            time_info = {'input_buffer_adc_time': now, 'current_time': now, 'output_buffer_dac_time': 0.0}
+            _, flag = self.stream_callback(data, frames, time_info, status)
+            if flag != paContinue:
+                break
+        self._active = False
+
+    def read(self, num_frames, exception_on_overflow=True):
+        self._wait(num_frames)
+        data, overflowed = self.device.next_block(num_frames)
+        if overflowed and exception_on_overflow:
+            raise IOError(paInputOverflowed, "Input overflowed")
+        return data
+
+    def get_read_available(self):
+        """Frames a real-time device has buffered beyond the next block's due time"""
+        if not self.device.realtime or self._next_time is None:
+            return 0
+        return max(0, int((time.perf_counter() - self._next_time) * self.device.rate))
+
+    def get_input_latency(self):
+        return self.frames_per_buffer / float(self.device.rate)
+
+    def is_active(self):
+        return self._active
+
+    def stop_stream(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._active = False
+
+    def close(self):
+        self.stop_stream()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class VirtualAudioHost:
+    """Drop-in stand-in for pyaudio.PyAudio serving only virtual devices.
+
+    Covers the calls the recorders make (open, get_sample_size, device
+    info, terminate) and doubles as a DeviceRegistry backend, so virtual
+    mics and loopbacks can be used wherever a real device is accepted.
+    """
+    def __init__(self, devices=None):
+        self.devices = list(devices or [])
+
+    def add_device(self, device):
+        self.devices.append(device)
+        return len(self.devices) - 1
+
+    def __call__(self):
+        """Allows the host itself to be used as a PyAudio factory"""
+        return self
+
+    def get_sample_size(self, format):
+        return 2
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        return self.devices[index].info(index)
+
+    def open(self, format=paInt16, channels=None, rate=None, input=True,
+             input_device_index=None, frames_per_buffer=1024,
+             stream_callback=None, start=True, **kwargs):
+        if format != paInt16:
+            raise ValueError("Virtual devices only support paInt16")
+        if input_device_index is None:
+            input_device_index = 0
+        device = self.devices[input_device_index]
+        if channels is not None and channels != device.channels:
+            raise ValueError(f"{device.name} has {device.channels} channel(s), requested {channels}")
+        if rate is not None and int(rate) != device.rate:
+            raise ValueError(f"{device.name} runs at {device.rate} Hz, requested {rate}")
+        return VirtualStream(device, frames_per_buffer, stream_callback, start)
+
+    def terminate(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.terminate()
+
+    # DeviceRegistry backend interface
+    def quick_signature(self):
+        return tuple(d.name for d in self.devices)
+
+    def enumerate(self):
+        devices = []
+        default_output_name = None
+        for index, device in enumerate(self.devices):
+            devices.append({
+                'index': index,
+                'name': device.name,
+                'host_api': 0,
+                'max_input_channels': device.channels,
+                'max_output_channels': 0,
+                'default_rate': device.rate,
+                'is_loopback': device.is_loopback,
+                'rates': [device.rate],
+            })
+            if device.is_loopback and default_output_name is None:
+                default_output_name = device.name
+        return devices, default_output_name
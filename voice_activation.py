@@ -0,0 +1,208 @@
+import collections
+import json
+import os
+import threading
+import time
+import numpy as np
+from level_meter import to_dbfs
+
+PRE_ROLL_S = 0.5
+HANGOVER_S = 3.0
+# Lowest speech threshold; above quiet noise the threshold follows the tracked noise floor
+SPEECH_DB = -60.0
+NOISE_MARGIN_DB = 12.0
+ATTACK_BLOCKS = 2
+# How fast the tracked noise floor climbs (dB per second); it drops at once
+NOISE_RISE_DB_S = 3.0
+TIMELINE_SUFFIX = '.timeline.json'
+
+
+def timeline_path(audio_file):
+    return os.path.splitext(audio_file)[0] + TIMELINE_SUFFIX
+
+
+class _GatedSource:
+    def __init__(self, channels, rate, pre_roll_s):
+        self.channels = channels
+        self.rate = rate
+        self.pre_roll_frames = int(pre_roll_s * rate)
+        self.ring = collections.deque()
+        self.ring_frames = 0
+        self.captured = 0
+        self.written = 0
+        self.loud_run = 0
+        self.noise_db = None
+        self.segment = None
+        self.segments = []
+
+    def seconds(self, frames):
+        return frames / float(self.rate)
+
+
+class VoiceGate:
+    """Voice-activated recording: only stretches around speech reach the writers.
+
+    Every source keeps a pre-roll ring of its last pre_roll_s of audio.
+    When either source has ATTACK_BLOCKS consecutive blocks more than
+    NOISE_MARGIN_DB above its tracked noise floor (and above threshold_db,
+    a low absolute floor), all sources start writing, pre-roll
+    first, so both sides of a call stay aligned. Writing stops once
+    neither side has spoken for hangover_s. Where each written stretch sits
+    in the original capture is kept per source and saved as a timeline
+    next to the recording.
+    """
+    def __init__(self, pre_roll_s=PRE_ROLL_S, hangover_s=HANGOVER_S, threshold_db=SPEECH_DB,
+                 callback=None, clock=time.monotonic):
+        self.pre_roll_s = pre_roll_s
+        self.hangover_s = hangover_s
+        self.threshold_db = threshold_db
+        self.active = False
+        self.activations = 0
+        self._clock = clock
+        self._last_speech = None
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._callback = None
+        self.set_callback(callback)
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    @property
+    def sources(self):
+        return list(self._sources)
+
+    def add_source(self, source, channels, rate):
+        self._sources[source] = _GatedSource(channels, rate, self.pre_roll_s)
+
+    def _is_speech(self, state, samples):
+        if samples.size:
+            level = to_dbfs(float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) / 32768.0)
+        else:
+            level = to_dbfs(0.0)
+        floor_db = self.threshold_db - NOISE_MARGIN_DB
+        if state.noise_db is None:
+            # Seeded from the first block so steady noise is not taken for speech while the floor climbs
+            state.noise_db = max(level, floor_db)
+        loud = level > max(self.threshold_db, state.noise_db + NOISE_MARGIN_DB)
+        # Minimum follower, updated on loud blocks too: steady noise above the threshold is
+        # absorbed within seconds, while the pauses between words keep pulling it back down.
+        # Below floor_db it no longer changes the threshold, so it is not followed further.
+        block_s = samples.size / float(state.channels * state.rate)
+        if level < state.noise_db:
+            state.noise_db = max(level, floor_db)
+        else:
+            state.noise_db = min(level, state.noise_db + NOISE_RISE_DB_S * block_s)
+        state.loud_run = state.loud_run + 1 if loud else 0
+        return state.loud_run >= ATTACK_BLOCKS
+
+    def process(self, data, source):
+        """Feed one captured int16 block; returns the blocks to write now (possibly none)"""
+        state = self._sources[source]
+        samples = np.frombuffer(data, dtype=np.int16)
+        speech = self._is_speech(state, samples)
+        now = self._clock()
+        with self._lock:
+            if speech:
+                self._last_speech = now
+                if not self.active:
+                    self.active = True
+                    self.activations += 1
+                    self._log(f"Voice detected on {source}, recording")
+            elif self.active and now - self._last_speech > self.hangover_s:
+                self.active = False
+                self._log(f"No voice for {self.hangover_s:.1f}s, paused")
+            active = self.active
+
+        frames = len(samples) // state.channels
+        start = state.captured
+        state.captured += frames
+        if not active:
+            self._end_segment(state, start)
+            state.ring.append(data)
+            state.ring_frames += frames
+            while state.ring and state.ring_frames - len(state.ring[0]) // (2 * state.channels) >= state.pre_roll_frames:
+                state.ring_frames -= len(state.ring.popleft()) // (2 * state.channels)
+            return []
+
+        blocks = []
+        if state.segment is None:
+            state.segment = {
+                'start_s': state.seconds(start - state.ring_frames),
+                'file_start_s': state.seconds(state.written),
+            }
+            blocks.extend(state.ring)
+            state.written += state.ring_frames
+            state.ring.clear()
+            state.ring_frames = 0
+        blocks.append(data)
+        state.written += frames
+        return blocks
+
+    def _end_segment(self, state, end_frame):
+        if state.segment is not None:
+            state.segment['end_s'] = state.seconds(end_frame)
+            state.segments.append(state.segment)
+            state.segment = None
+
+    def source_stats(self, source):
+        state = self._sources[source]
+        captured_s = state.seconds(state.captured)
+        written_s = state.seconds(state.written)
+        return {
+            'captured_s': captured_s,
+            'written_s': written_s,
+            'removed': 1.0 - written_s / captured_s if captured_s else 0.0,
+            'segments': len(state.segments) + (state.segment is not None),
+        }
+
+    def close_source(self, source, audio_file=None):
+        """Close the source's open stretch and, given its recording, save the timeline.
+
+        The timeline lists each written stretch (start_s/end_s in capture
+        time, file_start_s in the recording) and the gaps left out.
+        Returns the timeline path, or None.
+        """
+        state = self._sources.pop(source, None)
+        if state is None:
+            return None
+        self._end_segment(state, state.captured)
+        if audio_file is None:
+            return None
+        gaps = []
+        position = 0.0
+        for segment in state.segments:
+            if segment['start_s'] > position:
+                gaps.append({'start_s': position, 'end_s': segment['start_s']})
+            position = segment['end_s']
+        if state.seconds(state.captured) > position:
+            gaps.append({'start_s': position, 'end_s': state.seconds(state.captured)})
+        timeline = {
+            'audio_file': os.path.basename(audio_file),
+            'source': source,
+            'rate': state.rate,
+            'pre_roll_s': self.pre_roll_s,
+            'hangover_s': self.hangover_s,
+            'threshold_db': self.threshold_db,
+            'captured_s': state.seconds(state.captured),
+            'written_s': state.seconds(state.written),
+            'segments': state.segments,
+            'gaps': gaps,
+        }
+        path = timeline_path(audio_file)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(timeline, f, indent=1)
+        return path
+
+
+def capture_time(timeline, file_s):
+    """Map a position in a voice-activated recording back to time since capture start"""
+    for segment in timeline['segments']:
+        length = segment['end_s'] - segment['start_s']
+        if file_s < segment['file_start_s'] + length:
+            return segment['start_s'] + max(0.0, file_s - segment['file_start_s'])
+    return timeline['captured_s']
@@ -0,0 +1,265 @@
+import os
+import struct
+import threading
+import wave
+import numpy as np
+from level_meter import to_dbfs
+
+PEAKS_SUFFIX = '.peaks'
+PEAKS_MAGIC = b'PEAKS1'
+# magic, sample rate, channels, base block (frames), level factor, total frames
+HEADER = struct.Struct('<6sIHIIQ')
+HEADER_SIZE = 32
+BASE_BLOCK = 256
+LEVEL_FACTOR = 4
+READ_BLOCKS = 4096
+SILENCE_DB = -45.0
+# A range spans at least this many blocks, so leaving out the blocks only partly inside it barely narrows it
+MIN_RANGE_BLOCKS = 64
+
+
+def peaks_path(audio_file):
+    return os.path.splitext(audio_file)[0] + PEAKS_SUFFIX
+
+
+def level_lengths(frames, base_block=BASE_BLOCK, factor=LEVEL_FACTOR):
+    """Entries per pyramid level, finest first, down to a single entry"""
+    lengths = []
+    block = base_block
+    while True:
+        count = max(1, -(-frames // block))
+        lengths.append(count)
+        if count == 1:
+            return lengths
+        block *= factor
+
+
+def _rms(sum_squares, counts):
+    return np.minimum(np.sqrt(sum_squares / counts).round(), 32767).astype(np.int16)
+
+
+def _reduce_rows(rows):
+    """min/max/RMS of each row of int16 samples"""
+    wide = rows.astype(np.int32)
+    return np.stack([
+        rows.min(axis=1),
+        rows.max(axis=1),
+        _rms((wide * wide).sum(axis=1, dtype=np.int64), rows.shape[1]),
+    ], axis=1).astype(np.int16)
+
+
+def reduce_frames(frames, base_block=BASE_BLOCK):
+    """(blocks, 3) int16 min/max/RMS of consecutive base_block-frame blocks of int16 (n, channels) frames"""
+    # One row per block keeps every reduction a plain axis-1 reduction
+    whole = len(frames) // base_block * base_block
+    parts = []
+    if whole:
+        parts.append(_reduce_rows(frames[:whole].reshape(-1, base_block * frames.shape[1])))
+    if whole < len(frames):
+        parts.append(_reduce_rows(frames[whole:].reshape(1, -1)))
+    return np.concatenate(parts)
+
+
+def next_level(level, factor=LEVEL_FACTOR):
+    """Combine every `factor` entries of a level into one entry of the next coarser level"""
+    starts = np.arange(0, len(level), factor)
+    counts = np.diff(np.append(starts, len(level)))
+    squares = np.square(level[:, 2], dtype=np.float64)
+    return np.stack([
+        np.minimum.reduceat(level[:, 0], starts),
+        np.maximum.reduceat(level[:, 1], starts),
+        _rms(np.add.reduceat(squares, starts), counts),
+    ], axis=1).astype(np.int16)
+
+
+def write_peaks(path, rate, channels, frames, level0):
+    """Build the coarser levels from level 0 and write the sidecar"""
+    levels = [level0]
+    while len(levels[-1]) > 1:
+        levels.append(next_level(levels[-1]))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(PEAKS_MAGIC, rate, channels, BASE_BLOCK, LEVEL_FACTOR, frames).ljust(HEADER_SIZE, b'\0'))
+        for level in levels:
+            f.write(np.ascontiguousarray(level, dtype='<i2').tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+class PeakWriter:
+    """Recorder tap building the peak sidecar while a source is captured.
+
+    Each captured block is reduced to per-256-frame min/max/RMS as it
+    arrives (six bytes per block kept in memory, ~7 MB for two hours at
+    44.1 kHz); the coarser levels are derived from those at close, so the
+    audio is never read back.
+    """
+    def __init__(self, audio_file, source, channels, rate):
+        self.source = source
+        self.filename = peaks_path(audio_file)
+        self.channels = channels
+        self.rate = rate
+        self.frames = 0
+        self._blocks = []
+        self._pending = np.zeros((0, channels), dtype=np.int16)
+        self._lock = threading.Lock()
+
+    def tap(self, data, source):
+        if source != self.source:
+            return
+        samples = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+        with self._lock:
+            self.frames += len(samples)
+            if len(self._pending):
+                samples = np.concatenate([self._pending, samples])
+            whole = len(samples) // BASE_BLOCK * BASE_BLOCK
+            if whole:
+                self._blocks.append(reduce_frames(samples[:whole]))
+            self._pending = samples[whole:].copy()
+
+    def close(self):
+        """Write the sidecar; returns its path, or None if nothing was captured"""
+        with self._lock:
+            if len(self._pending):
+                self._blocks.append(reduce_frames(self._pending))
+                self._pending = self._pending[:0]
+            if not self.frames:
+                return None
+            return write_peaks(self.filename, self.rate, self.channels, self.frames, np.concatenate(self._blocks))
+
+
+def _frame_blocks(audio_file, blocksize):
+    """(rate, channels, iterator of int16 (n, channels) blocks) for a WAV or FLAC file"""
+    try:
+        import soundfile as sf
+    except ImportError:
+        sf = None
+    if sf is not None:
+        info = sf.info(audio_file)
+        blocks = sf.blocks(audio_file, blocksize=blocksize, dtype='int16', always_2d=True)
+        return info.samplerate, info.channels, blocks
+    wf = wave.open(audio_file, 'rb')
+    rate, channels = wf.getframerate(), wf.getnchannels()
+
+    def read():
+        with wf:
+            while True:
+                data = wf.readframes(blocksize)
+                if not data:
+                    break
+                yield np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    return rate, channels, read()
+
+
+def compute_peaks(audio_file):
+    """Build the sidecar for an existing recording in one pass of large vectorised blocks"""
+    rate, channels, blocks = _frame_blocks(audio_file, BASE_BLOCK * READ_BLOCKS)
+    level0 = []
+    frames = 0
+    for block in blocks:
+        # Every block but the last is a whole number of base blocks, so no carry-over is needed
+        level0.append(reduce_frames(block))
+        frames += len(block)
+    if not frames:
+        return None
+    return write_peaks(peaks_path(audio_file), rate, channels, frames, np.concatenate(level0))
+
+
+class WaveformPeaks:
+    """Memory-mapped peak pyramid of one recording.
+
+    Rendering any range at any width reads only the level whose block size
+    is closest below the requested frames per pixel, so a multi-hour
+    overview touches a few thousand entries instead of the audio.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        magic, self.rate, self.channels, base_block, factor, self.frames = HEADER.unpack_from(header)
+        if magic != PEAKS_MAGIC:
+            raise ValueError(f"{path} is not a peaks file")
+        data = np.memmap(path, dtype='<i2', mode='r', offset=HEADER_SIZE)
+        self.levels = []
+        offset = 0
+        block = base_block
+        for count in level_lengths(self.frames, base_block, factor):
+            self.levels.append((block, data[offset * 3:(offset + count) * 3].reshape(count, 3)))
+            offset += count
+            block *= factor
+
+    @property
+    def duration(self):
+        return self.frames / float(self.rate)
+
+    def level_for(self, frames_per_point):
+        """(block frames, entries) of the coarsest level still at least as fine as frames_per_point"""
+        chosen = self.levels[0]
+        for level in self.levels:
+            if level[0] > frames_per_point:
+                break
+            chosen = level
+        return chosen
+
+    def overview(self, width, start_s=0.0, end_s=None):
+        """(mins, maxs, rms) float arrays in -1..1 with one point per pixel column"""
+        end_s = self.duration if end_s is None else min(end_s, self.duration)
+        first = int(start_s * self.rate)
+        last = max(first + 1, int(end_s * self.rate))
+        block, entries = self.level_for((last - first) / float(max(width, MIN_RANGE_BLOCKS)))
+        # Blocks only partly inside the range would mix in audio from outside it
+        lo = -(-first // block)
+        hi = len(entries) if last >= self.frames else min(len(entries), last // block)
+        if hi <= lo:
+            lo, hi = first // block, min(len(entries), -(-last // block))
+        window = np.asarray(entries[lo:hi])
+        if not len(window):
+            empty = np.zeros(0)
+            return empty, empty, empty
+        edges = np.unique(np.linspace(0, len(window), min(width, len(window)) + 1).astype(int))[:-1]
+        squares = np.square(window[:, 2], dtype=np.float64)
+        counts = np.diff(np.append(edges, len(window)))
+        scale = 1.0 / 32768.0
+        return (np.minimum.reduceat(window[:, 0], edges) * scale,
+                np.maximum.reduceat(window[:, 1], edges) * scale,
+                np.sqrt(np.add.reduceat(squares, edges) / counts) * scale)
+
+    def _quiet(self, threshold_db, resolution_s):
+        block, entries = self.level_for(resolution_s * self.rate)
+        threshold = 32768.0 * 10 ** (threshold_db / 20.0)
+        return block, np.asarray(entries[:, 2]) < threshold
+
+    def silences(self, threshold_db=SILENCE_DB, min_s=2.0, resolution_s=0.1):
+        """(start_s, end_s) of stretches quieter than threshold_db for at least min_s"""
+        block, quiet = self._quiet(threshold_db, resolution_s)
+        changes = np.flatnonzero(np.diff(np.concatenate([[0], quiet.astype(np.int8), [0]])))
+        spans = []
+        for begin, end in zip(changes[::2], changes[1::2]):
+            start_s = begin * block / float(self.rate)
+            end_s = min(end * block, self.frames) / float(self.rate)
+            if end_s - start_s >= min_s:
+                spans.append((start_s, end_s))
+        return spans
+
+    def next_sound(self, position_s, threshold_db=SILENCE_DB, resolution_s=0.1):
+        """First time at or after position_s louder than threshold_db, or None"""
+        block, quiet = self._quiet(threshold_db, resolution_s)
+        start = int(position_s * self.rate) // block
+        loud = np.flatnonzero(~quiet[start:])
+        if not len(loud):
+            return None
+        return max(position_s, (start + loud[0]) * block / float(self.rate))
+
+    def level_db(self, start_s, end_s):
+        """RMS level of a range in dBFS"""
+        _, _, rms = self.overview(1, start_s, end_s)
+        return to_dbfs(float(rms[0]))
+
+
+def load_peaks(audio_file, build=True):
+    """WaveformPeaks for a recording, building the sidecar first if missing or stale"""
+    path = peaks_path(audio_file)
+    stale = not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(audio_file)
+    if stale:
+        if not build or compute_peaks(audio_file) is None:
+            return None
+    return WaveformPeaks(path)
@@ -0,0 +1,59 @@
+import threading
+
+MONITOR_INTERVAL_S = 0.5
+
+
+class WindowMonitor:
+    """Calls check() every interval_s while monitoring is on.
+
+    The thread waits on a condition, so it idles without polling while
+    monitoring is off and close() returns as soon as it has exited.
+    """
+    def __init__(self, check, interval_s=MONITOR_INTERVAL_S, callback=None):
+        self.check = check
+        self.interval_s = interval_s
+        self.is_monitoring = True
+        self.closing = False
+        self._changed = threading.Condition()
+        self._callback = callback
+        self._thread = None
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _log(self, message):
+        if self._callback:
+            self._callback(message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_monitoring(self, on):
+        with self._changed:
+            self.is_monitoring = on
+            self._changed.notify_all()
+
+    def close(self, timeout=None):
+        """Stop the thread and wait, at most timeout, for it to exit; return True if it did"""
+        with self._changed:
+            self.closing = True
+            self._changed.notify_all()
+        if self._thread is None:
+            return True
+        self._thread.join(timeout=timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self.is_monitoring or self.closing)
+                if self.closing:
+                    return
+            try:
+                self.check()
+            except Exception as e:
+                self._log(f"Error: {e}")
+            with self._changed:
+                if self._changed.wait_for(lambda: self.closing, timeout=self.interval_s):
+                    return
@@ -2,219 +2,25 @@ import wx
 import os
 import sys
 import threading
+import sqlite3
 from datetime import datetime
-from abc import ABC, abstractmethod
-args=sys.argv
+from thread_budget import apply_thread_budget
+from recording_catalog import catalog_transcript
+from assisted_decoding import default_assistant
+from transcript import TranscriptCheckpoint, segment_text, join_segments, save_transcript
+from transcribers import HuggingFaceTranscriber, CascadeTranscriber, AudioStreamer, TranscriberRegistry
+from cloud_transcription import CloudTranscriber
+RENDER_FPS = 5
+# Command-line file arguments only apply when run as the transcription app, not when imported
+args=sys.argv if __name__ == "__main__" else []
 DEFAULT_FILE_NAME = None
-if args[1]:
+SHARED_AUDIO_NAME = None
+if len(args) > 1 and args[1]:
     DEFAULT_FILE_NAME = args[1]
     assert os.path.exists(DEFAULT_FILE_NAME), "Speech File not found"
-
-def show_import_progress():
-    """Function to show a progress dialog during imports and run imports sequentially in the main thread."""
-    app = wx.App()
-
-    # Create the progress dialog in the main thread
-    progress_dialog = wx.ProgressDialog(
-        "Loading Modules", "Initializing imports...",
-        maximum=100, parent=None, style=wx.PD_APP_MODAL | wx.PD_AUTO_HIDE
-    )
-
-
-
-    progress_dialog.Update(20, "Loading torch...")
-    import torch
-
-    progress_dialog.Update(30, "Loading transformers...")
-    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-
-    progress_dialog.Update(40, "Loading threading...")
-    import threading
-
-    progress_dialog.Update(50, "Loading OS...")
-    import os
-
-    progress_dialog.Update(60, "Loading sys...")
-    import sys
-
-    progress_dialog.Update(70, "Loading datetime...")
-    from datetime import datetime
-
-    progress_dialog.Update(80, "Loading abstract base class...")
-    from abc import ABC, abstractmethod
-
-    progress_dialog.Update(90, "Loading torchaudio...")
-    import torchaudio
-
-    progress_dialog.Update(100, "Finalizing imports...")
-    import subprocess
-    import platform
-
-    # Close the progress dialog
-    progress_dialog.Destroy()
-    
-    app.MainLoop()
-
-
-class BaseTranscriber(ABC):
-    """Abstract base class for transcribers"""
-    @abstractmethod
-    def initialize_model(self, model_id):
-        pass
-
-    @abstractmethod
-    def transcribe(self, audio_streamer, progress_callback=None):
-        pass
-
-    @abstractmethod
-    def get_available_models(self):
-        pass
-
-    @property
-    @abstractmethod
-    def name(self):
-        pass
-
-
-
-class HuggingFaceTranscriber(BaseTranscriber):
-    def __init__(self):
-        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        self.model = None
-        self.processor = None
-        self.pipe = None
-
-    @property
-    def name(self):
-        return "HuggingFace Transformers"
-
-    def get_available_models(self):
-        return [
-            "openai/whisper-large-v3",
-            "openai/whisper-medium",
-            "openai/whisper-small",
-            "openai/whisper-base"
-        ]
-
-    def initialize_model(self, model_id):
-        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id,
-            torch_dtype=self.torch_dtype,
-            low_cpu_mem_usage=True,
-            cache_dir="cache"
-        )
-        self.model.to(self.device)
-
-        self.processor = AutoProcessor.from_pretrained(model_id)
-        forced_decoder_ids = self.processor.get_decoder_prompt_ids(language="en", task="transcribe")
-
-        self.pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model,
-            tokenizer=self.processor.tokenizer,
-            feature_extractor=self.processor.feature_extractor,
-            torch_dtype=self.torch_dtype,
-            device=self.device,
-            generate_kwargs={
-                "forced_decoder_ids": forced_decoder_ids,
-                "task": "transcribe"
-            }
-        )
-
-    def transcribe(self, audio_streamer, progress_callback=None):
-        if self.pipe is None:
-            raise RuntimeError("Model not initialized. Call initialize_model first.")
-
-        transcription = ""
-        processed_chunks = 0
-
-        if progress_callback:
-            progress_callback(0, "Starting transcription...")
-
-        # Load audio to get total chunks
-        audio_streamer.load_audio()
-        total_chunks = audio_streamer.get_total_chunks()
-
-        for chunk in audio_streamer.stream():
-            # Ensure chunk is single-channel and resampled to 16 kHz
-            chunk = audio_streamer.to_mono_and_resample(chunk, target_sample_rate=16000)
-
-            # Transcribe the chunk without sampling_rate argument
-            result = self.pipe(chunk.squeeze().numpy())
-
-            # Append the text
-            transcription += result["text"] + " "
-            processed_chunks += 1
-
-            # Update progress
-            progress = int((processed_chunks / total_chunks) * 100)
-            if progress_callback:
-                progress_callback(progress, "Transcribing...")
-
-            # Yield the transcription so far
-            yield transcription.strip()
-
-        if progress_callback:
-            progress_callback(100, "Transcription complete!")
-
-class AudioStreamer:
-    """Class to stream audio in chunks"""
-    def __init__(self, audio_file, chunk_length_s=10.0):
-        self.audio_file = audio_file
-        self.chunk_length_s = chunk_length_s  # in seconds
-        self.sample_rate = None
-        self.audio_data = None
-
-    def load_audio(self):
-        self.audio_data, self.sample_rate = torchaudio.load(self.audio_file)
-
-    def to_mono_and_resample(self, chunk, target_sample_rate=16000):
-        """Convert audio chunk to mono and resample if necessary."""
-        # Convert to mono by averaging channels if multi-channel
-        if chunk.shape[0] > 1:
-            chunk = torch.mean(chunk, dim=0, keepdim=True)
-        # Resample if the sample rate does not match the target
-        if self.sample_rate != target_sample_rate:
-            resampler = torchaudio.transforms.Resample(
-                orig_freq=self.sample_rate, new_freq=target_sample_rate
-            )
-            chunk = resampler(chunk)
-        return chunk
-
-    def get_total_chunks(self):
-        num_samples = self.audio_data.shape[1]
-        chunk_size = int(self.sample_rate * self.chunk_length_s)
-        total_chunks = (num_samples + chunk_size - 1) // chunk_size
-        return total_chunks
-
-    def stream(self):
-        if self.audio_data is None:
-            self.load_audio()
-        num_samples = self.audio_data.shape[1]
-        chunk_size = int(self.sample_rate * self.chunk_length_s)
-        for start in range(0, num_samples, chunk_size):
-            end = min(start + chunk_size, num_samples)
-            chunk = self.audio_data[:, start:end]
-            yield chunk
-
-
-class TranscriberRegistry:
-    """Registry for available transcriber types"""
-    def __init__(self):
-        self.transcribers = {}
-
-    def register(self, transcriber_class):
-        instance = transcriber_class()
-        self.transcribers[instance.name] = transcriber_class
-
-    def get_transcriber(self, name):
-        if name not in self.transcribers:
-            raise ValueError(f"Unknown transcriber type: {name}")
-        return self.transcribers[name]()
-
-    def get_available_transcribers(self):
-        return list(self.transcribers.keys())
+# Optional "shm:<name>": the recorder still holds this audio in shared memory
+if len(args) > 2 and args[2].startswith('shm:'):
+    SHARED_AUDIO_NAME = args[2][4:]
 
 class TranscriptionFrame(wx.Frame):
     def __init__(self):
@@ -224,6 +30,8 @@ class TranscriptionFrame(wx.Frame):
         # Initialize transcriber registry
         self.registry = TranscriberRegistry()
         self.registry.register(HuggingFaceTranscriber)
+        self.registry.register(CascadeTranscriber)
+        self.registry.register(CloudTranscriber)
 
         # Initial transcriber
         self.transcriber = None
@@ -238,6 +46,12 @@ class TranscriptionFrame(wx.Frame):
         self.transcriptions_dir = os.path.join(self.script_dir, "transcriptions")
         os.makedirs(self.transcriptions_dir, exist_ok=True)
 
+        # Segments produced by the worker thread, rendered at RENDER_FPS
+        self.pending_segments = []
+        self.segment_lock = threading.Lock()
+        self.render_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_render_timer, self.render_timer)
+
         self.init_ui()
 
     def init_ui(self):
@@ -249,7 +63,7 @@ class TranscriptionFrame(wx.Frame):
         self.file_picker = wx.FilePickerCtrl(
             panel,
             message="Choose an audio file",
-            wildcard="Audio files (*.mp3;*.wav)|*.mp3;*.wav",
+            wildcard="Audio files (*.mp3;*.wav;*.flac)|*.mp3;*.wav;*.flac",
             style=wx.FLP_DEFAULT_STYLE | wx.FLP_USE_TEXTCTRL,
             path=os.path.join(self.script_dir, "")
         )
@@ -278,6 +92,24 @@ class TranscriptionFrame(wx.Frame):
         selector_sizer.Add(model_label, flag=wx.ALL|wx.CENTER, border=5)
         selector_sizer.Add(self.model_choice, flag=wx.ALL, border=5)
 
+        # Decoding options; with the encoder cache a re-run with other options only runs the decoder
+        task_label = wx.StaticText(panel, label="Task:")
+        self.task_choice = wx.Choice(panel, choices=["transcribe", "translate"])
+        self.task_choice.SetSelection(0)
+        self.encoder_cache_cb = wx.CheckBox(panel, label="Reuse encoder")
+        self.encoder_cache_cb.SetToolTip("Cache encoder output on disk so re-decoding this audio skips the encoder")
+        selector_sizer.Add(task_label, flag=wx.ALL|wx.CENTER, border=5)
+        selector_sizer.Add(self.task_choice, flag=wx.ALL, border=5)
+        selector_sizer.Add(self.encoder_cache_cb, flag=wx.ALL|wx.CENTER, border=5)
+        self.assistant_cb = wx.CheckBox(panel, label="Draft model")
+        self.assistant_cb.SetToolTip("Speculative decoding with a distilled draft model; same greedy output, fewer slow decoder steps")
+        self.assistant_cb.Bind(wx.EVT_CHECKBOX, self.on_model_changed)
+        selector_sizer.Add(self.assistant_cb, flag=wx.ALL|wx.CENTER, border=5)
+        self.trim_silence_cb = wx.CheckBox(panel, label="Trim silence")
+        self.trim_silence_cb.SetValue(True)
+        self.trim_silence_cb.SetToolTip("Cloud transcription: upload only the stretches with speech")
+        selector_sizer.Add(self.trim_silence_cb, flag=wx.ALL|wx.CENTER, border=5)
+
         # Transcribe button
         self.transcribe_btn = wx.Button(panel, label='Transcribe')
         self.transcribe_btn.Bind(wx.EVT_BUTTON, self.on_transcribe)
@@ -394,23 +226,8 @@ class TranscriptionFrame(wx.Frame):
 
     def save_transcription(self, audio_file, transcription):
         """Save transcription to the same directory as the source audio file with the same base name and .txt extension."""
-        # Get the directory and base name of the audio file
-        audio_dir = os.path.dirname(audio_file)
-        audio_basename = os.path.splitext(os.path.basename(audio_file))[0]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Create the transcription filename with .txt extension
-        filename = f"{audio_basename}_{timestamp}.txt"
-
-        # Full path to save the transcription file in the same directory as the audio file
-        save_path = os.path.join(audio_dir, filename)
-
-        # Save transcription to the specified path
-        with open(save_path, 'w', encoding='utf-8') as f:
-            f.write(f"Source: {audio_file}\n")
-            f.write(f"Model: {self.model_choice.GetString(self.model_choice.GetSelection())}\n\n")
-            f.write(transcription)
-
-        return save_path
+        model_id = self.model_choice.GetString(self.model_choice.GetSelection())
+        return save_transcript(audio_file, model_id, transcription)
     
 
     def on_transcriber_changed(self, event):
@@ -444,7 +261,12 @@ class TranscriptionFrame(wx.Frame):
         try:
             wx.CallAfter(self.status_text.SetLabel, "Initializing model...")
             model_id = self.model_choice.GetString(self.model_choice.GetSelection())
-            self.transcriber.initialize_model(model_id)
+            assistant_id = None
+            if self.assistant_cb.GetValue():
+                assistant_id = default_assistant(model_id.split('->')[-1].strip())
+                if assistant_id is None:
+                    wx.CallAfter(self.status_text.SetLabel, f"No draft model for {model_id}, decoding normally...")
+            self.transcriber.initialize_model(model_id, assistant_id)
             wx.CallAfter(self.on_model_loaded)
         except Exception as e:
             wx.CallAfter(self.status_text.SetLabel, f"Error loading model: {str(e)}")
@@ -469,8 +291,18 @@ class TranscriptionFrame(wx.Frame):
 
         self.transcribe_btn.Enable(False)
         self.output_ctrl.SetValue("")
+        with self.segment_lock:
+            self.pending_segments = []
         self.progress.SetValue(0)
         self.status_text.SetLabel("Starting transcription...")
+        self.transcriber.generate_kwargs["task"] = self.task_choice.GetString(self.task_choice.GetSelection())
+        if self.encoder_cache_cb.GetValue():
+            if self.transcriber.encoder_cache is None:
+                self.transcriber.enable_encoder_cache()
+        else:
+            self.transcriber.encoder_cache = None
+        if hasattr(self.transcriber, 'trim_silence'):
+            self.transcriber.trim_silence = self.trim_silence_cb.GetValue()
 
         # Start transcription in a separate thread
         thread = threading.Thread(
@@ -482,24 +314,46 @@ class TranscriptionFrame(wx.Frame):
     def run_transcription(self, audio_file):
         """Run the transcription in a separate thread"""
         try:
-            audio_streamer = AudioStreamer(audio_file)
-            transcription = ""
-
-            # Start transcribing
-            for partial_transcription in self.transcriber.transcribe(
-                audio_streamer,
-                progress_callback=self.update_progress
-            ):
-                # Update the transcription text
-                transcription = partial_transcription
-                # Update the output control
-                def update_ui():
-                    self.output_ctrl.SetValue(transcription)
-                    self.copy_btn.Enable(True)
-                wx.CallAfter(update_ui)
+            shared_name = SHARED_AUDIO_NAME if audio_file == DEFAULT_FILE_NAME else None
+            audio_streamer = AudioStreamer(audio_file, shared_name=shared_name)
+            model_id = self.model_choice.GetString(self.model_choice.GetSelection())
+            options = {
+                'chunk_length_s': audio_streamer.chunk_length_s,
+                'language': self.transcriber.generate_kwargs.get('language'),
+                'task': self.transcriber.generate_kwargs.get('task'),
+            }
+            # Trimming changes how the audio is cut into pieces, so a resume has to match it
+            if hasattr(self.transcriber, 'trim_silence'):
+                options['trim_silence'] = self.transcriber.trim_silence
+            checkpoint = TranscriptCheckpoint(audio_file, model_id, options)
+            segments = []
+            wx.CallAfter(self.render_timer.Start, int(1000 / RENDER_FPS))
+
+            # Start transcribing; the render timer appends new segments
+            try:
+                for segment in self.transcriber.transcribe(
+                    audio_streamer,
+                    progress_callback=self.update_progress,
+                    checkpoint=checkpoint
+                ):
+                    segments.append(segment)
+                    with self.segment_lock:
+                        self.pending_segments.append(segment)
+            finally:
+                checkpoint.close()
+            cache = self.transcriber.encoder_cache
+            if cache is not None:
+                print(f"Encoder cache: {cache.hits} hits, {cache.misses} misses")
+
+            transcription = join_segments(segments)
 
             # Save transcription to file
             save_path = self.save_transcription(audio_file, transcription)
+            checkpoint.complete()
+            try:
+                catalog_transcript(audio_file, save_path, model_id, segments)
+            except sqlite3.Error as e:
+                print(f"Catalog error: {str(e)}")
 
             # Create relative path for display
             try:
@@ -507,15 +361,17 @@ class TranscriptionFrame(wx.Frame):
             except ValueError:
                 display_path = save_path
 
-            # Update UI with transcription and save location
+            # Update UI with the remaining segments and save location
             def update_ui_final():
-                self.output_ctrl.SetValue(transcription)
+                self.render_timer.Stop()
+                self.render_pending_segments()
                 self.status_text.SetLabel(f"Transcription saved to: {display_path}")
                 self.progress.SetValue(100)
 
             wx.CallAfter(update_ui_final)
 
         except Exception as e:
+            wx.CallAfter(self.render_timer.Stop)
             wx.CallAfter(
                 wx.MessageBox,
                 f"Transcription error: {str(e)}",
@@ -526,6 +382,22 @@ class TranscriptionFrame(wx.Frame):
         finally:
             wx.CallAfter(self.transcribe_btn.Enable, True)
 
+    def on_render_timer(self, event):
+        self.render_pending_segments()
+
+    def render_pending_segments(self):
+        """Append segments received since the last refresh to the output control"""
+        with self.segment_lock:
+            new_segments = self.pending_segments
+            self.pending_segments = []
+        if not new_segments:
+            return
+        text = segment_text(new_segments)
+        if self.output_ctrl.IsEmpty():
+            text = text.lstrip()
+        self.output_ctrl.AppendText(text)
+        self.copy_btn.Enable(True)
+
 def main():
     app = wx.App()
 
@@ -538,14 +410,5 @@ def main():
 
 
 if __name__ == "__main__":
-    show_import_progress()  # Show progress and import modules
-    import torch
-    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-    import torchaudio
-    import subprocess
-    import platform
-    import os
-    import sys
-    from datetime import datetime
-    from abc import ABC, abstractmethod    
-    main() 
+    apply_thread_budget()  # Before torch is imported, so its pools start at the budgeted size
+    main()
@@ -1,507 +1,67 @@
 import wx
-import pyaudio
-import pyaudiowpatch
-import wave
 from os.path import join
 from datetime import datetime
+import sys
 import threading
 import time
-import win32gui
+try:
+    import win32gui
+except ImportError:  # Non-Windows build agents
+    win32gui = None
 import os
 import subprocess   
 import platform
 from pprint import pprint as pp 
-import traceback
-import pyaudio
+import sqlite3
 import sounddevice as sd
-
-out_dir = 'output'
+from level_meter import LevelMeter
+from audio_recorder import AudioRecorder, THREAD_JOIN_TIMEOUT, out_dir
+from voice_activation import PRE_ROLL_S, HANGOVER_S, SPEECH_DB, NOISE_MARGIN_DB
+from capture_health import CaptureHealth, callback_latency
+from incremental_transcription import IncrementalTranscriber
+from audio_enhancer import enhance_recording_job, enhance_conversation_job
+from compute_workers import ComputeWorkers, TranscriberProcess
+from transcription_jobs import TranscriptionScheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH, run_command
+from thread_budget import ThreadBudget
+from recording_catalog import RecordingCatalog, format_offset, play_from
+from window_monitor import WindowMonitor
+
+LEVEL_FPS = 15
+ACTIVE_LEVEL_DB = -60.0
+# None: the transcriber process picks large-v3 on a GPU and small on the CPU
+INCREMENTAL_MODEL = None
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 file_prefix=f'call_{timestamp}'
 os.makedirs(join(out_dir,file_prefix), exist_ok=True)
-from pydub import AudioSegment
-import noisereduce as nr
-import numpy as np
-from scipy.io import wavfile
-import os
-from datetime import datetime
-class AudioEnhancer:
-    def __init__(self, output_dir='output'):
-        self.output_dir = output_dir
-        self._callback = None
-        
-    def set_callback(self, callback):
-        self._callback = callback
-    
-    def _log(self, message):
-        if self._callback:
-            self._callback(message)        
-        
-    def enhance_recording(self, input_file, prefix=None):
-        """Apply audio enhancements to recording with dynamic parameters"""
-        try:
-            self._log(f"Loading audio file: {input_file}")
-            # Load audio file
-            rate, data = wavfile.read(input_file)
-            
-            # Convert to float32 for processing
-            data = data.astype(np.float32, order='C') / 32768.0
-
-            # Calculate appropriate FFT size based on data length
-            data_length = len(data)
-            if data_length < 2:
-                self._log("Audio file too short to process")
-                return None
-                
-            # Choose FFT size that's power of 2 and less than data length
-            n_fft = min(2048, 2**int(np.log2(data_length)))
-            
-            # Normalize audio levels first
-            self._log("Normalizing audio levels...")
-            abs_max = np.abs(data).max()
-            if abs_max > 0:
-                normalized = data / abs_max * 0.9  # Leave some headroom
-            else:
-                normalized = data
-
-            # Only apply noise reduction if we have enough samples
-            if data_length > n_fft:
-                self._log(f"Reducing background noise (FFT size: {n_fft})...")
-                try:
-                    reduced_noise = nr.reduce_noise(
-                        y=normalized,
-                        sr=rate,
-                        stationary=True,
-                        prop_decrease=0.75,
-                        n_fft=n_fft,
-                        n_std_thresh_stationary=1.5
-                    )
-                except Exception as e:
-                    self._log(f"Noise reduction failed: {str(e)}, using normalized audio")
-                    reduced_noise = normalized
-            else:
-                self._log("Audio too short for noise reduction, using normalized audio")
-                reduced_noise = normalized
-                
-            # Save enhanced audio
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if prefix is None:
-                prefix = os.path.splitext(os.path.basename(input_file))[0]
-                
-            output_file = os.path.join(
-                self.output_dir,
-                f'{prefix}_enhanced_{timestamp}.wav'
-            )
-            
-            # Convert back to int16
-            output_data = (reduced_noise * 32768.0).astype(np.int16)
-            
-            self._log("Saving enhanced audio...")
-            wavfile.write(output_file, rate, output_data)
-            
-            return output_file
-            
-        except Exception as e:
-            self._log(f"Error during audio enhancement: {str(e)}")
-            import traceback
-            self._log(f"Stack trace !!!!: {traceback.format_exc()}")
-            
-            
-    def enhance_conversation(self, mic_file, speaker_file):
-        """Enhance both sides of a conversation"""
-        try:
-            # Create enhanced conversation directory
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            conv_dir = os.path.join(self.output_dir, f'enhanced_{timestamp}')
-            os.makedirs(conv_dir, exist_ok=True)
-            
-            results = {
-                'mic': None,
-                'speaker': None
-            }
-            
-            if mic_file and os.path.exists(mic_file) and os.path.getsize(mic_file) > 0:
-                self._log("Enhancing your side of conversation...")
-                results['mic'] = self.enhance_recording(
-                    mic_file,
-                    f'mic_{timestamp}'
-                )
-                
-            if speaker_file and os.path.exists(speaker_file) and os.path.getsize(speaker_file) > 0:
-                self._log("Enhancing other side of conversation...")
-                results['speaker'] = self.enhance_recording(
-                    speaker_file,
-                    f'speaker_{timestamp}'
-                )
-                
-            return results
-            
-        except Exception as e:
-            self._log(f"Error enhancing conversation: {str(e)}")
-            return None
-class AudioRecorder:
-    def __init__(self):
-        self.FORMAT = pyaudio.paInt16
-        self.RATE = 44100
-        self.CHUNK = 1024
-        self.recording = False
-        self.frames = []
-        self.audio = None
-        self._callback = None
-        self.current_channels = None
-        self.stream = None
-        self.wave_file = None
-        self.current_filename = None
-        
-    def get_microphones(self):
-        """Get list of available microphone devices"""
-        self.audio = pyaudio.PyAudio()
-        microphones = []
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            channels = int(device_info['maxInputChannels'])
-            if channels > 0 and (
-                'mic' in device_info['name'].lower() or
-                'microphone' in device_info['name'].lower() or
-                device_info['name'].lower().startswith('input') or
-                'audio input' in device_info['name'].lower()
-            ):
-                microphones.append((i, device_info['name'], channels))
-                
-        if not microphones:
-            for i in range(self.audio.get_device_count()):
-                device_info = self.audio.get_device_info_by_index(i)
-                channels = int(device_info['maxInputChannels'])
-                if channels > 0:
-                    microphones.append((i, device_info['name'], channels))
-        return microphones
-
-    def get_speakers(self):
-        """Get list of available speaker devices"""
-        speakers = []
-        with pyaudiowpatch.PyAudio() as p:
-            try:
-                wasapi_info = p.get_host_api_info_by_type(pyaudiowpatch.paWASAPI)
-                for loopback in p.get_loopback_device_info_generator():
-                    speakers.append({
-                        'index': loopback['index'],
-                        'name': loopback['name'],
-                        'channels': loopback['maxInputChannels'],
-                        'rate': int(loopback['defaultSampleRate'])
-                    })
-            except OSError:
-                if self._callback:
-                    self._callback("WASAPI not available on the system")
-        return speakers
-    
-    def set_callback(self, callback):
-        self._callback = callback
-    
-    def _log(self, message):
-        if self._callback:
-            self._callback(message)
-    
-    def start_recording_mic(self, device_index, channels):
-        """Start recording from microphone"""
-        if self.recording:
-            return False
-            
-        self.recording = True
-        self.frames = []
-        self.current_channels = channels
-        self.audio = pyaudio.PyAudio()
-        
-        def record_thread():
-            try:
-                stream = self.audio.open(
-                    format=self.FORMAT,
-                    channels=channels,
-                    rate=self.RATE,
-                    input=True,
-                    input_device_index=device_index,
-                    frames_per_buffer=self.CHUNK
-                )
-                
-                self._log(f"Microphone recording started with {channels} channel(s)")
-                
-                while self.recording:
-                    try:
-                        data = stream.read(self.CHUNK)
-                        self.frames.append(data)
-                    except Exception as e:
-                        self._log(f"Error during recording: {str(e)}")
-                        break
-                
-                stream.stop_stream()
-                stream.close()
-                
-            except Exception as e:
-                self._log(f"Error setting up audio stream: {str(e)}")
-                self.recording = False
-        
-        threading.Thread(target=record_thread, daemon=True).start()
-        return True
-
-    def start_recording_speaker(self, device_info):
-        global file_prefix
-        """Start recording from speaker"""
-        if self.recording:
-            return False
-            
-        self.recording = True
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs(join(out_dir,file_prefix), exist_ok=True)
-        self.current_filename = join(out_dir,file_prefix, f'speaker_recording_{timestamp}.wav')
-        
-        def record_thread():
-            try:
-                self.audio = pyaudiowpatch.PyAudio()
-                self.wave_file = wave.open(self.current_filename, 'wb')
-                self.wave_file.setnchannels(device_info['channels'])
-                self.wave_file.setsampwidth(pyaudiowpatch.get_sample_size(pyaudiowpatch.paInt16))
-                self.wave_file.setframerate(device_info['rate'])
-
-                def callback(in_data, frame_count, time_info, status):
-                    if self.recording:
-                        self.wave_file.writeframes(in_data)
-                        return (in_data, pyaudiowpatch.paContinue)
-                    return (None, pyaudiowpatch.paComplete)
-
-                self.stream = self.audio.open(
-                    format=pyaudiowpatch.paInt16,
-                    channels=device_info['channels'],
-                    rate=device_info['rate'],
-                    frames_per_buffer=self.CHUNK,
-                    input=True,
-                    input_device_index=device_info['index'],
-                    stream_callback=callback
-                )
-
-                self._log(f"Speaker recording started from: {device_info['name']}")
-
-                while self.recording:
-                    time.sleep(0.1)
-
-            except Exception as e:
-                self._log(f"Recording error: {str(e)}")
-                self.stop_recording()
-
-        threading.Thread(target=record_thread, daemon=True).start()
-        return self.current_filename
-
-    def start_both_recordings(self, mic_info, speaker_info):
-        global file_prefix
-        """Start both microphone and speaker recordings"""
-        if self.recording:
-            return False
-            
-        self.recording = True
-        # Start microphone recording
-        self.frames = []
-        self.current_channels = mic_info[2]
-        self.audio_mic = pyaudio.PyAudio()
-        
-        # Start speaker recording
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs(join(out_dir,file_prefix), exist_ok=True)
-        self.current_filename = join(out_dir,file_prefix, f'speaker_recording_{timestamp}.wav')
-        
-        def mic_thread():
-            try:
-                stream = self.audio_mic.open(
-                    format=self.FORMAT,
-                    channels=mic_info[2],
-                    rate=self.RATE,
-                    input=True,
-                    input_device_index=mic_info[0],
-                    frames_per_buffer=self.CHUNK
-                )
-                
-                self._log(f"Microphone recording started with {mic_info[2]} channel(s)")
-                
-                while self.recording:
-                    try:
-                        data = stream.read(self.CHUNK)
-                        self.frames.append(data)
-                    except Exception as e:
-                        self._log(f"Error during mic recording: {str(e)}")
-                        break
-                
-                stream.stop_stream()
-                stream.close()
-                
-            except Exception as e:
-                self._log(f"Error setting up mic stream: {str(e)}")
-        
-        def speaker_thread():
-            try:
-                self.audio_speaker = pyaudiowpatch.PyAudio()
-                self.wave_file = wave.open(self.current_filename, 'wb')
-                self.wave_file.setnchannels(speaker_info['channels'])
-                self.wave_file.setsampwidth(pyaudiowpatch.get_sample_size(pyaudiowpatch.paInt16))
-                self.wave_file.setframerate(speaker_info['rate'])
-
-                def callback(in_data, frame_count, time_info, status):
-                    if self.recording:
-                        self.wave_file.writeframes(in_data)
-                        return (in_data, pyaudiowpatch.paContinue)
-                    return (None, pyaudiowpatch.paComplete)
-
-                self.stream = self.audio_speaker.open(
-                    format=pyaudiowpatch.paInt16,
-                    channels=speaker_info['channels'],
-                    rate=speaker_info['rate'],
-                    frames_per_buffer=self.CHUNK,
-                    input=True,
-                    input_device_index=speaker_info['index'],
-                    stream_callback=callback
-                )
-
-                self._log(f"Speaker recording started from: {speaker_info['name']}")
-
-                while self.recording:
-                    time.sleep(0.1)
-
-            except Exception as e:
-                self._log(f"Recording error: {str(e)}")
-        
-        # Start both threads
-        threading.Thread(target=mic_thread, daemon=True).start()
-        threading.Thread(target=speaker_thread, daemon=True).start()
-        return True
-    
-    def stop_recording(self, recording_type="mic"):
-        global out_dir, file_prefix
-        """Stop recording and save the file"""
-        if not self.recording:
-            return None
-            
-        self.recording = False
-        
-        if recording_type == "mic":
-            if not self.frames:
-                return None
-                
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            os.makedirs(join(out_dir,file_prefix), exist_ok=True)
-            filename = join(out_dir, file_prefix, f'mic_recording_{timestamp}.wav')
-            
-            try:
-                wf = wave.open(filename, 'wb')
-                wf.setnchannels(self.current_channels)
-                wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-                wf.setframerate(self.RATE)
-                wf.writeframes(b''.join(self.frames))
-                wf.close()
-                return filename
-            except Exception as e:
-                self._log(f"Error saving recording: {str(e)}")
-                return None
-        else:  # speaker
-            try:
-                if self.stream:
-                    self.stream.stop_stream()
-                    self.stream.close()
-                    self.stream = None
-                    
-                if self.wave_file:
-                    self.wave_file.close()
-                    self.wave_file = None
-                    
-                if self.audio:
-                    self.audio.terminate()
-                    self.audio = None
-                    
-                return self.current_filename
-            except Exception as e:
-                self._log(f"Error stopping recording: {str(e)}")
-                return None
-
-    def stop_both_recordings(self):
-        global out_dir, file_prefix
-        """Stop both recordings and save files"""
-        if not self.recording:
-            return None, None
-            
-        self.recording = False
-        speaker_file = self.current_filename
-        
-        try:
-            # Save microphone recording
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            os.makedirs(join(out_dir,file_prefix), exist_ok=True)
-            mic_filename = join(out_dir,file_prefix, f'mic_recording_{timestamp}.wav')
-            
-            # Properly close streams first
-            try:
-                if self.stream:
-                    self.stream.stop_stream()
-                    time.sleep(0.1)  # Give a small delay for cleanup
-                    self.stream.close()
-                    self.stream = None
-            except Exception as e:
-                self._log(f"Error closing speaker stream: {str(e)}")
-
-            # Close wave file
-            try:
-                if self.wave_file:
-                    self.wave_file.close()
-                    self.wave_file = None
-            except Exception as e:
-                self._log(f"Error closing wave file: {str(e)}")
-
-            # Save microphone recording
-            if self.frames:
-                try:
-                    wf = wave.open(mic_filename, 'wb')
-                    wf.setnchannels(self.current_channels)
-                    wf.setsampwidth(self.audio_mic.get_sample_size(self.FORMAT))
-                    wf.setframerate(self.RATE)
-                    wf.writeframes(b''.join(self.frames))
-                    wf.close()
-                except Exception as e:
-                    self._log(f"Error saving microphone recording: {str(e)}")
-                    mic_filename = None
-            else:
-                mic_filename = None
-
-            # Clean up audio instances
-            try:
-                if hasattr(self, 'audio_speaker'):
-                    self.audio_speaker.terminate()
-                    delattr(self, 'audio_speaker')
-            except Exception as e:
-                self._log(f"Error terminating speaker audio: {str(e)}")
-
-            try:
-                if hasattr(self, 'audio_mic'):
-                    self.audio_mic.terminate()
-                    delattr(self, 'audio_mic')
-            except Exception as e:
-                self._log(f"Error terminating microphone audio: {str(e)}")
-
-            return mic_filename, speaker_file
-            
-        except Exception as e:
-            self._log(f"Error in stop_both_recordings: {str(e)}")
-            return None, None
-    
-    def __del__(self):
-        """Cleanup"""
-        if self.audio:
-            self.audio.terminate()
-
 class AudioRecorderFrame(wx.Frame):
     def __init__(self):
         super().__init__(parent=None, title='Audio Recorder', size=(800, 500))
         
         # Initialize recorder
         self.recorder = AudioRecorder()
+        self.recorder.file_prefix = file_prefix
         self.recorder.set_callback(self.log_message)
-        self.enhancer=AudioEnhancer('enhanced')
+        # Finished recordings stay in shared memory for the quick handoff to wx_async_transcribe
+        self.recorder.share_audio = True
+        # Every saved recording, enhancement and transcript is indexed for search
+        self.catalog = RecordingCatalog()
+        self.recorder.catalog = self.catalog
+        # Noise reduction and inference run in worker processes, away from capture
+        self.enhanced_dir = 'enhanced'
+        self.compute = ComputeWorkers(callback=self.log_message)
+        self.transcriptions = TranscriptionScheduler(
+            callback=lambda message: wx.CallAfter(self.log_message, message)
+        )
+        self.transcriptions.add_listener(lambda job: wx.CallAfter(self.update_transcription_status))
+        self.transcriptions.add_listener(
+            lambda job: self.catalog_update(self.catalog.set_transcription, job.audio_file, job.state))
+        # Concurrent transcriptions split the cores instead of each starting a thread per core
+        self.thread_budget = ThreadBudget(callback=lambda message: wx.CallAfter(self.log_message, message))
         self.recorder.set_callback(self.log_message)
         self.last_mic_file = None
         self.last_speaker_file = None        
+        self.incremental = None
+        self.incremental_transcriber = None
         wx.CallAfter(self.Raise)
         wx.CallLater(500, self.Raise)        
         self.init_ui()
@@ -553,10 +113,17 @@ class AudioRecorderFrame(wx.Frame):
             self.is_monitoring = True
             self.current_device_id = self.input_devices[0][0] if self.input_devices else None
             
-            # Start monitoring thread if we have devices
+            # Level meter is fed by a callback stream when idle and by a
+            # recorder tap while recording; the timer repaints at LEVEL_FPS
+            self.level_meter = LevelMeter()
+            self.level_stream = None
+            self.level_health = None
+            self.recorder.add_tap(self.on_recorder_block)
+            self.level_timer = wx.Timer(self)
+            self.Bind(wx.EVT_TIMER, self.on_level_timer, self.level_timer)
             if self.current_device_id is not None:
-                self.monitor_thread = threading.Thread(target=self.monitor_microphone, daemon=True)
-                self.monitor_thread.start()
+                self.start_level_stream()
+                self.level_timer.Start(int(1000 / LEVEL_FPS))
             else:
                 self.volume_text.SetLabel("No microphone devices found")
                 self.mute_indicator.SetLabel("Please check your audio settings")
@@ -615,6 +182,23 @@ class AudioRecorderFrame(wx.Frame):
         
         self.file_prefix= wx.TextCtrl(panel, value=file_prefix)
         self.update_prefix_btn = wx.Button(panel, label='Update Prefix')
+        self.format_choice = wx.Choice(panel, choices=['wav', 'flac'])
+        self.format_choice.SetSelection(0)
+        self.format_choice.SetToolTip('Recording format (FLAC is lossless and about half the size)')
+        self.format_choice.Bind(wx.EVT_CHOICE, self.on_format_change)
+        self.asr_track_cb = wx.CheckBox(panel, label='16 kHz ASR track')
+        self.asr_track_cb.SetToolTip('Also write a 16 kHz mono track that transcription reads directly')
+        self.asr_track_cb.Bind(wx.EVT_CHECKBOX, self.on_asr_track_change)
+        self.voice_cb = wx.CheckBox(panel, label='Voice activated')
+        self.voice_cb.SetToolTip(f'Only write audio around speech on either side; pauses after '
+                                 f'{HANGOVER_S:.0f}s of silence and keeps {PRE_ROLL_S:.1f}s of pre-roll')
+        self.voice_cb.Bind(wx.EVT_CHECKBOX, self.on_voice_activation_change)
+        self.speech_db_spin = wx.SpinCtrl(panel, min=-90, max=-20, initial=int(SPEECH_DB))
+        self.speech_db_spin.SetToolTip(f'Voice activation threshold (dBFS): speech must be {NOISE_MARGIN_DB:.0f} dB '
+                                       f'over the noise floor and above this level')
+        self.speech_db_spin.Bind(wx.EVT_SPINCTRL, self.on_speech_db_change)
+        self.incremental_cb = wx.CheckBox(panel, label='Transcribe during call')
+        self.incremental_cb.SetToolTip('Transcribe finished parts of the call while recording so only the tail is left at stop')
         self.both_btn = wx.Button(panel, label='Record Both')
         self.both_btn.SetForegroundColour(wx.Colour(200, 100, 100))  # Green border color
         self.both_btn.SetBackgroundColour(wx.Colour(255, 255, 255)) 
@@ -623,35 +207,47 @@ class AudioRecorderFrame(wx.Frame):
             self.transcribe_both_btn = wx.Button(panel, label='Transcribe Both')
             self.transcribe_both_btn.SetForegroundColour(wx.Colour(0, 128, 0))  # Green border color
             self.transcribe_both_btn.SetBackgroundColour(wx.Colour(255, 255, 255))         
+            self.cancel_transcribe_btn = wx.Button(panel, label='Cancel Transcription')
+            self.cancel_transcribe_btn.SetToolTip('Cancel queued and running transcriptions')
+            self.cancel_transcribe_btn.Bind(wx.EVT_BUTTON, self.on_cancel_transcriptions)
         
         button_sizer.Add(self.refresh_btn, 0, wx.ALL, 5)
         button_sizer.Add(self.file_prefix, 0, wx.ALL, 5)
         button_sizer.Add(self.update_prefix_btn, 0, wx.ALL, 5)
+        button_sizer.Add(self.format_choice, 0, wx.ALL, 5)
+        button_sizer.Add(self.asr_track_cb, 0, wx.ALL | wx.CENTER, 5)
+        button_sizer.Add(self.voice_cb, 0, wx.ALL | wx.CENTER, 5)
+        button_sizer.Add(self.speech_db_spin, 0, wx.ALL | wx.CENTER, 5)
+        button_sizer.Add(self.incremental_cb, 0, wx.ALL | wx.CENTER, 5)
         button_sizer.Add(self.both_btn, 0, wx.ALL, 5)
         button_sizer.Add(self.transcribe_both_btn, 0, wx.ALL, 5)
+        button_sizer.Add(self.cancel_transcribe_btn, 0, wx.ALL, 5)
         if 1:
             enhance_sizer = wx.BoxSizer(wx.HORIZONTAL)
             self.enhance_last_btn = wx.Button(panel, label='Enhance Last Recording')
             self.enhance_both_btn = wx.Button(panel, label='Enhance Conversation')
             
+            self.search_btn = wx.Button(panel, label='Search Calls')
+            self.search_btn.SetToolTip('Search transcripts of past calls and play from the match')
+            
             enhance_sizer.Add(self.enhance_last_btn, 0, wx.ALL, 5)
             enhance_sizer.Add(self.enhance_both_btn, 0, wx.ALL, 5)
+            enhance_sizer.Add(self.search_btn, 0, wx.ALL, 5)
             
             
             
             # Bind enhancement events
             self.enhance_last_btn.Bind(wx.EVT_BUTTON, self.on_enhance_last)
             self.enhance_both_btn.Bind(wx.EVT_BUTTON, self.on_enhance_conversation)
+            self.search_btn.Bind(wx.EVT_BUTTON, self.on_search_calls)
         if 1:
             self.toggle_btn = wx.Button(panel, label="Stop Monitoring", pos=(20, 50))
             self.toggle_btn.Bind(wx.EVT_BUTTON, self.on_toggle)
             
-            # Initialize monitoring flag
-            self.is_monitoring = True
-            
-            # Start monitoring thread
-            self.monitor_thread = threading.Thread(target=self.monitor_windows, daemon=True)
-            self.monitor_thread.start()          
+            # Start monitoring thread (only Windows has a foreground window to check)
+            self.monitor = WindowMonitor(self.check_foreground_window, callback=print)
+            if win32gui is not None:
+                self.monitor.start()
             enhance_sizer.Add(self.toggle_btn, 0, wx.ALL, 5)  
         main_sizer.Add(enhance_sizer, 0, wx.ALIGN_CENTER | wx.ALL, 5)
         # Bind events
@@ -684,38 +280,55 @@ class AudioRecorderFrame(wx.Frame):
         self.SetStatusText('Ready')
         wx.CallAfter(self.Raise)
         wx.CallLater(500, self.Raise)
-    def monitor_microphone(self):
-        CHUNK_SIZE = 1024
-        while self.is_monitoring:
+    def start_level_stream(self):
+        """Open a callback stream on the selected mic for level metering"""
+        self.stop_level_stream()
+        if self.current_device_id is None:
+            return
+        health = CaptureHealth('monitor', 44100, 1024)
+        def callback(indata, frames, time_info, status):
+            health.block(frames, status, callback_latency(time_info))
+            self.level_meter.process(indata)
+        try:
+            self.level_stream = sd.InputStream(device=self.current_device_id,
+                                               channels=1,
+                                               samplerate=44100,
+                                               blocksize=1024,
+                                               callback=callback)
+            self.level_stream.start()
+            self.level_health = health
+        except Exception as e:
+            print(f"Error monitoring device: {e}")
+            self.level_stream = None
+            self.update_error(str(e))
+    
+    def stop_level_stream(self):
+        if self.level_health is not None:
+            print(f"Monitor stream health {self.level_health.summary()}")
+            self.level_health = None
+        if self.level_stream is not None:
             try:
-                with sd.InputStream(device=self.current_device_id, 
-                                  channels=1, 
-                                  samplerate=44100,
-                                  blocksize=CHUNK_SIZE) as stream:
-                    while self.is_monitoring:
-                        data, overflowed = stream.read(CHUNK_SIZE)
-                        volume_norm = float(abs(data).mean())
-                        
-                        # Check if there's any signal (arbitrary threshold)
-                        is_active = volume_norm > 0.001
-                        
-                        wx.CallAfter(self.update_display, volume_norm, is_active)
-                        
-                        time.sleep(0.1)  # Update 10 times per second
-                        
+                self.level_stream.stop()
+                self.level_stream.close()
             except Exception as e:
-                print(f"Error monitoring device: {e}")
-                wx.CallAfter(self.update_error, str(e))
-                time.sleep(1)  # Wait before retrying
+                print(f"Error closing monitor stream: {e}")
+            self.level_stream = None
+    
+    def on_recorder_block(self, data, source):
+        """Recorder tap: meter the mic blocks already being captured"""
+        if source == "mic":
+            self.level_meter.process(data)
     
-    def update_display(self, volume, is_active):
-        # Update volume level (convert to dB for better representation)
-        volume_db = 20 * (volume + 1e-10)  # Add small number to avoid log(0)
-        volume_percent = min(100, max(0, int(volume_db * 100)))
-        self.volume_text.SetLabel(f"Volume: {volume_percent}%")
+    def on_level_timer(self, event):
+        levels = self.level_meter.read()
+        if levels is not None:
+            self.update_display(*levels)
+    
+    def update_display(self, rms_db, peak_db):
+        self.volume_text.SetLabel(f"Volume: {rms_db:.1f} dBFS (peak {peak_db:.1f})")
         
         # Update activity state
-        if is_active:
+        if rms_db > ACTIVE_LEVEL_DB:
             self.mute_indicator.SetLabel("State: ACTIVE")
             self.mute_indicator.SetForegroundColour(wx.GREEN)
         else:
@@ -732,17 +345,35 @@ class AudioRecorderFrame(wx.Frame):
         if selected_idx != wx.NOT_FOUND:
             self.current_device_id = self.input_devices[selected_idx][0]
             print(f"Selected device id: {self.current_device_id}")
+            if not self.recorder.recording:
+                self.start_level_stream()
     
     def on_close(self, event):
-        self.is_monitoring = False
-        time.sleep(0.6)  # Give thread time to clean up
+        started = time.perf_counter()
+        self.monitor.close()
+        self.level_timer.Stop()
+        self.stop_level_stream()
+        for filename in self.recorder.shutdown():
+            print(f"Recording saved to: {filename}")
+        self.recorder.release_shared_audio()
+        self.compute.shutdown()
+        self.transcriptions.shutdown()
+        if self.incremental_transcriber is not None:
+            self.incremental_transcriber.close()
+            self.thread_budget.release('incremental')
+        self.monitor.close(timeout=THREAD_JOIN_TIMEOUT)
+        print(f"Shut down in {time.perf_counter() - started:.2f}s")
         self.Destroy()        
     def on_transcribe_both(self, event):
-        self.on_transcribe_mic(None)
-        self.on_transcribe_speaker(None)
+        # Background work: a per-file Transcribe click pre-empts these
+        for file_name in (self.last_mic_file, self.last_speaker_file):
+            if file_name:
+                self.queue_transcription(file_name, priority=PRIORITY_BATCH)
+        if not (self.last_mic_file or self.last_speaker_file):
+            self.log_message("No recordings available to transcribe.")
     def on_toggle(self, event):
-        self.is_monitoring = not self.is_monitoring
-        if self.is_monitoring:
+        self.monitor.set_monitoring(not self.monitor.is_monitoring)
+        if self.monitor.is_monitoring:
             self.toggle_btn.SetLabel("Stop Monitoring")
             self.status_text.SetLabel("Monitoring for PhoneLink...")
         else:
@@ -756,25 +387,16 @@ class AudioRecorderFrame(wx.Frame):
         self.Raise()
         self.SetFocus()
     
-    def monitor_windows(self):
-        while True:
-            if self.is_monitoring:
-                try:
-                    # Get the foreground window
-                    hwnd = win32gui.GetForegroundWindow()
-                    title = win32gui.GetWindowText(hwnd)
-                    
-                    # Check if PhoneLink is in the title
-                    if 'Phone Link' in title:
-                        # Use CallAfter to safely update GUI from another thread
-                        wx.CallAfter(self.bring_to_front)
-                        wx.CallAfter(self.status_text.SetLabel, f"PhoneLink detected: {title}")
-                    
-                except Exception as e:
-                    print(f"Error: {e}")
-            
-            # Sleep to prevent high CPU usage
-            time.sleep(0.5)
+    def check_foreground_window(self):
+        """Bring the window forward when PhoneLink has the foreground (run by the monitor thread)"""
+        hwnd = win32gui.GetForegroundWindow()
+        title = win32gui.GetWindowText(hwnd)
+        
+        # Check if PhoneLink is in the title
+        if 'Phone Link' in title:
+            # Use CallAfter to safely update GUI from another thread
+            wx.CallAfter(self.bring_to_front)
+            wx.CallAfter(self.status_text.SetLabel, f"PhoneLink detected: {title}")
 
     def on_enhance_last(self, event):
         """Enhance the most recent recording"""
@@ -790,21 +412,26 @@ class AudioRecorderFrame(wx.Frame):
             self.log_message("Recording file is empty")
             return
             
-        def enhance_thread():
+        def enhance_done(future):
             try:
-                self.SetStatusText('Enhancing audio...')
-                enhanced_file = self.enhancer.enhance_recording(self.last_recording)
-                
+                enhanced_file, messages = future.result()
+                for message in messages:
+                    wx.CallAfter(self.log_message, message)
                 if enhanced_file:
                     wx.CallAfter(self.log_message, f"Enhanced audio saved to: {enhanced_file}")
+                    self.catalog_update(self.catalog.set_enhancement, recording, 'done', enhanced_file)
                 else:
                     wx.CallAfter(self.log_message, "Enhancement failed")
+                    self.catalog_update(self.catalog.set_enhancement, recording, 'failed')
             except Exception as e:
                 wx.CallAfter(self.log_message, f"Enhancement error: {str(e)}")
             finally:
                 wx.CallAfter(self.SetStatusText, 'Ready')
         
-        threading.Thread(target=enhance_thread, daemon=True).start()
+        recording = self.last_recording
+        if self.compute.submit(enhance_recording_job, recording, self.enhanced_dir, done=enhance_done):
+            self.SetStatusText('Enhancing audio...')
+            self.catalog_update(self.catalog.set_enhancement, recording, 'running')
 
     def on_enhance_conversation(self, event):
         """Enhance both sides of the conversation"""
@@ -812,13 +439,17 @@ class AudioRecorderFrame(wx.Frame):
             self.log_message("No conversation recordings available")
             return
             
-        def enhance_thread():
-            self.SetStatusText('Enhancing conversation...')
-            results = self.enhancer.enhance_conversation(
-                self.last_mic_file,
-                self.last_speaker_file
-            )
-            
+        def enhance_done(future):
+            try:
+                results, messages = future.result()
+            except Exception as e:
+                results, messages = None, [f"Enhancement error: {str(e)}"]
+            for message in messages:
+                wx.CallAfter(self.log_message, message)
+            for source, recording in sources.items():
+                enhanced_file = results.get(source) if results else None
+                self.catalog_update(self.catalog.set_enhancement, recording,
+                                    'done' if enhanced_file else 'failed', enhanced_file)
             if results:
                 wx.CallAfter(self.log_message, "Conversation enhancement complete")
                 if results['mic']:
@@ -829,78 +460,125 @@ class AudioRecorderFrame(wx.Frame):
                 wx.CallAfter(self.log_message, "Enhancement failed")
             wx.CallAfter(self.SetStatusText, 'Ready')
         
-        threading.Thread(target=enhance_thread).start()
+        sources = {source: recording for source, recording in
+                   (('mic', self.last_mic_file), ('speaker', self.last_speaker_file)) if recording}
+        if self.compute.submit(enhance_conversation_job, self.last_mic_file, self.last_speaker_file,
+                               self.enhanced_dir, done=enhance_done):
+            self.SetStatusText('Enhancing conversation...')
+            for recording in sources.values():
+                self.catalog_update(self.catalog.set_enhancement, recording, 'running')
+
+    def catalog_update(self, update, *args):
+        """Apply a catalog update from any thread; a catalog error is logged, never raised"""
+        try:
+            update(*args)
+        except sqlite3.Error as e:
+            wx.CallAfter(self.log_message, f"Catalog error: {str(e)}")
+
+    def on_search_calls(self, event):
+        """Full-text search over cataloged transcripts; picking a hit plays the call from there"""
+        with wx.TextEntryDialog(self, 'Words to find in past calls:', 'Search Calls') as dialog:
+            if dialog.ShowModal() != wx.ID_OK or not dialog.GetValue().strip():
+                return
+            query = dialog.GetValue().strip()
+        try:
+            hits = self.catalog.search(query)
+        except sqlite3.Error as e:
+            self.log_message(f"Search failed: {str(e)}")
+            return
+        if not hits:
+            self.log_message(f"No calls mention: {query}")
+            return
+        choices = [f"{hit.recorded_at} {hit.call}/{hit.source} @ {format_offset(hit.start)}: {hit.snippet}"
+                   for hit in hits]
+        with wx.SingleChoiceDialog(self, f'{len(hits)} matches for "{query}"', 'Search Calls', choices) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            hit = hits[dialog.GetSelection()]
+        self.log_message(f"Playing {hit.audio_file} from {format_offset(hit.start)}")
+        try:
+            play_from(hit.audio_file, hit.start, wait=False)
+        except Exception as e:
+            self.log_message(f"Error playing audio: {str(e)}")
+
 
+    def transcribe_command(self, file_name):
+        """wx_async_transcribe.py command, handing over shared memory when the audio is still published"""
+        command = [sys.executable, 'wx_async_transcribe.py', file_name]
+        shared_name = self.recorder.shared_audio_name(file_name)
+        if shared_name:
+            command.append(f'shm:{shared_name}')
+        return command
 
+    def queue_transcription(self, file_name, command_builder=None, priority=PRIORITY_INTERACTIVE):
+        """Queue a transcription of file_name; repeated requests for the same audio are merged"""
+        build = command_builder or self.transcribe_command
+        
+        def target(job):
+            # Built when the job starts, so the shared-memory block is only used if still published
+            command = build(file_name)
+            pp(command)
+            env = self.thread_budget.acquire(job.key)
+            try:
+                run_command(job, command, env=env)
+            finally:
+                self.thread_budget.release(job.key)
+        
+        try:
+            return self.transcriptions.submit(file_name, target, priority)
+        except OSError as e:
+            self.log_message(f"Error during transcription: {str(e)}")
+            return None
+    
+    def on_cancel_transcriptions(self, event):
+        self.transcriptions.cancel_all()
+    
+    def update_transcription_status(self):
+        stats = self.transcriptions.stats()
+        if stats['queued'] or stats['running']:
+            self.SetStatusText(f"Transcribing: {stats['running']} running, {stats['queued']} queued "
+                               f"(oldest waiting {stats['oldest_wait']:.0f}s)")
+        elif not self.recorder.recording:
+            self.SetStatusText('Ready')
+    
     # Inside the AudioRecorderFrame class
     def on_transcribe_mic(self, event):
         if self.last_mic_file:
-            file_name = self.last_mic_file
-            
-            def transcribe_in_background():
-                try:
-                    pp(['python', 'wx_async_transcribe.py', file_name])
-                    subprocess.run(['python', 'wx_async_transcribe.py', file_name], check=True, shell=True)
-                    wx.CallAfter(self.log_message, f"Transcription completed for: {file_name}")
-                except Exception as e:
-                    wx.CallAfter(self.log_message, f"Error during transcription: {str(e)}")
-
-            # Start transcription in a new thread
-            threading.Thread(target=transcribe_in_background, daemon=True).start()
-            self.log_message(f"Transcription started for: {file_name}")
+            self.queue_transcription(self.last_mic_file)
         else:
             self.log_message("No microphone recording available to transcribe.")
     def on_transcribe_speaker(self, event):
         if self.last_speaker_file:
-            file_name = self.last_speaker_file
-            
-            def transcribe_in_background():
-                try:
-                    pp(['python', 'wx_async_transcribe.py', file_name])
-                    subprocess.run(['python', 'wx_async_transcribe.py', file_name], check=True, shell=True)
-                    wx.CallAfter(self.log_message, f"Transcription completed for: {file_name}")
-                except Exception as e:
-                    wx.CallAfter(self.log_message, f"Error during transcription: {str(e)}")
-
-            # Start transcription in a new thread
-            threading.Thread(target=transcribe_in_background, daemon=True).start()
-            self.log_message(f"Transcription started for: {file_name}")
+            self.queue_transcription(self.last_speaker_file)
         else:
             self.log_message("No microphone recording available to transcribe.")
 
     def _on_transcribe(self, event):
         if self.last_mic_file:
-            file_name = self.last_mic_file
-
-            def transcribe_in_background():
-                try:
-                    command = ['python', 'wx_async_transcribe.py', file_name]
-                    
-                    # Platform-specific settings to bring window to the top
-                    if platform.system() == 'Windows':
-                        command = ['start', 'cmd', '/c'] + command  # Uses start command to launch with focus
-                    elif platform.system() == 'Darwin':  # macOS
-                        command = ['open', '-a', 'Terminal'] + command
-                    elif platform.system() == 'Linux':
-                        command = ['gnome-terminal', '--'] + command  # Or 'xterm -hold -e' based on your terminal
-                    subprocess.run(command, check=True, shell=True)
-                    
-                    wx.CallAfter(self.log_message, f"Transcription completed for: {file_name}")
-                except Exception as e:
-                    wx.CallAfter(self.log_message, f"Error during transcription: {str(e)}")
-
-            # Start transcription in a new thread
-            threading.Thread(target=transcribe_in_background, daemon=True).start()
-            self.log_message(f"Transcription started for: {file_name}")
+            self.queue_transcription(self.last_mic_file, self.terminal_transcribe_command)
         else:
             self.log_message("No microphone recording available to transcribe.")
 
+    def terminal_transcribe_command(self, file_name):
+        command = [sys.executable, 'wx_async_transcribe.py', file_name]
+        
+        # Platform-specific settings to bring window to the top
+        if platform.system() == 'Windows':
+            # start is a cmd built-in; taskkill /T still reaches the transcriber through cmd
+            command = ['cmd', '/c', 'start', '/wait', 'cmd', '/c'] + command  # Uses start command to launch with focus
+        elif platform.system() == 'Darwin':  # macOS
+            command = ['open', '-W', '-a', 'Terminal'] + command
+        elif platform.system() == 'Linux':
+            command = ['gnome-terminal', '--wait', '--'] + command  # Or 'xterm -hold -e' based on your terminal
+        return command
+
     def on_update_prefix(self, event):
         global file_prefix
         file_prefix = self.file_prefix.GetValue()
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_prefix=f'call_{timestamp}'
         self.file_prefix.SetValue(file_prefix)
+        self.recorder.file_prefix = file_prefix
     def play_audio(self, file_name):
         """Plays an audio file using the default system media player."""
         try:
@@ -927,9 +605,20 @@ class AudioRecorderFrame(wx.Frame):
             self.log_message(f"Playing speaker recording: {self.last_speaker_file}")
         else:
             self.log_message("No speaker recording available to play.")                  
+    def on_format_change(self, event):
+        self.recorder.output_format = self.format_choice.GetString(self.format_choice.GetSelection())
+        self.log_message(f"Recording format: {self.recorder.output_format}")
+    def on_asr_track_change(self, event):
+        self.recorder.asr_track = self.asr_track_cb.GetValue()
+    def on_voice_activation_change(self, event):
+        # Applies from the next recording; the gate is set up when writers open
+        self.recorder.voice_activation = self.voice_cb.GetValue()
+    def on_speech_db_change(self, event):
+        self.recorder.speech_db = float(self.speech_db_spin.GetValue())
     def on_file_prefix(self, event):
         global file_prefix
         file_prefix = self.file_prefix.GetValue()
+        self.recorder.file_prefix = file_prefix
     def on_mic_change(self, event):
         selection = self.mic_choice.GetSelection()
         if selection >= 0:
@@ -962,23 +651,11 @@ class AudioRecorderFrame(wx.Frame):
         self.speaker_choice.Clear()
         self.speakers = self.recorder.get_speakers()
         
-        default_speaker_index = 0
-        with pyaudiowpatch.PyAudio() as p:
-            try:
-                # Get default WASAPI output device info
-                wasapi_info = p.get_host_api_info_by_type(pyaudiowpatch.paWASAPI)
-                default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-                
-                # Find corresponding loopback device if the default device is not a loopback
-                if not default_speakers["isLoopbackDevice"]:
-                    for index, loopback in enumerate(self.speakers):
-                        if default_speakers["name"] in loopback["name"]:
-                            default_speaker_index = index
-                            break
-                    else:
-                        self.log_message("Default loopback output device not found.")
-            except OSError:
-                self.log_message("WASAPI not available on the system")
+        default_speaker_index = self.recorder.registry.get_default_speaker_index()
+        if default_speaker_index is None:
+            if self.speakers:
+                self.log_message("Default loopback output device not found.")
+            default_speaker_index = 0
 
         # Populate the speaker dropdown with available devices and set the default selection
         if not self.speakers:
@@ -1001,8 +678,11 @@ class AudioRecorderFrame(wx.Frame):
     
     def on_refresh(self, event):
         self.log_message("Refreshing device list...")
-        self.populate_devices()
-        self.log_message("Device list updated")
+        if self.recorder.registry.refresh(force=True) or not hasattr(self, 'microphones'):
+            self.populate_devices()
+            self.log_message("Device list updated")
+        else:
+            self.log_message("No device changes detected")
     
     def log_message(self, message):
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -1017,11 +697,15 @@ class AudioRecorderFrame(wx.Frame):
                 selection = self.mic_choice.GetSelection()
                 if selection >= 0:
                     device_info = self.microphones[selection]
+                    # The recorder tap feeds the meter; keep one open stream per device
+                    self.stop_level_stream()
                     if self.recorder.start_recording_mic(device_info[0], device_info[2]):
                         self.mic_record_btn.SetLabel('Stop Recording')
                         self.speaker_record_btn.Disable()
                         self.both_btn.Disable()
                         self.SetStatusText('Recording from microphone...')
+                    else:
+                        self.start_level_stream()
                         
             else:  # speaker
                 selection = self.speaker_choice.GetSelection()
@@ -1039,6 +723,8 @@ class AudioRecorderFrame(wx.Frame):
             filename = self.recorder.stop_recording(source)
             if filename:
                 self.log_message(f"Recording saved to: {filename}")
+            if source == "mic":
+                self.start_level_stream()
             
             if source == "mic":
                 self.mic_record_btn.SetLabel('Record Microphone')
@@ -1064,15 +750,22 @@ class AudioRecorderFrame(wx.Frame):
                 mic_info = self.microphones[selection_mic]
                 speaker_info = self.speakers[selection_speaker]
                 
+                self.stop_level_stream()
+                if self.incremental_cb.GetValue():
+                    self.start_incremental_transcription(mic_info, speaker_info)
                 if self.recorder.start_both_recordings(mic_info, speaker_info):
                     self.both_btn.SetLabel('Stop Recording')
                     self.mic_record_btn.Disable()
                     self.speaker_record_btn.Disable()
                     self.SetStatusText('Recording from both devices...')
+                else:
+                    self.start_level_stream()
+                    self.cancel_incremental_transcription()
         else:
             # Stop both recordings
             self.SetStatusText('Stopping...')
             mic_file, speaker_file = self.recorder.stop_both_recordings()
+            self.start_level_stream()
             self.last_mic_file = mic_file
             self.last_speaker_file = speaker_file
             self.last_recording=speaker_file
@@ -1080,12 +773,48 @@ class AudioRecorderFrame(wx.Frame):
                 self.log_message(f"Microphone recording saved to: {mic_file}")
             if speaker_file:
                 self.log_message(f"Speaker recording saved to: {speaker_file}")
+            if self.incremental is not None:
+                self.finish_incremental_transcription(mic_file, speaker_file)
                 
             self.both_btn.SetLabel('Record Both')
             self.mic_record_btn.Enable()
             self.speaker_record_btn.Enable()
             self.SetStatusText('Ready')
 
+    def start_incremental_transcription(self, mic_info, speaker_info):
+        """Transcribe completed windows of both sides while the call is recorded"""
+        if self.incremental_transcriber is None:
+            # The model lives in a child process so inference never competes with capture for the GIL
+            # It takes a share of the thread budget for as long as it is loaded
+            self.thread_budget.acquire('incremental')
+            self.incremental_transcriber = TranscriberProcess(budget_file=self.thread_budget.path('incremental'))
+        self.incremental = IncrementalTranscriber(
+            self.incremental_transcriber,
+            INCREMENTAL_MODEL,
+            callback=lambda message: wx.CallAfter(self.log_message, message)
+        )
+        self.incremental.add_source('mic', mic_info[2], self.recorder.RATE)
+        self.incremental.add_source('speaker', speaker_info['channels'], speaker_info['rate'])
+        self.recorder.add_tap(self.incremental.tap)
+        self.log_message("Incremental transcription enabled")
+    
+    def cancel_incremental_transcription(self):
+        if self.incremental is not None:
+            self.recorder.remove_tap(self.incremental.tap)
+            self.incremental = None
+    
+    def finish_incremental_transcription(self, mic_file, speaker_file):
+        """Transcribe the remaining tail in the background and save both transcripts"""
+        incremental = self.incremental
+        self.cancel_incremental_transcription()
+        
+        def finish_thread():
+            saved = incremental.finish({'mic': mic_file, 'speaker': speaker_file})
+            for source, path in saved.items():
+                wx.CallAfter(self.log_message, f"Transcription ({source}) saved to: {path}")
+        
+        threading.Thread(target=finish_thread, daemon=True).start()
+
 
 if __name__ == '__main__':
     app = wx.App()
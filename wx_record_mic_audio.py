@@ -1,122 +1,7 @@
 import wx
-import pyaudio
-import wave
-from os.path import join
 from datetime import datetime
-import threading
-import os
-out_dir='output'
-class AudioRecorder:
-    def __init__(self):
-        self.FORMAT = pyaudio.paInt16
-        self.RATE = 44100
-        self.CHUNK = 1024
-        self.recording = False
-        self.frames = []
-        self.audio = pyaudio.PyAudio()
-        self._callback = None
-        
-    def get_microphones(self):
-        """Get list of available microphone devices with their channel info"""
-        microphones = []
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            channels = int(device_info['maxInputChannels'])
-            # Filter for microphone devices
-            if (channels > 0 and 
-                ('mic' in device_info['name'].lower() or
-                 'microphone' in device_info['name'].lower() or
-                 device_info['name'].lower().startswith('input') or
-                 'audio input' in device_info['name'].lower())):
-                microphones.append((i, device_info['name'], channels))
-                
-        if not microphones:  # If no specific microphones found, return all input devices
-            for i in range(self.audio.get_device_count()):
-                device_info = self.audio.get_device_info_by_index(i)
-                channels = int(device_info['maxInputChannels'])
-                if channels > 0:
-                    microphones.append((i, device_info['name'], channels))
-                    
-        return microphones
-    
-    def set_callback(self, callback):
-        """Set callback function for logging"""
-        self._callback = callback
-    
-    def _log(self, message):
-        """Internal logging method"""
-        if self._callback:
-            self._callback(message)
-    
-    def start_recording(self, device_index, channels):
-        """Start recording from specified device with correct channel count"""
-        if self.recording:
-            return False
-            
-        self.recording = True
-        self.frames = []
-        self.current_channels = channels  # Store for saving
-        
-        def record_thread():
-            try:
-                stream = self.audio.open(
-                    format=self.FORMAT,
-                    channels=channels,
-                    rate=self.RATE,
-                    input=True,
-                    input_device_index=device_index,
-                    frames_per_buffer=self.CHUNK
-                )
-                
-                self._log(f"Recording started with {channels} channel(s) at {self.RATE}Hz")
-                
-                while self.recording:
-                    try:
-                        data = stream.read(self.CHUNK)
-                        self.frames.append(data)
-                    except Exception as e:
-                        self._log(f"Error during recording: {str(e)}")
-                        break
-                
-                stream.stop_stream()
-                stream.close()
-                
-            except Exception as e:
-                self._log(f"Error setting up audio stream: {str(e)}")
-                self.recording = False
-        
-        threading.Thread(target=record_thread).start()
-        return True
-    
-    def stop_recording(self):
-        global out_dir
-        """Stop recording and save the file"""
-        if not self.recording:
-            return None
-            
-        self.recording = False
-        
-        if not self.frames:
-            return None
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = join(out_dir,   f'micrecording_{timestamp}.wav')
-        
-        try:
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(self.current_channels)  # Use detected channels
-            wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
-            return filename
-        except Exception as e:
-            self._log(f"Error saving recording: {str(e)}")
-            return None
-    
-    def __del__(self):
-        """Cleanup"""
-        self.audio.terminate()
+from device_registry import get_registry
+from audio_recorder import AudioRecorder
 
 class AudioRecorderFrame(wx.Frame):
     def __init__(self):
@@ -125,6 +10,8 @@ class AudioRecorderFrame(wx.Frame):
         # Initialize recorder
         self.recorder = AudioRecorder()
         self.recorder.set_callback(self.log_message)
+        # Single recordings go straight into the output folder, with no call subfolder
+        self.recorder.file_prefix = ''
         
         self.init_ui()
         self.populate_devices()
@@ -202,8 +89,11 @@ class AudioRecorderFrame(wx.Frame):
     def on_refresh(self, event):
         """Handle refresh button click"""
         self.log_message("Refreshing device list...")
-        self.populate_devices()
-        self.log_message("Device list updated")
+        if get_registry().refresh(force=True):
+            self.populate_devices()
+            self.log_message("Device list updated")
+        else:
+            self.log_message("No device changes detected")
     
     def log_message(self, message):
         """Add a message to the log list"""
@@ -221,13 +111,13 @@ class AudioRecorderFrame(wx.Frame):
             device_index = device_info[0]
             channels = device_info[2]
             
-            if self.recorder.start_recording(device_index, channels):
+            if self.recorder.start_recording_mic(device_index, channels):
                 self.record_btn.SetLabel('Stop Recording')
                 self.SetStatusText('Recording...')
                 self.log_message(f"Started recording from: {device_info[1]} ({channels} channels)")
         else:
             self.SetStatusText('Stopping...')
-            filename = self.recorder.stop_recording()
+            filename = self.recorder.stop_recording('mic')
             if filename:
                 self.log_message(f"Recording saved to: {filename}")
             self.record_btn.SetLabel('Record Microphone')
@@ -1,109 +1,14 @@
 import wx
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 import threading
+import sqlite3
 import os
 import sys
 from datetime import datetime
-from abc import ABC, abstractmethod
-
-class BaseTranscriber(ABC):
-    """Abstract base class for transcribers"""
-    @abstractmethod
-    def initialize_model(self, model_id):
-        pass
-    
-    @abstractmethod
-    def transcribe(self, audio_file, progress_callback=None):
-        pass
-    
-    @abstractmethod
-    def get_available_models(self):
-        pass
-        
-    @property
-    @abstractmethod
-    def name(self):
-        pass
-
-class HuggingFaceTranscriber(BaseTranscriber):
-    def __init__(self):
-        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        self.model = None
-        self.processor = None
-        self.pipe = None
-        
-    @property
-    def name(self):
-        return "HuggingFace Transformers"
-        
-    def get_available_models(self):
-        return [
-            "openai/whisper-large-v3",
-            "openai/whisper-medium",
-            "openai/whisper-small",
-            "openai/whisper-base"
-        ]
-        
-    def initialize_model(self, model_id):
-        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id, 
-            torch_dtype=self.torch_dtype, 
-            low_cpu_mem_usage=True, 
-            use_safetensors=True, 
-            cache_dir="cache"
-        )
-        self.model.to(self.device)
-        
-        self.processor = AutoProcessor.from_pretrained(model_id)
-        forced_decoder_ids = self.processor.get_decoder_prompt_ids(language="en", task="transcribe")
-        
-        
-        self.pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model,
-            tokenizer=self.processor.tokenizer,
-            feature_extractor=self.processor.feature_extractor,
-            torch_dtype=self.torch_dtype,
-            device=self.device,
-            generate_kwargs={
-                "forced_decoder_ids": forced_decoder_ids,
-                "task": "transcribe"
-            },
-            return_timestamps=True
-        )
-    
-    def transcribe(self, audio_file, progress_callback=None):
-        if self.pipe is None:
-            raise RuntimeError("Model not initialized. Call initialize_model first.")
-            
-        if progress_callback:
-            progress_callback(0, "Starting transcription...")
-            
-        result = self.pipe(audio_file)
-        
-        if progress_callback:
-            progress_callback(100, "Transcription complete!")
-            
-        return result["text"]
-
-class TranscriberRegistry:
-    """Registry for available transcriber types"""
-    def __init__(self):
-        self.transcribers = {}
-        
-    def register(self, transcriber_class):
-        instance = transcriber_class()
-        self.transcribers[instance.name] = transcriber_class
-        
-    def get_transcriber(self, name):
-        if name not in self.transcribers:
-            raise ValueError(f"Unknown transcriber type: {name}")
-        return self.transcribers[name]()
-        
-    def get_available_transcribers(self):
-        return list(self.transcribers.keys())
+from transcript import segment_text, join_segments
+from recording_catalog import catalog_transcript
+from transcribers import HuggingFaceTranscriber, TranscriberRegistry, LONG_FORM_CHUNK_S, LONG_FORM_STRIDE_S, LONG_FORM_BATCH_SIZE
+from cloud_transcription import CloudTranscriber
+RENDER_FPS = 5
 
 class TranscriptionFrame(wx.Frame):
     def __init__(self):
@@ -112,6 +17,7 @@ class TranscriptionFrame(wx.Frame):
         # Initialize transcriber registry
         self.registry = TranscriberRegistry()
         self.registry.register(HuggingFaceTranscriber)
+        self.registry.register(CloudTranscriber)
         
         # Initial transcriber
         self.transcriber = None
@@ -126,6 +32,12 @@ class TranscriptionFrame(wx.Frame):
         self.transcriptions_dir = os.path.join(self.script_dir, "transcriptions")
         os.makedirs(self.transcriptions_dir, exist_ok=True)
         
+        # Segments produced by the worker thread, rendered at RENDER_FPS
+        self.pending_segments = []
+        self.segment_lock = threading.Lock()
+        self.render_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_render_timer, self.render_timer)
+        
         self.init_ui()
 
     def init_ui(self):
@@ -137,7 +49,7 @@ class TranscriptionFrame(wx.Frame):
         self.file_picker = wx.FilePickerCtrl(
             panel, 
             message="Choose an audio file",
-            wildcard="Audio files (*.mp3;*.wav)|*.mp3;*.wav",
+            wildcard="Audio files (*.mp3;*.wav;*.flac)|*.mp3;*.wav;*.flac",
             style=wx.FLP_DEFAULT_STYLE | wx.FLP_USE_TEXTCTRL,
             path=os.path.join(self.script_dir, "")
         )
@@ -162,6 +74,21 @@ class TranscriptionFrame(wx.Frame):
         selector_sizer.Add(model_label, flag=wx.ALL|wx.CENTER, border=5)
         selector_sizer.Add(self.model_choice, flag=wx.ALL, border=5)
         
+        # Long-form mode: lazy reading, fixed chunks and batched decoding
+        self.long_form_cb = wx.CheckBox(panel, label="Long-form")
+        self.long_form_cb.SetValue(True)
+        self.long_form_cb.SetToolTip(f"Read the file lazily in {LONG_FORM_CHUNK_S:.0f} s chunks "
+                                     f"({LONG_FORM_STRIDE_S:.0f} s stride) so memory stays bounded")
+        batch_label = wx.StaticText(panel, label="Batch:")
+        self.batch_size_ctrl = wx.SpinCtrl(panel, min=1, max=64, initial=LONG_FORM_BATCH_SIZE, size=(60, -1))
+        selector_sizer.Add(self.long_form_cb, flag=wx.ALL|wx.CENTER, border=5)
+        selector_sizer.Add(batch_label, flag=wx.ALL|wx.CENTER, border=5)
+        selector_sizer.Add(self.batch_size_ctrl, flag=wx.ALL, border=5)
+        self.trim_silence_cb = wx.CheckBox(panel, label="Trim silence")
+        self.trim_silence_cb.SetValue(True)
+        self.trim_silence_cb.SetToolTip("Cloud transcription: upload only the stretches with speech")
+        selector_sizer.Add(self.trim_silence_cb, flag=wx.ALL|wx.CENTER, border=5)
+        
         # Transcribe button
         self.transcribe_btn = wx.Button(panel, label='Transcribe')
         self.transcribe_btn.Bind(wx.EVT_BUTTON, self.on_transcribe)
@@ -297,24 +224,41 @@ class TranscriptionFrame(wx.Frame):
             
         self.transcribe_btn.Enable(False)
         self.output_ctrl.SetValue("")
+        with self.segment_lock:
+            self.pending_segments = []
+        if hasattr(self.transcriber, 'trim_silence'):
+            self.transcriber.trim_silence = self.trim_silence_cb.GetValue()
         
         # Start transcription in a separate thread
         thread = threading.Thread(
             target=self.run_transcription,
-            args=(audio_file,)
+            args=(audio_file, self.long_form_cb.GetValue(), self.batch_size_ctrl.GetValue())
         )
         thread.start()
         
-    def run_transcription(self, audio_file):
+    def run_transcription(self, audio_file, long_form=True, batch_size=LONG_FORM_BATCH_SIZE):
         """Run the transcription in a separate thread"""
         try:
-            transcription = self.transcriber.transcribe(
+            segments = []
+            wx.CallAfter(self.render_timer.Start, int(1000 / RENDER_FPS))
+            for segment in self.transcriber.transcribe_file(
                 audio_file,
-                progress_callback=self.update_progress
-            )
+                progress_callback=self.update_progress,
+                long_form=long_form,
+                batch_size=batch_size
+            ):
+                segments.append(segment)
+                with self.segment_lock:
+                    self.pending_segments.append(segment)
+            transcription = join_segments(segments)
             
             # Save transcription to file
             save_path = self.save_transcription(audio_file, transcription)
+            try:
+                model_id = self.model_choice.GetString(self.model_choice.GetSelection())
+                catalog_transcript(audio_file, save_path, model_id, segments)
+            except sqlite3.Error as e:
+                print(f"Catalog error: {str(e)}")
             
             # Create relative path for display
             try:
@@ -322,14 +266,16 @@ class TranscriptionFrame(wx.Frame):
             except ValueError:
                 display_path = save_path
             
-            # Update UI with transcription and save location
+            # Update UI with the remaining segments and save location
             def update_ui():
-                self.output_ctrl.SetValue(transcription)
+                self.render_timer.Stop()
+                self.render_pending_segments()
                 self.status_text.SetLabel(f"Transcription saved to: {display_path}")
             
             wx.CallAfter(update_ui)
             
         except Exception as e:
+            wx.CallAfter(self.render_timer.Stop)
             wx.CallAfter(
                 wx.MessageBox,
                 f"Transcription error: {str(e)}",
@@ -339,6 +285,21 @@ class TranscriptionFrame(wx.Frame):
         finally:
             wx.CallAfter(self.transcribe_btn.Enable, True)
 
+    def on_render_timer(self, event):
+        self.render_pending_segments()
+
+    def render_pending_segments(self):
+        """Append segments received since the last refresh to the output control"""
+        with self.segment_lock:
+            new_segments = self.pending_segments
+            self.pending_segments = []
+        if not new_segments:
+            return
+        text = segment_text(new_segments)
+        if self.output_ctrl.IsEmpty():
+            text = text.lstrip()
+        self.output_ctrl.AppendText(text)
+
 def main():
     app = wx.App()
     frame = TranscriptionFrame()